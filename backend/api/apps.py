@@ -1,6 +1,15 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.core.signals import request_started
 
 
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        if settings.CONN_HEALTH_CHECKS and settings.CONN_MAX_AGE:
+            from foodgram.db import check_connections
+            request_started.connect(
+                check_connections, dispatch_uid='check_connections'
+            )
@@ -0,0 +1,96 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from api.views import IngredientViewSet, RecipeViewSet, TagViewSet
+from recipes.short_links import get_cached_recipe_id, resolve_short_link
+from recipes.views import short_link_response
+
+orm_executor = ThreadPoolExecutor(
+    max_workers=settings.ASYNC_THREAD_POOL_SIZE,
+    thread_name_prefix='orm',
+)
+
+
+async def run_in_pool(func, *args, **kwargs):
+    """Выполняет синхронную функцию в ограниченном пуле потоков."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        orm_executor, partial(func, *args, **kwargs)
+    )
+
+
+def _call_sync_view(view, request, *args, **kwargs):
+    """Вызывает синхронное DRF-представление и рендерит ответ в потоке."""
+    close_old_connections()
+    try:
+        response = view(request, *args, **kwargs)
+        if hasattr(response, 'render'):
+            response.render()
+        return response
+    finally:
+        close_old_connections()
+
+
+def as_async_view(viewset, actions, **initkwargs):
+    """
+    Оборачивает DRF-вьюсет в асинхронное представление.
+    Работа c ORM и сериализация выполняются в пуле потоков,
+    event loop остается свободным для медленных клиентов.
+    """
+    view = viewset.as_view(actions, **initkwargs)
+
+    async def async_view(request, *args, **kwargs):
+        return await run_in_pool(
+            _call_sync_view, view, request, *args, **kwargs
+        )
+
+    async_view.csrf_exempt = True
+    async_view.__name__ = view.__name__
+    return async_view
+
+
+async def async_short_link_redirect(request, code):
+    """
+    Перенаправляет c короткой ссылки на страницу рецепта.
+    Код ищется в памяти процесса, к базе обращаемся только при промахе.
+    """
+    recipe_id = get_cached_recipe_id(code)
+    if recipe_id is None:
+        recipe_id = await run_in_pool(resolve_short_link, code)
+    return short_link_response(recipe_id)
+
+
+tag_list = as_async_view(
+    TagViewSet, {'get': 'list'}, basename='tag', detail=False
+)
+tag_detail = as_async_view(
+    TagViewSet, {'get': 'retrieve'}, basename='tag', detail=True
+)
+ingredient_list = as_async_view(
+    IngredientViewSet, {'get': 'list'}, basename='ingredient', detail=False
+)
+ingredient_detail = as_async_view(
+    IngredientViewSet, {'get': 'retrieve'}, basename='ingredient', detail=True
+)
+recipe_detail = as_async_view(
+    RecipeViewSet,
+    {
+        'get': 'retrieve',
+        'put': 'update',
+        'patch': 'partial_update',
+        'delete': 'destroy',
+    },
+    basename='recipe',
+    detail=True,
+)
+recipe_get_link = as_async_view(
+    RecipeViewSet,
+    {'get': 'get_link'},
+    basename='recipe',
+    detail=True,
+    **RecipeViewSet.get_link.kwargs,
+)
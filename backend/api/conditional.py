@@ -0,0 +1,29 @@
+import hashlib
+
+from django.http import HttpResponseNotModified
+from django.utils.http import parse_etags
+
+
+def make_etag(*parts):
+    """Слабый ETag по представлению частей ответа."""
+    digest = hashlib.md5(repr(parts).encode()).hexdigest()
+    return f'W/"{digest}"'
+
+
+def etag_matches(request, etag):
+    """Слабое сравнение c If-None-Match (RFC 7232, 3.2)."""
+    header = request.META.get('HTTP_IF_NONE_MATCH')
+    if not header:
+        return False
+    if header.strip() == '*':
+        return True
+    return etag[2:] in (
+        tag[2:] if tag.startswith('W/') else tag
+        for tag in parse_etags(header)
+    )
+
+
+def not_modified_response(etag):
+    response = HttpResponseNotModified()
+    response['ETag'] = etag
+    return response
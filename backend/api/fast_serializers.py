@@ -0,0 +1,169 @@
+import json
+
+from django.core.files.storage import default_storage
+from rest_framework.renderers import JSONRenderer
+
+from recipes.models import Recipe
+from recipes.snapshots import build_snapshots, from_snapshot
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+LINE_SEPARATOR = '\u2028'
+PARAGRAPH_SEPARATOR = '\u2029'
+
+
+def render_json(data):
+    """
+    Рендерит данные в байты так же, как JSONRenderer по умолчанию,
+    но через orjson, если он установлен.
+    """
+    if orjson is None:
+        content = json.dumps(
+            data, ensure_ascii=False, separators=(',', ':')
+        )
+        return content.replace(
+            LINE_SEPARATOR, '\\u2028'
+        ).replace(PARAGRAPH_SEPARATOR, '\\u2029').encode()
+    return orjson.dumps(data).replace(
+        LINE_SEPARATOR.encode(), b'\\u2028'
+    ).replace(PARAGRAPH_SEPARATOR.encode(), b'\\u2029')
+
+
+def accepts_fast_json(request):
+    """Быстрый путь возможен только для обычного JSON-ответа."""
+    renderer = getattr(request, 'accepted_renderer', None)
+    return (
+        type(renderer) is JSONRenderer
+        and 'indent' not in request.accepted_media_type
+    )
+
+
+class RecipeValuesSerializer:
+    """
+    Быстрый сериализатор чтения рецептов на основе .values().
+    Рецепты со снимками ингредиентов и теги выбираются двумя запросами
+    (плюс подписки для авторизованного пользователя) и собираются
+    в словари за один проход. Результат совпадает c RecipeReadSerializer.
+    Если передан fields, выбираются и собираются только эти поля.
+    """
+    field_columns = {
+        'id': ('id',),
+        'author': (
+            'author_id', 'author__email', 'author__username',
+            'author__first_name', 'author__last_name', 'author__avatar',
+        ),
+        'name': ('name',),
+        'image': ('image',),
+        'text': ('text',),
+        'ingredients': ('ingredients_snapshot',),
+        'tag': (),
+        'cooking_time': ('cooking_time',),
+        'is_favorited': ('is_favorited',),
+        'is_in_shopping_cart': ('is_in_shopping_cart',),
+    }
+    annotated_fields = ('is_favorited', 'is_in_shopping_cart')
+
+    def __init__(self, request, fields=None):
+        self.request = request
+        self.user = request.user
+        if fields is None:
+            fields = tuple(self.field_columns)
+        if not self.user.is_authenticated:
+            fields = [
+                field for field in fields
+                if field not in self.annotated_fields
+            ]
+        self.fields = fields
+
+    def get_values(self, queryset):
+        """Преобразует queryset рецептов в queryset словарей."""
+        columns = ['id']
+        for field in self.fields:
+            columns.extend(
+                column for column in self.field_columns[field]
+                if column not in columns
+            )
+        return queryset.select_related(None).prefetch_related(
+            None
+        ).values(*columns)
+
+    def build_url(self, name):
+        if not name:
+            return None
+        return self.request.build_absolute_uri(default_storage.url(name))
+
+    def get_ingredients(self, rows):
+        """
+        Ингредиенты из снимков; для рецептов без снимка
+        они собираются одним запросом к связям.
+        """
+        missing = build_snapshots([
+            row['id'] for row in rows if row['ingredients_snapshot'] is None
+        ])
+        return {
+            row['id']: missing[row['id']]
+            if row['ingredients_snapshot'] is None
+            else from_snapshot(row['ingredients_snapshot'])
+            for row in rows
+        }
+
+    def get_tags(self, recipe_ids):
+        tags = {recipe_id: [] for recipe_id in recipe_ids}
+        rows = Recipe.tag.through.objects.filter(
+            recipe_id__in=recipe_ids
+        ).order_by('-tag__name').values_list(
+            'recipe_id', 'tag_id', 'tag__name', 'tag__slug'
+        )
+        for recipe_id, tag_id, name, slug in rows:
+            tags[recipe_id].append({'id': tag_id, 'name': name, 'slug': slug})
+        return tags
+
+    def get_subscribed(self, author_ids):
+        if not self.user.is_authenticated or not author_ids:
+            return set()
+        return set(self.user.subscribers.filter(
+            author_id__in=author_ids
+        ).values_list('author_id', flat=True))
+
+    def get_author(self, row, subscribed):
+        author_id = row['author_id']
+        return {
+            'id': author_id,
+            'email': row['author__email'],
+            'username': row['author__username'],
+            'first_name': row['author__first_name'],
+            'last_name': row['author__last_name'],
+            'avatar': self.build_url(row['author__avatar']),
+            'is_subscribed': author_id in subscribed,
+        }
+
+    def to_representation(self, rows):
+        """Собирает список рецептов из строк .values()."""
+        recipe_ids = [row['id'] for row in rows]
+        related = {}
+        if 'ingredients' in self.fields:
+            related['ingredients'] = self.get_ingredients(rows)
+        if 'tag' in self.fields:
+            related['tag'] = self.get_tags(recipe_ids)
+        subscribed = set()
+        if 'author' in self.fields:
+            subscribed = self.get_subscribed(
+                {row['author_id'] for row in rows}
+            )
+        data = []
+        for row in rows:
+            recipe = {}
+            for field in self.fields:
+                if field == 'author':
+                    recipe[field] = self.get_author(row, subscribed)
+                elif field == 'image':
+                    recipe[field] = self.build_url(row['image'])
+                elif field in related:
+                    recipe[field] = related[field][row['id']]
+                else:
+                    recipe[field] = row[field]
+            data.append(recipe)
+        return data
@@ -1,24 +1,27 @@
+from django.db.models import Case, IntegerField, Value, When
 from django_filters.rest_framework import (BooleanFilter, CharFilter,
-                                           FilterSet,
-                                           ModelMultipleChoiceFilter)
+                                           ChoiceFilter, FilterSet)
 
-from recipes.models import Ingredient, Recipe, Tag
+from api.pagination import CustomPagination
+from recipes.models import Ingredient, Recipe
+from recipes.popularity import get_top_recipe_ids
+
+RECIPE_ORDERING = (
+    ('popular', 'По популярности'),
+)
 
 
 class RecipeFilter(FilterSet):
     """Фильтр для рецептов."""
     favorite_filter = BooleanFilter(method='get_favorite_recipes')
     shopping_cart_filter = BooleanFilter(method='get_shopping_cart_recipes')
-    tag_filter = ModelMultipleChoiceFilter(
-        queryset=Tag.objects.all(),
-        field_name='tags__slug',
-        to_field_name='slug'
-    )
+    tags = CharFilter(method='filter_by_tags')
+    ordering = ChoiceFilter(choices=RECIPE_ORDERING, method='order_recipes')
 
     class Meta:
         model = Recipe
-        fields = ('author', 'tag_filter',
-                  'favorite_filter', 'shopping_cart_filter')
+        fields = ('author', 'tags', 'favorite_filter',
+                  'shopping_cart_filter', 'ordering')
 
     def _get_current_user(self):
         """Получает текущего пользователя из запроса."""
@@ -45,9 +48,46 @@ class RecipeFilter(FilterSet):
         """Фильтрует рецепты по тегам, указанным в параметрах запроса."""
         tag_values = self.request.query_params.getlist('tags')
         if tag_values:
-            return queryset.filter(tags__slug__in=tag_values).distinct()
+            return queryset.filter(id__in=Recipe.tag.through.objects.filter(
+                tag__slug__in=tag_values
+            ).values('recipe_id'))
         return queryset
 
+    def get_page_end(self):
+        """Номер последнего рецепта запрошенной страницы или None."""
+        paginator = CustomPagination()
+        try:
+            page = int(self.request.query_params.get(
+                paginator.page_query_param, 1
+            ))
+        except ValueError:
+            return None
+        return page * paginator.get_page_size(self.request)
+
+    def order_recipes(self, queryset, field_name, ordering):
+        """
+        Сортирует рецепты по популярности, не меняя их набор.
+        Без фильтров, кроме тегов, страницы внутри кешированного top-N
+        по тегам упорядочены по нему, остальные рецепты идут следом.
+        Страницы за пределами top-N сортируются по оценке в базе.
+        """
+        ordered = queryset.order_by('-popularity', '-pub_date')
+        other_filters = ('author', 'favorite_filter', 'shopping_cart_filter')
+        if any(self.form.cleaned_data.get(name) for name in other_filters):
+            return ordered
+        top_ids = get_top_recipe_ids(
+            self.request.query_params.getlist('tags')
+        )
+        page_end = self.get_page_end()
+        if page_end is None or page_end > len(top_ids):
+            return ordered
+        return queryset.order_by(Case(
+            *(When(id=recipe_id, then=position)
+              for position, recipe_id in enumerate(top_ids[:page_end])),
+            default=Value(page_end),
+            output_field=IntegerField(),
+        ), '-popularity', '-pub_date')
+
 
 class IngredientFilter(FilterSet):
     """Фильтр для ингредиектов."""
@@ -0,0 +1,145 @@
+import hashlib
+import json
+import time
+
+from django.core.cache import cache
+from django.core.files.uploadedfile import UploadedFile
+from django.http import HttpResponse
+from django.utils.datastructures import MultiValueDict
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+
+from foodgram.constants import (IDEMPOTENCY_KEY_MAX_LENGTH,
+                                IDEMPOTENCY_LOCK_TIMEOUT, IDEMPOTENCY_POLL)
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+STORED_HEADERS = ('Location', 'Vary', 'Allow')
+
+
+class IdempotentReplay(Exception):
+    """Сохраненный ответ, который возвращается вместо повторной работы."""
+
+    def __init__(self, response):
+        super().__init__()
+        self.response = response
+
+
+class IdempotencyKeyReused(APIException):
+    status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+    default_detail = (
+        'Ключ идемпотентности уже использован для другого запроса.'
+    )
+    default_code = 'idempotency_key_reused'
+
+
+class IdempotencyInProgress(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'Запрос c этим ключом идемпотентности еще выполняется.'
+    default_code = 'idempotency_in_progress'
+
+
+def get_idempotency_key(request):
+    """
+    Ключ кеша для заголовка Idempotency-Key авторизованного
+    пользователя или None, если ответ сохранять не нужно.
+    """
+    value = request.headers.get(IDEMPOTENCY_HEADER)
+    if value is None or not request.user.is_authenticated:
+        return None
+    if not value or len(value) > IDEMPOTENCY_KEY_MAX_LENGTH:
+        raise ValidationError({IDEMPOTENCY_HEADER: (
+            f'Нужна строка длиной от 1 до {IDEMPOTENCY_KEY_MAX_LENGTH}.'
+        )})
+    digest = hashlib.sha256(value.encode()).hexdigest()
+    return f'idempotency:{request.user.pk}:{digest}'
+
+
+def describe_file(value):
+    """Файл в отпечатке - имя и размер, содержимое не читается."""
+    if isinstance(value, UploadedFile):
+        return {'name': value.name, 'size': value.size}
+    raise TypeError(f'{type(value).__name__} не сериализуется в JSON')
+
+
+def get_fingerprint(request):
+    """
+    Отпечаток запроса: метод, адрес и sha256 разобранного тела.
+    У multipart учитываются обычные поля и имена и размеры файлов,
+    чтобы не читать в память потоковые загрузки изображений.
+    """
+    data = request.data
+    if isinstance(data, MultiValueDict):
+        data = dict(data.lists())
+    body = json.dumps(
+        data, sort_keys=True, ensure_ascii=False, default=describe_file
+    )
+    digest = hashlib.sha256(body.encode()).hexdigest()
+    return f'{request.method} {request.get_full_path()} {digest}'
+
+
+def to_entry(response, fingerprint):
+    return {
+        'fingerprint': fingerprint,
+        'status': response.status_code,
+        'content': response.content,
+        'content_type': response['Content-Type'],
+        'headers': {
+            header: response[header]
+            for header in STORED_HEADERS if response.has_header(header)
+        },
+    }
+
+
+def from_entry(entry):
+    response = HttpResponse(
+        entry['content'], content_type=entry['content_type'],
+        status=entry['status'],
+    )
+    for header, value in entry['headers'].items():
+        response[header] = value
+    response[REPLAYED_HEADER] = 'true'
+    return response
+
+
+def is_storable(response):
+    """
+    Сохраняются только успешные ответы: отказ в доступе, ошибка
+    валидации, троттлинг или ошибка сервера не занимают ключ,
+    и повтор c исправленным запросом выполняется заново.
+    """
+    return status.is_success(response.status_code)
+
+
+def acquire(key, fingerprint):
+    """
+    Берет блокировку ключа через cache.add и возвращает ее ключ.
+    Если ответ уже сохранен, бросает IdempotentReplay c ним.
+    Одновременный повтор ждет, пока первый запрос сохранит ответ,
+    но не дольше IDEMPOTENCY_LOCK_TIMEOUT. Если первый запрос
+    завершился без сохранения, работу выполняет ожидающий.
+    """
+    lock_key = f'{key}:lock'
+    deadline = time.monotonic() + IDEMPOTENCY_LOCK_TIMEOUT
+    while True:
+        entry = cache.get(key)
+        if entry is not None:
+            if entry['fingerprint'] != fingerprint:
+                raise IdempotencyKeyReused
+            raise IdempotentReplay(from_entry(entry))
+        if cache.add(lock_key, fingerprint, IDEMPOTENCY_LOCK_TIMEOUT):
+            return lock_key
+        if time.monotonic() >= deadline:
+            raise IdempotencyInProgress
+        time.sleep(IDEMPOTENCY_POLL)
+
+
+def release(key, lock_key, fingerprint, response, timeout):
+    """Сохраняет ответ на timeout секунд и снимает блокировку."""
+    try:
+        if is_storable(response):
+            if hasattr(response, 'render') and not response.is_rendered:
+                response.render()
+            cache.set(key, to_entry(response, fingerprint), timeout)
+    finally:
+        cache.delete(lock_key)
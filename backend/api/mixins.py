@@ -1,7 +1,197 @@
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import permissions
+from rest_framework.exceptions import APIException, ValidationError
 from rest_framework.mixins import CreateModelMixin, DestroyModelMixin
 from rest_framework.viewsets import GenericViewSet
 
+from api.conditional import etag_matches, not_modified_response
+from api.idempotency import (IdempotentReplay, acquire, get_fingerprint,
+                             get_idempotency_key, release)
+from api.response_cache import (from_cache_entry, get_cache_key,
+                                get_or_build, is_cacheable_request)
+from foodgram.constants import RESPONSE_CACHE_TTL
+
 
 class CreateDestroyViewSet(CreateModelMixin, DestroyModelMixin,
                            GenericViewSet):
     pass
+
+
+class SparseFieldsetsMixin:
+    """
+    Выборочные поля ответа: ?fields=id,name или ?omit=text.
+    Набор полей передается в сериализатор, а вьюсет по нему
+    облегчает queryset в get_queryset.
+    """
+    fields_param = 'fields'
+    omit_param = 'omit'
+
+    def _parse_fields_param(self, name, allowed):
+        value = self.request.query_params.get(name, '')
+        requested = [field for field in value.split(',') if field]
+        unknown = [field for field in requested if field not in allowed]
+        if unknown:
+            raise ValidationError(
+                {name: f'Неизвестные поля: {", ".join(unknown)}.'}
+            )
+        return requested
+
+    def get_sparse_fields(self):
+        """
+        Возвращает список выбранных полей в порядке сериализатора
+        или None, если ответ нужен целиком.
+        """
+        if hasattr(self, '_sparse_fields'):
+            return self._sparse_fields
+        self._sparse_fields = None
+        if self.request.method not in permissions.SAFE_METHODS:
+            return None
+        allowed = self.get_serializer_class().Meta.fields
+        fields = self._parse_fields_param(self.fields_param, allowed)
+        omit = self._parse_fields_param(self.omit_param, allowed)
+        if fields or omit:
+            self._sparse_fields = [
+                field for field in allowed
+                if (not fields or field in fields) and field not in omit
+            ]
+        return self._sparse_fields
+
+    def is_field_requested(self, field):
+        fields = self.get_sparse_fields()
+        return fields is None or field in fields
+
+    def get_serializer(self, *args, **kwargs):
+        fields = self.get_sparse_fields()
+        if fields is not None:
+            kwargs.setdefault('fields', fields)
+        return super().get_serializer(*args, **kwargs)
+
+
+class RateLimitHeadersMixin:
+    """
+    Добавляет в ответ остаток самой строгой корзины токенов:
+    заголовки X-RateLimit-Limit и X-RateLimit-Remaining.
+    """
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(
+            request, response, *args, **kwargs
+        )
+        budgets = getattr(request, 'throttle_budgets', None)
+        if budgets:
+            limit, remaining = min(budgets, key=lambda budget: budget[1])
+            response['X-RateLimit-Limit'] = limit
+            response['X-RateLimit-Remaining'] = remaining
+        return response
+
+
+class AnonymousResponseCacheMixin:
+    """
+    Кеширует готовые байты ответов анонимным пользователям.
+    Проверка идет до сериализации DRF; ключ зависит от нормализованной
+    строки запроса и поколения response_cache_namespace, которое
+    меняется при записи в модели. Выключается настройкой RESPONSE_CACHE.
+    """
+    response_cache_namespace = None
+    response_cache_actions = ('list', 'retrieve')
+    response_cache_ttl = RESPONSE_CACHE_TTL
+
+    def is_anonymous(self, request, *args, **kwargs):
+        """
+        Аноним по итогам аутентификации DRF, а не только по отсутствию
+        заголовка Authorization: пользователь, вошедший другим способом,
+        не должен получить чужие байты из кеша или положить туда свои.
+        """
+        drf_request = self.initialize_request(request, *args, **kwargs)
+        try:
+            return (
+                drf_request.auth is None
+                and not drf_request.user.is_authenticated
+            )
+        except APIException:
+            return False
+
+    def dispatch(self, request, *args, **kwargs):
+        action = getattr(self, 'action_map', {}).get(request.method.lower())
+        if (
+            not settings.RESPONSE_CACHE
+            or action not in self.response_cache_actions
+            or not is_cacheable_request(request)
+            or not self.is_anonymous(request, *args, **kwargs)
+        ):
+            return super().dispatch(request, *args, **kwargs)
+
+        def build():
+            response = super(AnonymousResponseCacheMixin, self).dispatch(
+                request, *args, **kwargs
+            )
+            if hasattr(response, 'render') and not response.is_rendered:
+                response.render()
+            return response
+
+        key = get_cache_key(request, self.response_cache_namespace)
+        if_none_match = request.META.pop('HTTP_IF_NONE_MATCH', None)
+        try:
+            entry, response = get_or_build(
+                key, build, self.response_cache_ttl
+            )
+        finally:
+            if if_none_match is not None:
+                request.META['HTTP_IF_NONE_MATCH'] = if_none_match
+        if entry is None:
+            return response
+        if response is None:
+            return from_cache_entry(request, entry)
+        etag = entry['headers'].get('ETag')
+        if etag and etag_matches(request, etag):
+            return not_modified_response(etag)
+        response['X-Cache'] = 'MISS'
+        return response
+
+
+class IdempotencyMixin:
+    """
+    Заголовок Idempotency-Key для POST-запросов авторизованных
+    пользователей. Ответ сохраняется в кеш по (пользователь, ключ)
+    на IDEMPOTENCY_TTL секунд, повтор c тем же ключом получает его
+    c заголовком Idempotent-Replayed, не выполняя запрос заново.
+    Тот же ключ c другим телом запроса получает 422.
+    Ключ проверяется после аутентификации и проверки прав, но до
+    троттлинга, чтобы повторы не тратили лимит.
+    """
+    idempotency_lock = None
+
+    def check_throttles(self, request):
+        if request.method == 'POST':
+            key = get_idempotency_key(request)
+            if key is not None:
+                fingerprint = get_fingerprint(request)
+                self.idempotency_lock = (
+                    key, acquire(key, fingerprint), fingerprint
+                )
+        super().check_throttles(request)
+
+    def handle_exception(self, exc):
+        if isinstance(exc, IdempotentReplay):
+            return exc.response
+        try:
+            return super().handle_exception(exc)
+        except Exception:
+            if self.idempotency_lock is not None:
+                cache.delete(self.idempotency_lock[1])
+                self.idempotency_lock = None
+            raise
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(
+            request, response, *args, **kwargs
+        )
+        if self.idempotency_lock is not None:
+            key, lock_key, fingerprint = self.idempotency_lock
+            self.idempotency_lock = None
+            release(
+                key, lock_key, fingerprint, response,
+                settings.IDEMPOTENCY_TTL,
+            )
+        return response
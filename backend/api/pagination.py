@@ -1,8 +1,143 @@
-from rest_framework.pagination import PageNumberPagination
+import hashlib
+from functools import partial
 
-from foodgram.constants import PAGE_SIZE
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from django.core.paginator import Paginator
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import (Cursor, CursorPagination,
+                                       PageNumberPagination)
+from rest_framework.utils.urls import remove_query_param
+
+from foodgram.cache import get_generation
+from foodgram.constants import (COUNT_CACHE_TTL, ESTIMATED_COUNT_THRESHOLD,
+                                PAGE_SIZE)
+from foodgram.db import estimate_count
+from recipes.feed import get_feed_page
+
+
+class CachedCountPaginator(Paginator):
+    """
+    Пагинатор c кешированием числа объектов.
+    Число хранится по отпечатку SQL запроса без сортировки и аннотаций
+    в пространстве имен namespace и сбрасывается вместе c ним при записи.
+    Если оценка планировщика больше ESTIMATED_COUNT_THRESHOLD,
+    точный COUNT(*) не выполняется.
+    """
+
+    def __init__(self, *args, namespace=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.namespace = namespace
+
+    def get_count(self):
+        count_queryset = self.object_list.order_by().values('pk')
+        estimate = estimate_count(count_queryset)
+        if estimate is not None and estimate >= ESTIMATED_COUNT_THRESHOLD:
+            return estimate
+        return super().count
+
+    @cached_property
+    def count(self):
+        if self.namespace is None:
+            return self.get_count()
+        try:
+            sql = str(self.object_list.order_by().values('pk').query)
+        except EmptyResultSet:
+            return 0
+        key = (
+            f'{self.namespace}:count:{get_generation(self.namespace)}:'
+            f'{hashlib.md5(sql.encode()).hexdigest()}'
+        )
+        count = cache.get(key)
+        if count is None:
+            count = self.get_count()
+            cache.set(key, count, COUNT_CACHE_TTL)
+        return count
 
 
 class CustomPagination(PageNumberPagination):
+    """
+    Постраничная пагинация c кешированным числом объектов.
+    Пространство имен кеша берется из view.get_count_cache_namespace(),
+    если представление его не задает, число не кешируется.
+    """
     page_size_query_param = 'limit'
     page_size = PAGE_SIZE
+    count_cache_namespace = None
+
+    @property
+    def django_paginator_class(self):
+        return partial(
+            CachedCountPaginator, namespace=self.count_cache_namespace
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        get_namespace = getattr(view, 'get_count_cache_namespace', None)
+        self.count_cache_namespace = get_namespace() if get_namespace else None
+        return super().paginate_queryset(queryset, request, view)
+
+
+class FeedPagination(CursorPagination):
+    """
+    Курсорная пагинация ленты по ключу (дата публикации, id рецепта).
+    Ключи страницы отдает recipes.feed.get_feed_page, курсор хранит
+    ключ границы и направление. Ссылки ведут к более старым (next)
+    и более новым (previous) рецептам.
+    """
+    page_size_query_param = 'limit'
+    page_size = PAGE_SIZE
+    ordering = ('-pub_date', '-id')
+
+    def decode_position(self, position):
+        pub_date, _, recipe_id = position.rpartition('|')
+        pub_date = parse_datetime(pub_date)
+        if pub_date is None:
+            raise ValueError(position)
+        return pub_date, int(recipe_id)
+
+    def get_link(self, key, reverse):
+        if key is None:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(Cursor(
+            offset=0, reverse=reverse,
+            position=f'{key[0].isoformat()}|{key[1]}',
+        ))
+
+    def paginate_feed(self, request, user):
+        """id рецептов страницы ленты пользователя от новых к старым."""
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        cursor = self.decode_cursor(request)
+        reverse = cursor is not None and cursor.reverse
+        boundary = None
+        if cursor is not None:
+            try:
+                boundary = self.decode_position(cursor.position or '')
+            except ValueError:
+                raise NotFound(self.invalid_cursor_message)
+        keys = get_feed_page(user, boundary, self.page_size + 1, reverse)
+        has_more = len(keys) > self.page_size
+        keys = keys[:self.page_size]
+        if reverse:
+            keys.reverse()
+        has_older = reverse or has_more
+        has_newer = has_more if reverse else boundary is not None
+        self.next_link = self.previous_link = None
+        if keys:
+            if has_older:
+                self.next_link = self.get_link(keys[-1], False)
+            if has_newer:
+                self.previous_link = self.get_link(keys[0], True)
+        elif reverse:
+            self.next_link = self.get_link(None, False)
+        elif boundary is not None:
+            self.previous_link = self.get_link(boundary, True)
+        return [recipe_id for _, recipe_id in keys]
+
+    def get_next_link(self):
+        return self.next_link
+
+    def get_previous_link(self):
+        return self.previous_link
@@ -0,0 +1,43 @@
+import json
+
+from django.utils.datastructures import MultiValueDict
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import DataAndFiles, MultiPartParser
+
+
+class JSONPartData(dict):
+    """
+    Поля из JSON-части запроса. Request.data дополняет их файлами
+    через copy() и update(): файл подставляется значением, а не
+    списком, как при обновлении обычного словаря MultiValueDict.
+    """
+
+    def copy(self):
+        return type(self)(self)
+
+    def update(self, other=(), **kwargs):
+        if isinstance(other, MultiValueDict):
+            other = other.dict()
+        super().update(other, **kwargs)
+
+
+class MultiPartJSONParser(MultiPartParser):
+    """
+    multipart/form-data для вложенных данных: поля передаются JSON
+    в части data, файлы - отдельными частями c именем поля
+    (например, image). Файлы пишутся на диск потоком обработчиками
+    из FILE_UPLOAD_HANDLERS. Запрос без части data разбирается
+    как обычная форма.
+    """
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        result = super().parse(stream, media_type, parser_context)
+        if 'data' not in result.data:
+            return result
+        try:
+            data = json.loads(result.data['data'])
+        except ValueError as error:
+            raise ParseError(f'Некорректный JSON в поле data: {error}')
+        if not isinstance(data, dict):
+            raise ParseError('Поле data должно содержать объект.')
+        return DataAndFiles(JSONPartData(data), result.files)
@@ -0,0 +1,97 @@
+import hashlib
+import time
+from urllib.parse import urlencode
+
+from django.core.cache import cache
+from django.http import HttpResponse
+
+from api.conditional import etag_matches, not_modified_response
+from foodgram.cache import get_generation
+from foodgram.constants import (RESPONSE_CACHE_LOCK_TIMEOUT,
+                                RESPONSE_CACHE_POLL)
+
+CACHEABLE_ACCEPT = ('', '*/*', 'application/json')
+STORED_HEADERS = ('ETag', 'Vary', 'Allow')
+
+
+def is_cacheable_request(request):
+    """
+    Кешируются только GET-запросы без токена, ответ на которые
+    будет обычным JSON, а не страницей browsable API.
+    """
+    return (
+        request.method == 'GET'
+        and 'HTTP_AUTHORIZATION' not in request.META
+        and request.META.get('HTTP_ACCEPT', '').strip() in CACHEABLE_ACCEPT
+    )
+
+
+def get_cache_key(request, namespace):
+    """
+    Ключ из нормализованного адреса: параметры и их значения
+    отсортированы, в ключ входят хост и поколение пространства имен.
+    """
+    query = urlencode(sorted(
+        (name, value)
+        for name, values in request.GET.lists()
+        for value in values
+    ))
+    url = f'{request.scheme}://{request.get_host()}{request.path}?{query}'
+    digest = hashlib.md5(url.encode()).hexdigest()
+    return f'{namespace}:response:{get_generation(namespace)}:{digest}'
+
+
+def to_cache_entry(response):
+    return {
+        'content': response.content,
+        'content_type': response['Content-Type'],
+        'headers': {
+            header: response[header]
+            for header in STORED_HEADERS if response.has_header(header)
+        },
+    }
+
+
+def from_cache_entry(request, entry):
+    etag = entry['headers'].get('ETag')
+    if etag and etag_matches(request, etag):
+        return not_modified_response(etag)
+    response = HttpResponse(
+        entry['content'], content_type=entry['content_type']
+    )
+    for header, value in entry['headers'].items():
+        response[header] = value
+    response['X-Cache'] = 'HIT'
+    return response
+
+
+def get_or_build(key, build, timeout):
+    """
+    Достает готовый ответ из кеша или строит его.
+    Одновременные промахи склеиваются: ответ строит только тот,
+    кто взял блокировку через cache.add, остальные ждут его результат
+    не дольше RESPONSE_CACHE_LOCK_TIMEOUT и лишь затем строят сами.
+    Возвращает (запись, построенный ответ или None).
+    """
+    entry = cache.get(key)
+    if entry is not None:
+        return entry, None
+    lock_key = f'{key}:lock'
+    if not cache.add(lock_key, 1, RESPONSE_CACHE_LOCK_TIMEOUT):
+        deadline = time.monotonic() + RESPONSE_CACHE_LOCK_TIMEOUT
+        while time.monotonic() < deadline:
+            time.sleep(RESPONSE_CACHE_POLL)
+            entry = cache.get(key)
+            if entry is not None:
+                return entry, None
+            if cache.get(lock_key) is None:
+                break
+    try:
+        response = build()
+        if response.status_code != 200:
+            return None, response
+        entry = to_cache_entry(response)
+        cache.set(key, entry, timeout)
+        return entry, response
+    finally:
+        cache.delete(lock_key)
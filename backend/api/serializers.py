@@ -1,22 +1,48 @@
 import base64
+import binascii
+import os
+import tempfile
 import uuid
 
-from django.core.files.base import ContentFile
+from django.conf import settings
+from django.core.files import File
+from django.core.files.uploadedfile import UploadedFile
+from django.db import transaction
 from djoser.serializers import UserCreateSerializer as CreateSerializer
 from djoser.serializers import UserSerializer
 from rest_framework import serializers
 
-from api.validators import (validate_favorite, validate_password,
-                            validate_recipe, validate_shopping_cart,
-                            validate_subscription)
-from foodgram.constants import MAX_IMAGES, MAX_UNIT, MIN_UNIT, NULL, PASS
+from api.validators import validate_password, validate_recipe
+from foodgram.constants import (BASE64_CHUNK_SIZE, MAX_BATCH_SIZE,
+                                MAX_IMAGES, MAX_SERVINGS, MAX_UNIT, MIN_UNIT,
+                                PASS)
 from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
                             ShoppingCart, Tag)
-from users.models import CustomUser, Subscription
+from recipes.snapshots import build_snapshots, from_snapshot
+from users.models import CustomUser
+
+
+class SparseFieldsMixin:
+    """Позволяет оставить в сериализаторе только поля из fields."""
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
 
 
 class Base64ImageField(serializers.ImageField):
-    """Загрузка изображения в формате Base64 и конвертация их в файлы."""
+    """
+    Изображение в формате Base64 или файлом из multipart-запроса.
+    Base64 декодируется кусками по BASE64_CHUNK_SIZE символов сразу
+    во временный файл на диске, поэтому в памяти не лежат одновременно
+    строка и декодированная копия изображения.
+    """
+    default_error_messages = {
+        'invalid_base64': 'Некорректное изображение в формате Base64.',
+    }
+
     def __init__(self, *args, **kwargs):
         self.file_prefix = kwargs.pop('file_prefix', 'file')
         self.max_filename_length = kwargs.pop(
@@ -24,12 +50,41 @@ class Base64ImageField(serializers.ImageField):
         )
         super().__init__(*args, **kwargs)
 
+    def decode(self, data):
+        header_end = data.find(';base64,')
+        if header_end == -1:
+            self.fail('invalid_base64')
+        ext = data[:header_end].split('/')[-1]
+        image = File(
+            tempfile.TemporaryFile(dir=settings.FILE_UPLOAD_TEMP_DIR),
+            name=f'{self.file_prefix}_{uuid.uuid4()}.{ext}',
+        )
+        carry = ''
+        try:
+            for start in range(
+                header_end + len(';base64,'), len(data), BASE64_CHUNK_SIZE
+            ):
+                chunk = carry + ''.join(
+                    data[start:start + BASE64_CHUNK_SIZE].split()
+                )
+                usable = len(chunk) - len(chunk) % 4
+                image.write(base64.b64decode(chunk[:usable], validate=True))
+                carry = chunk[usable:]
+        except (binascii.Error, ValueError):
+            image.close()
+            self.fail('invalid_base64')
+        if carry:
+            image.close()
+            self.fail('invalid_base64')
+        image.seek(0)
+        return image
+
     def to_internal_value(self, data):
         if isinstance(data, str) and data.startswith('data:image'):
-            format, imgstr = data.split(';base64,')
-            ext = format.split('/')[-1]
-            filename = f'{self.file_prefix}_{uuid.uuid4()}.{ext}'
-            data = ContentFile(base64.b64decode(imgstr), name=filename)
+            data = self.decode(data)
+        elif isinstance(data, UploadedFile):
+            ext = os.path.splitext(data.name)[1]
+            data.name = f'{self.file_prefix}_{uuid.uuid4()}{ext}'
         return super().to_internal_value(data)
 
 
@@ -66,7 +121,7 @@ class CustomUserCreateSerializer(CreateSerializer):
         return validate_password(self, data)
 
 
-class CustomUserSerializer(UserSerializer):
+class CustomUserSerializer(SparseFieldsMixin, UserSerializer):
     """Кастомный сериализатор для просмотра пользователя."""
     is_subscribed = serializers.SerializerMethodField()
     avatar = Base64ImageField(allow_null=True, required=False)
@@ -77,10 +132,12 @@ class CustomUserSerializer(UserSerializer):
                   'last_name', 'avatar', 'is_subscribed', )
 
     def get_is_subscribed(self, author):
+        if hasattr(author, 'is_subscribed'):
+            return author.is_subscribed
         user = self.context.get('request').user
         return (
             user.is_authenticated
-            and user.subscriber.filter(author=author).exists()
+            and user.subscribers.filter(author=author).exists()
         )
 
 
@@ -121,14 +178,11 @@ class RecipeIngredientWriteSerializer(serializers.ModelSerializer):
         fields = ('id', 'amount')
 
 
-class RecipeReadSerializer(serializers.ModelSerializer):
+class RecipeReadSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Сериализатор для чтения рецептов co всеми связанными данными."""
     author = CustomUserSerializer(read_only=True)
     tag = TagSerializer(many=True, read_only=True)
-    ingredients = RecipeIngredientSerializer(
-        many=True,
-        source='recipe_ingredients'
-    )
+    ingredients = serializers.SerializerMethodField()
     image = Base64ImageField()
     is_favorited = serializers.BooleanField(read_only=True)
     is_in_shopping_cart = serializers.BooleanField(read_only=True)
@@ -142,6 +196,18 @@ class RecipeReadSerializer(serializers.ModelSerializer):
         )
         read_only_fields = fields
 
+    def get_ingredients(self, recipe):
+        """
+        Ингредиенты берутся из снимка в строке рецепта. Для рецептов,
+        снимок которых еще не собран, они читаются из связей.
+        """
+        if recipe.ingredients_snapshot is None:
+            return RecipeIngredientSerializer(
+                recipe.recipe_ingredients.select_related('ingredient'),
+                many=True
+            ).data
+        return from_snapshot(recipe.ingredients_snapshot)
+
 
 class RecipeWriteSerializer(serializers.ModelSerializer):
     """"Сериализатор для создания/обновления рецептов."""
@@ -163,31 +229,42 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
     def validate_recipe(self, value):
         return validate_recipe(self, value)
 
+    @transaction.atomic
     def create(self, validated_data):
-        """Создает рецепт c ингредиентами и тегами."""
+        """Создает рецепт c ингредиентами, тегами и снимком ингредиентов."""
         ingredients_data = validated_data.pop('ingredients')
         tag_data = validated_data.pop('tag')
-        recipe = Recipe.objects.create(
-            author=self.context['request'].user,
-            **validated_data
-        )
-        recipe.tags.set(tag_data)
+        recipe = Recipe.objects.create(**validated_data)
+        recipe.tag.set(tag_data)
         self._create_recipe_ingredients(recipe, ingredients_data)
+        recipe.save(update_fields=['ingredients_snapshot'])
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
-        """Обновляет рецепт, ингредиенты и теги."""
+        """
+        Обновляет рецепт, ингредиенты и теги. Новый снимок
+        ингредиентов сохраняется вместе c остальными полями.
+        Сохраняются только измененные поля: popularity меняется
+        в базе параллельно, и устаревшее значение экземпляра
+        не должно ее перезаписать.
+        """
         ingredients_data = validated_data.pop('ingredients', None)
         tag_data = validated_data.pop('tag', None)
         if tag_data is not None:
             instance.tag.set(tag_data)
+        update_fields = [*validated_data, 'updated_at', 'revision']
         if ingredients_data is not None:
             instance.recipe_ingredients.all().delete()
             self._create_recipe_ingredients(instance, ingredients_data)
-        return super().update(instance, validated_data)
+            update_fields.append('ingredients_snapshot')
+        for field, value in validated_data.items():
+            setattr(instance, field, value)
+        instance.save(update_fields=update_fields)
+        return instance
 
     def _create_recipe_ingredients(self, recipe, ingredients_data):
-        """Создает связи между рецептом и ингредиентами."""
+        """Создает связи между рецептом и ингредиентами и их снимок."""
         RecipeIngredient.objects.bulk_create([
             RecipeIngredient(
                 recipe=recipe,
@@ -196,6 +273,7 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
             )
             for item in ingredients_data
         ])
+        recipe.ingredients_snapshot = build_snapshots([recipe.pk])[recipe.pk]
 
     def to_representation(self, instance):
         """Возвращает данные через сериализатор чтения рецептов."""
@@ -212,27 +290,10 @@ class MiniRecipeSerializer(serializers.ModelSerializer):
         read_only_fields = fields
 
 
-class SubscriptionSerializer(serializers.ModelSerializer):
-    """Сериализатор для создания подписок."""
-    class Meta:
-        model = Subscription
-        fields = ('user', 'author')
-
-    def validate_author(self, data):
-        return validate_subscription(self, data)
-
-    def to_representation(self, instance):
-        """Возвращает данные через сериализатор получения информации."""
-        request = self.context.get('request')
-        return SubscriptionGetSerializer(
-            instance.author, context={'request': request}
-        ).data
-
-
 class SubscriptionGetSerializer(serializers.ModelSerializer):
     """Сериализатор для получения информации o подписках."""
     recipes = serializers.SerializerMethodField(method_name='get_recipes')
-    recipes_count = serializers.SerializerMethodField(default=NULL)
+    recipes_count = serializers.IntegerField(read_only=True)
     is_subscribed = serializers.BooleanField(default=True)
 
     class Meta:
@@ -266,13 +327,11 @@ class FavoriteSerializer(serializers.ModelSerializer):
             'recipe': {'write_only': True},
         }
 
-    def validate(self, data):
-        return validate_favorite(self, data)
-
     def to_representation(self, instance):
         """Возвращает упрощенные данные рецепта."""
         return MiniRecipeSerializer(
-            instance.recipe
+            instance.recipe,
+            context={'request': self.context.get('request')}
         ).data
 
 
@@ -280,14 +339,83 @@ class ShoppingCartSerializer(serializers.ModelSerializer):
     """Сериализатор для добавления рецептов в корзину."""
     class Meta:
         model = ShoppingCart
-        fields = ('user', 'recipe',)
-
-    def validate(self, data):
-        return validate_shopping_cart(self, data)
+        fields = ('user', 'recipe', 'servings')
 
     def to_representation(self, instance):
-        """Возвращает упрощенные данные рецепта."""
-        return MiniRecipeSerializer(
+        """Возвращает упрощенные данные рецепта и число порций."""
+        data = MiniRecipeSerializer(
             instance.recipe,
             context={'request': self.context.get('request')}
         ).data
+        data['servings'] = instance.servings
+        return data
+
+
+class ServingsSerializer(serializers.Serializer):
+    """Число порций рецепта в корзине."""
+    servings = serializers.IntegerField(
+        min_value=MIN_UNIT, max_value=MAX_SERVINGS, default=MIN_UNIT
+    )
+
+
+class ServingsUpdateSerializer(ServingsSerializer):
+    """Новое число порций рецепта в корзине, без значения по умолчанию."""
+    servings = serializers.IntegerField(
+        min_value=MIN_UNIT, max_value=MAX_SERVINGS
+    )
+
+
+class MealPlanItemSerializer(ServingsSerializer):
+    """Рецепт плана питания c числом порций."""
+    id = serializers.IntegerField(min_value=MIN_UNIT)
+
+
+class MealPlanSerializer(serializers.Serializer):
+    """План питания для списка покупок без корзины."""
+    recipes = MealPlanItemSerializer(many=True, allow_empty=False)
+
+    def validate_recipes(self, value):
+        """
+        Возвращает {id рецепта: порции}; порции повторяющегося
+        рецепта складываются. Рецептов не больше RECIPE_IDS_LIMIT.
+        """
+        servings = {}
+        for item in value:
+            servings[item['id']] = (
+                servings.get(item['id'], 0) + item['servings']
+            )
+        if len(servings) > settings.RECIPE_IDS_LIMIT:
+            raise serializers.ValidationError(
+                f'Не больше {settings.RECIPE_IDS_LIMIT} рецептов за запрос.'
+            )
+        return servings
+
+
+class RecipeBatchSerializer(serializers.Serializer):
+    """Сериализатор списка id рецептов для пакетных операций."""
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=MIN_UNIT),
+        allow_empty=False,
+        max_length=MAX_BATCH_SIZE,
+    )
+
+    def validate_recipes(self, value):
+        """Убирает повторы, сохраняя порядок."""
+        return list(dict.fromkeys(value))
+
+
+class RecipeIdsSerializer(serializers.Serializer):
+    """Список id рецептов для выборки, не длиннее RECIPE_IDS_LIMIT."""
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=MIN_UNIT),
+        allow_empty=False,
+    )
+
+    def validate_ids(self, value):
+        """Убирает повторы, сохраняя порядок, и проверяет лимит."""
+        value = list(dict.fromkeys(value))
+        if len(value) > settings.RECIPE_IDS_LIMIT:
+            raise serializers.ValidationError(
+                f'Не больше {settings.RECIPE_IDS_LIMIT} рецептов за запрос.'
+            )
+        return value
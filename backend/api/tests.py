@@ -0,0 +1,735 @@
+import base64
+import importlib.util
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.serializers import RecipeWriteSerializer
+from api.throttling import TokenBucketStore
+from foodgram.cache import get_generation
+from foodgram import settings as settings_module
+from foodgram.constants import POPULARITY_HALF_LIFE
+from foodgram.memprofile import MemoryProfileMiddleware, read_reports
+from recipes.admin import RecipeAdmin
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart, Tag)
+from recipes.popularity import get_top_recipe_ids, rebase_popularity
+from recipes.snapshots import write_snapshots
+from users.models import CustomUser, Subscription
+
+
+def create_user(name):
+    return CustomUser.objects.create(
+        email=f'{name}@example.com', username=name,
+        first_name='Имя', last_name='Фамилия',
+    )
+
+
+def create_png(size=2):
+    buffer = io.BytesIO()
+    Image.new('RGB', (size, size)).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+class IsolatedThrottleMixin:
+    """Отдельное хранилище корзин токенов на каждый тест."""
+
+    def isolate_throttles(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        patcher = mock.patch('api.throttling.store', TokenBucketStore(
+            os.path.join(directory.name, 'throttle.sqlite3')
+        ))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+
+class TokenBucketThrottleTests(IsolatedThrottleMixin, TestCase):
+    """Корзины токенов на скачивании списка покупок."""
+
+    def setUp(self):
+        self.isolate_throttles()
+
+    def download(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client.get('/api/recipes/download_shopping_cart/')
+
+    @override_settings(TOKEN_BUCKET_RATES={
+        **settings.TOKEN_BUCKET_RATES,
+        'shopping_cart_download': {'burst': 5, 'rate': '1/hour'},
+        'shopping_cart_download.total': {'burst': 20, 'rate': '1/hour'},
+    })
+    def test_rejected_requests_do_not_drain_scope_bucket(self):
+        abuser, user = create_user('abuser'), create_user('user')
+        statuses = [self.download(abuser).status_code for _ in range(25)]
+        self.assertEqual(statuses.count(200), 5)
+        self.assertEqual(statuses.count(429), 20)
+        self.assertEqual(self.download(user).status_code, 200)
+
+
+class IngredientSearchThrottleTests(IsolatedThrottleMixin, TestCase):
+    """Корзина токенов на поиске ингредиентов и заголовки X-RateLimit."""
+
+    def setUp(self):
+        self.isolate_throttles()
+        self.client = APIClient()
+        self.client.force_authenticate(create_user('cook'))
+
+    @override_settings(TOKEN_BUCKET_RATES={
+        **settings.TOKEN_BUCKET_RATES,
+        'ingredient_search': {'burst': 3, 'rate': '1/hour'},
+    })
+    def test_burst_is_limited_and_refilled(self):
+        url = '/api/ingredients/?name=со'
+        remaining = []
+        for _ in range(3):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response['X-RateLimit-Limit'], '3')
+            remaining.append(response['X-RateLimit-Remaining'])
+        self.assertEqual(remaining, ['2', '1', '0'])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '3600')
+        with mock.patch('time.time', return_value=time.time() + 60 * 60):
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+    @override_settings(TOKEN_BUCKET_RATES={
+        **settings.TOKEN_BUCKET_RATES,
+        'ingredient_search': {'burst': 1, 'rate': '1/hour'},
+    })
+    def test_list_without_search_is_not_limited(self):
+        for _ in range(3):
+            response = self.client.get('/api/ingredients/')
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('X-RateLimit-Remaining', response)
+
+
+class AnonymousResponseCacheTests(TestCase):
+    """Кеш ответов только для анонимов, по итогам аутентификации DRF."""
+    url = '/api/recipes/'
+
+    def setUp(self):
+        cache.clear()
+        self.user = create_user('reader')
+
+    def test_anonymous_responses_are_cached(self):
+        client = APIClient()
+        self.assertEqual(client.get(self.url)['X-Cache'], 'MISS')
+        self.assertEqual(client.get(self.url)['X-Cache'], 'HIT')
+
+    def test_authenticated_responses_bypass_cache(self):
+        APIClient().get(self.url)
+        forced = APIClient()
+        forced.force_authenticate(self.user)
+        token = APIClient()
+        token.credentials(
+            HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=self.user)}'
+        )
+        for client in (forced, token, forced):
+            response = client.get(self.url)
+            self.assertEqual(response.status_code, 200)
+            self.assertFalse(response.has_header('X-Cache'))
+
+    def test_authenticated_responses_are_not_stored(self):
+        forced = APIClient()
+        forced.force_authenticate(self.user)
+        forced.get(self.url)
+        self.assertEqual(APIClient().get(self.url)['X-Cache'], 'MISS')
+
+
+@override_settings(RESPONSE_CACHE=False)
+class RecipeETagTests(IsolatedThrottleMixin, TestCase):
+    """Слабые ETag рецептов и ответы 304."""
+
+    def setUp(self):
+        self.isolate_throttles()
+        cache.clear()
+        self.user = create_user('cook')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe = Recipe.objects.create(
+                author=self.user, name='Рецепт', text='Текст',
+                image='recipes/images/recipe.png', cooking_time=1,
+            )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def assert_not_modified(self, client, url):
+        etag = client.get(url)['ETag']
+        self.assertTrue(etag.startswith('W/"'))
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(response.content, b'')
+        return etag
+
+    def test_unchanged_recipes_are_not_modified(self):
+        for url in (
+            '/api/recipes/',
+            f'/api/recipes/{self.recipe.id}/',
+            f'/api/recipes/?ids={self.recipe.id}',
+        ):
+            for client in (self.client, APIClient()):
+                with self.subTest(url=url, client=client):
+                    self.assert_not_modified(client, url)
+
+    def test_recipe_change_updates_etag(self):
+        url = f'/api/recipes/{self.recipe.id}/'
+        etag = self.assert_not_modified(self.client, url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe.name = 'Новое название'
+            self.recipe.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()['name'], 'Новое название')
+
+    def test_viewer_state_updates_etag(self):
+        etag = self.assert_not_modified(self.client, '/api/recipes/')
+        Favorite.objects.create(user=self.user, recipe=self.recipe)
+        response = self.client.get(
+            '/api/recipes/', HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['results'][0]['is_favorited'])
+
+
+class SparseFieldsetsTests(TestCase):
+    """Выборочные поля ответа: ?fields= и ?omit=."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = create_user('cook')
+        Recipe.objects.create(
+            author=self.user, name='Рецепт', text='Текст',
+            image='recipes/images/recipe.png', cooking_time=1,
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get_keys(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return list(response.json()['results'][0])
+
+    def test_recipe_fields(self):
+        for fast in (True, False):
+            with self.subTest(fast=fast), override_settings(
+                FAST_RECIPE_SERIALIZER=fast
+            ):
+                self.assertEqual(
+                    self.get_keys('/api/recipes/?fields=name,id'),
+                    ['id', 'name'],
+                )
+                self.assertEqual(
+                    self.get_keys(
+                        '/api/recipes/?omit=text,ingredients,author,tag'
+                    ),
+                    ['id', 'name', 'image', 'cooking_time',
+                     'is_favorited', 'is_in_shopping_cart'],
+                )
+
+    def test_user_fields(self):
+        self.assertEqual(
+            self.get_keys('/api/users/?fields=username,is_subscribed'),
+            ['username', 'is_subscribed'],
+        )
+
+    def test_unknown_field_is_rejected(self):
+        for url, param in (
+            ('/api/recipes/?fields=id,secret', 'fields'),
+            ('/api/users/?omit=x', 'omit'),
+        ):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn(param, response.json())
+
+
+class FastRecipeSerializerTests(TestCase):
+    """Быстрый сериализатор рецептов отдает те же байты, что и DRF."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = create_user('reader')
+        authors = [create_user('author'), create_user('chef')]
+        tags = [
+            Tag.objects.create(name=name, slug=slug)
+            for name, slug in (('Завтрак', 'breakfast'), ('Обед', 'lunch'))
+        ]
+        ingredients = [
+            Ingredient.objects.create(name=name, measurement_unit=unit)
+            for name, unit in (('соль', 'г'), ('мука "в/с"', 'кг'))
+        ]
+        cls.recipes = []
+        for number in range(4):
+            recipe = Recipe.objects.create(
+                author=authors[number % 2], name=f'Рецепт №{number}',
+                image=f'recipes/images/{number}.png', cooking_time=number + 1,
+                text='Смешать\u2028и <подать> "горячим"\\ \U0001F373',
+            )
+            recipe.tag.set(tags[:number % 2 + 1])
+            RecipeIngredient.objects.bulk_create([
+                RecipeIngredient(
+                    recipe=recipe, ingredient=ingredient, amount=number + 1
+                )
+                for ingredient in ingredients[:number % 2 + 1]
+            ])
+            cls.recipes.append(recipe)
+        # У последнего рецепта снимка нет: ингредиенты берутся из базы.
+        write_snapshots([recipe.id for recipe in cls.recipes[:-1]])
+        for model in (Favorite, ShoppingCart):
+            model.objects.create(user=cls.reader, recipe=cls.recipes[0])
+        Subscription.objects.create(user=cls.reader, author=authors[1])
+
+    def setUp(self):
+        cache.clear()
+        token = Token.objects.create(user=self.reader)
+        self.reader_client = APIClient()
+        self.reader_client.credentials(HTTP_AUTHORIZATION=f'Token {token}')
+
+    def fetch(self, client, url, fast):
+        with override_settings(FAST_RECIPE_SERIALIZER=fast):
+            response = client.get(url, HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 200, url)
+        return response.content
+
+    def test_fast_and_drf_responses_are_equal(self):
+        first, last = self.recipes[0].id, self.recipes[-1].id
+        urls = (
+            '/api/recipes/',
+            '/api/recipes/?limit=2&page=2',
+            f'/api/recipes/{first}/',
+            f'/api/recipes/{last}/',
+            '/api/recipes/?fields=id,name,is_favorited',
+            '/api/recipes/?omit=text,author',
+            f'/api/recipes/{first}/?fields=ingredients,is_in_shopping_cart',
+            f'/api/recipes/?ids={last},{first}',
+            f'/api/recipes/?ids={last},{first}&fields=id,author',
+        )
+        for name, client in (
+            ('anonymous', APIClient()), ('token', self.reader_client)
+        ):
+            for url in urls:
+                with self.subTest(client=name, url=url):
+                    self.assertEqual(
+                        self.fetch(client, url, True),
+                        self.fetch(client, url, False),
+                    )
+
+
+class PopularOrderingTests(TestCase):
+    """Сортировка по популярности не меняет набор рецептов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = create_user('author')
+        cls.recipes = [
+            Recipe.objects.create(
+                author=author, name=f'Рецепт {number}', text='Текст',
+                image='recipes/images/recipe.png', cooking_time=1,
+                popularity=popularity,
+            )
+            for number, popularity in enumerate((0, 3, 0, 1, 2, 0))
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def get_ids(self, url):
+        ids = []
+        while url:
+            response = APIClient().get(url)
+            self.assertEqual(response.status_code, 200)
+            page = response.json()
+            ids.extend(recipe['id'] for recipe in page['results'])
+            url = page['next']
+        return ids
+
+    def test_all_recipes_are_listed(self):
+        recipes = self.recipes
+        expected = [recipe.id for recipe in (
+            recipes[1], recipes[4], recipes[3],
+            recipes[5], recipes[2], recipes[0],
+        )]
+        for limit in (1, 2, 4, 10):
+            with self.subTest(limit=limit), mock.patch(
+                'recipes.popularity.POPULAR_TOP_N', 2
+            ):
+                self.assertEqual(self.get_ids(
+                    f'/api/recipes/?ordering=popular&limit={limit}'
+                ), expected)
+
+    def test_empty_leaderboard_keeps_recipes(self):
+        Recipe.objects.update(popularity=0)
+        self.assertEqual(
+            len(self.get_ids('/api/recipes/?ordering=popular')),
+            len(self.recipes),
+        )
+
+
+class ShoppingCartServingsTests(TestCase):
+    """Число порций в корзине."""
+
+    def setUp(self):
+        self.user = create_user('cook')
+        self.recipe = Recipe.objects.create(
+            author=self.user, name='Рецепт', text='Текст', cooking_time=1,
+            image='recipes/images/recipe.png',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = f'/api/recipes/{self.recipe.id}/shopping_cart/'
+
+    def test_post_defaults_to_one_serving(self):
+        self.assertEqual(self.client.post(self.url).status_code, 201)
+        self.assertEqual(ShoppingCart.objects.get().servings, 1)
+
+    def test_patch_requires_servings(self):
+        self.client.post(self.url, {'servings': 3}, format='json')
+        response = self.client.patch(self.url, {}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('servings', response.json())
+        self.assertEqual(ShoppingCart.objects.get().servings, 3)
+        response = self.client.patch(self.url, {'servings': 2}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(ShoppingCart.objects.get().servings, 2)
+
+
+class RecipeUpdateTests(TestCase):
+    """Правка рецепта не затирает параллельные изменения популярности."""
+
+    def test_update_keeps_popularity(self):
+        recipe = Recipe.objects.create(
+            author=create_user('author'), name='Рецепт', text='Текст',
+            image='recipes/images/recipe.png', cooking_time=1,
+        )
+        Recipe.objects.filter(id=recipe.id).update(popularity=5.0)
+        serializer = RecipeWriteSerializer(
+            recipe, data={'name': 'Новое название'}, partial=True
+        )
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.name, 'Новое название')
+        self.assertEqual(recipe.popularity, 5.0)
+        self.assertEqual(recipe.revision, 2)
+
+    def test_admin_save_keeps_popularity(self):
+        admin = CustomUser.objects.create_superuser(
+            email='admin@example.com', username='admin', password='pass',
+            first_name='Имя', last_name='Фамилия',
+        )
+        tag = Tag.objects.create(name='Обед', slug='lunch')
+        recipe = Recipe.objects.create(
+            author=admin, name='Рецепт', text='Текст',
+            image='recipes/images/recipe.png', cooking_time=1,
+        )
+        self.client.force_login(admin)
+        save_form = RecipeAdmin.save_form
+
+        def save_form_concurrently(*args, **kwargs):
+            """Оценка меняется, пока админка держит загруженный рецепт."""
+            Recipe.objects.filter(id=recipe.id).update(popularity=5.0)
+            return save_form(*args, **kwargs)
+
+        url = f'/admin/recipes/recipe/{recipe.id}/change/'
+        prefix = 'recipe_ingredients'
+        with mock.patch.object(
+            RecipeAdmin, 'save_form', save_form_concurrently
+        ):
+            response = self.client.post(url, {
+                'author': admin.id, 'name': 'Новое название',
+                'text': 'Текст', 'cooking_time': 2, 'tag': [tag.id],
+                f'{prefix}-TOTAL_FORMS': 0, f'{prefix}-INITIAL_FORMS': 0,
+                f'{prefix}-MIN_NUM_FORMS': 0, f'{prefix}-MAX_NUM_FORMS': 1000,
+            })
+        self.assertEqual(response.status_code, 302, response.content)
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.name, 'Новое название')
+        self.assertEqual(recipe.popularity, 5.0)
+
+
+class IdempotencyTests(IsolatedThrottleMixin, TestCase):
+    """Повтор POST c заголовком Idempotency-Key."""
+    url = '/api/recipes/'
+
+    def setUp(self):
+        self.isolate_throttles()
+        cache.clear()
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        media_settings = override_settings(MEDIA_ROOT=media.name)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+        self.client = APIClient()
+        self.client.force_authenticate(create_user('cook'))
+        self.tag = Tag.objects.create(name='Обед', slug='lunch')
+        self.ingredient = Ingredient.objects.create(
+            name='соль', measurement_unit='г'
+        )
+
+    def payload(self, name='Суп', **extra):
+        return {
+            'name': name, 'text': 'Текст', 'cooking_time': 5,
+            'tag': [self.tag.id],
+            'ingredients': [{'id': self.ingredient.id, 'amount': 1}],
+            **extra,
+        }
+
+    def post(self, data, key='key-1', **kwargs):
+        kwargs.setdefault('format', 'json')
+        return self.client.post(
+            self.url, data, HTTP_IDEMPOTENCY_KEY=key, **kwargs
+        )
+
+    def json_payload(self, name='Суп'):
+        image = base64.b64encode(create_png()).decode()
+        return self.payload(name, image=f'data:image/png;base64,{image}')
+
+    def multipart_payload(self, name='Суп', size=2):
+        return {
+            'data': json.dumps(self.payload(name)),
+            'image': SimpleUploadedFile(
+                'photo.png', create_png(size), content_type='image/png'
+            ),
+        }
+
+    def test_repeated_request_is_replayed(self):
+        first = self.post(self.json_payload())
+        second = self.post(self.json_payload())
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(second.status_code, 201)
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(Recipe.objects.count(), 1)
+
+    def test_same_key_with_different_body_is_rejected(self):
+        self.assertEqual(self.post(self.json_payload()).status_code, 201)
+        response = self.post(self.json_payload('Каша'))
+        self.assertEqual(response.status_code, 422)
+        self.assertFalse(response.has_header('Idempotent-Replayed'))
+        self.assertEqual(
+            list(Recipe.objects.values_list('name', flat=True)), ['Суп']
+        )
+
+    def test_same_key_with_different_file_is_rejected(self):
+        first = self.post(self.multipart_payload(), format='multipart')
+        self.assertEqual(first.status_code, 201)
+        replay = self.post(self.multipart_payload(), format='multipart')
+        self.assertEqual(replay['Idempotent-Replayed'], 'true')
+        response = self.post(
+            self.multipart_payload(size=4), format='multipart'
+        )
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Recipe.objects.count(), 1)
+
+    def test_rejected_request_does_not_take_key(self):
+        invalid = self.post(self.payload())
+        self.assertEqual(invalid.status_code, 400)
+        response = self.post(self.json_payload())
+        self.assertEqual(response.status_code, 201)
+        self.assertFalse(response.has_header('Idempotent-Replayed'))
+        self.assertEqual(Recipe.objects.count(), 1)
+
+
+class BatchFavoriteTests(IsolatedThrottleMixin, TestCase):
+    """Пакетное добавление в избранное и корзину сбрасывает кеш."""
+
+    def setUp(self):
+        self.isolate_throttles()
+        cache.clear()
+        self.user = create_user('cook')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipes = [
+                Recipe.objects.create(
+                    author=self.user, name=f'Рецепт {number}', text='Текст',
+                    image='recipes/images/recipe.png', cooking_time=1,
+                )
+                for number in range(2)
+            ]
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def batch(self, method, url, recipes):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = getattr(self.client, method)(
+                url, {'recipes': [recipe.id for recipe in recipes]},
+                format='json',
+            )
+        self.assertEqual(response.status_code, 200)
+
+    def test_batch_add_invalidates_cache(self):
+        for url, namespace in (
+            ('/api/recipes/favorite/batch/', 'favorites'),
+            ('/api/recipes/shopping_cart/batch/', 'shopping_carts'),
+        ):
+            with self.subTest(url=url):
+                self.assertEqual(get_top_recipe_ids(), [])
+                generation = get_generation(namespace)
+                self.batch('post', url, self.recipes)
+                self.assertNotEqual(get_generation(namespace), generation)
+                self.assertEqual(
+                    set(get_top_recipe_ids()),
+                    {recipe.id for recipe in self.recipes},
+                )
+                self.batch('delete', url, self.recipes)
+                self.assertEqual(get_top_recipe_ids(), [])
+
+
+class PopularityRecordTests(IsolatedThrottleMixin, TestCase):
+    """Удаление из избранного вычитает ровно вклад добавления."""
+
+    def setUp(self):
+        self.isolate_throttles()
+        cache.clear()
+        author = create_user('author')
+        self.recipe = Recipe.objects.create(
+            author=author, name='Рецепт', text='Текст', cooking_time=1,
+            image='recipes/images/recipe.png',
+        )
+        self.clients = []
+        for name in ('first', 'second'):
+            client = APIClient()
+            client.force_authenticate(create_user(name))
+            self.clients.append(client)
+
+    def get_popularity(self):
+        self.recipe.refresh_from_db(fields=['popularity'])
+        return self.recipe.popularity
+
+    def test_remove_after_rebase(self):
+        single = f'/api/recipes/{self.recipe.id}/favorite/'
+        batch = '/api/recipes/favorite/batch/'
+        payload = {'recipes': [self.recipe.id]}
+        for method in ('single', 'batch'):
+            with self.subTest(method=method):
+                Recipe.objects.update(popularity=0)
+                added_at = time.time()
+                for client in self.clients:
+                    if method == 'single':
+                        response = client.post(single)
+                    else:
+                        response = client.post(batch, payload, format='json')
+                    self.assertIn(response.status_code, (200, 201))
+                with mock.patch(
+                    'time.time', return_value=added_at + POPULARITY_HALF_LIFE
+                ):
+                    rebase_popularity()
+                popularity = self.get_popularity()
+                self.assertAlmostEqual(popularity, 1.0, places=3)
+                with mock.patch(
+                    'time.time',
+                    return_value=added_at + 2 * POPULARITY_HALF_LIFE,
+                ):
+                    if method == 'single':
+                        response = self.clients[0].delete(single)
+                    else:
+                        response = self.clients[0].delete(
+                            batch, payload, format='json'
+                        )
+                self.assertIn(response.status_code, (200, 204))
+                self.assertAlmostEqual(self.get_popularity(), popularity / 2)
+                Favorite.objects.all().delete()
+
+
+class ConnectionSettingsTests(TestCase):
+    """Постоянные соединения c базой в зависимости от USE_ASGI."""
+
+    def load_settings(self, **environ):
+        spec = importlib.util.spec_from_file_location(
+            'settings_copy', settings_module.__file__
+        )
+        module = importlib.util.module_from_spec(spec)
+        with mock.patch.dict(os.environ, environ):
+            spec.loader.exec_module(module)
+        return module
+
+    def test_asgi_disables_persistent_connections(self):
+        for use_asgi, conn_max_age in (('False', 60), ('True', 0)):
+            with self.subTest(use_asgi=use_asgi):
+                module = self.load_settings(
+                    USE_ASGI=use_asgi, CONN_MAX_AGE='60'
+                )
+                self.assertEqual(module.CONN_MAX_AGE, conn_max_age)
+                self.assertEqual(
+                    module.DATABASES['default']['CONN_MAX_AGE'],
+                    conn_max_age,
+                )
+
+
+class MemoryProfileTests(TestCase):
+    """Профилирование памяти запросов через tracemalloc."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.request = RequestFactory().get('/api/recipes/')
+
+    def run_middleware(self, get_response):
+        with override_settings(
+            MEMORY_PROFILE_RATE=1, MEMORY_PROFILE_DIR=self.directory,
+            MEMORY_PROFILE_RELEASE='test',
+        ):
+            self.middleware = MemoryProfileMiddleware(get_response)
+        self.assertEqual(self.middleware(self.request).status_code, 200)
+        return read_reports('test', self.directory)
+
+    def test_single_request_is_reported(self):
+        reports = self.run_middleware(lambda request: HttpResponse())
+        [report] = reports
+        self.assertEqual(report['route'], 'GET /api/recipes/')
+        self.assertEqual(report['status'], 200)
+
+    def test_overlapping_request_drops_report(self):
+        def get_response(request):
+            if request is self.request:
+                thread = threading.Thread(
+                    target=self.middleware,
+                    args=(RequestFactory().get('/'),),
+                )
+                thread.start()
+                thread.join()
+            return HttpResponse()
+
+        self.assertEqual(self.run_middleware(get_response), [])
+        self.assertEqual(self.middleware.active, 0)
+
+    def test_threaded_workers_disable_profiling(self):
+        path = os.path.join(settings.BASE_DIR, 'foodgram', 'gunicorn_conf.py')
+        for worker_class, threads, disabled in (
+            ('sync', '1', False), ('sync', '2', True), ('gthread', '4', True),
+        ):
+            with self.subTest(worker_class=worker_class, threads=threads):
+                spec = importlib.util.spec_from_file_location(
+                    'gunicorn_conf_copy', path
+                )
+                module = importlib.util.module_from_spec(spec)
+                with mock.patch.dict(os.environ, {
+                    'GUNICORN_WORKER_CLASS': worker_class,
+                    'GUNICORN_THREADS': threads,
+                    'MEMORY_PROFILE_RATE': '0.5',
+                }):
+                    spec.loader.exec_module(module)
+                    self.assertEqual(
+                        module.memory_profiling_disabled, disabled
+                    )
+                    self.assertEqual(
+                        os.environ['MEMORY_PROFILE_RATE'],
+                        '0' if disabled else '0.5',
+                    )
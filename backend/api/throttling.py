@@ -0,0 +1,144 @@
+import math
+import time
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.throttling import BaseThrottle
+
+from foodgram.constants import THROTTLE_CLEANUP_EVERY
+from foodgram.shared_store import SharedSQLite
+
+PERIODS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 60 * 60 * 24}
+
+
+def parse_rate(rate):
+    """Переводит '30/hour' в число токенов в секунду."""
+    count, period = rate.split('/')
+    return int(count) / PERIODS[period[0]]
+
+
+class TokenBucketStore:
+    """
+    Хранилище корзин токенов в общем файле SQLite.
+    Списание токена выполняется в транзакции BEGIN IMMEDIATE,
+    поэтому атомарно для всех воркеров gunicorn на сервере.
+    """
+
+    def __init__(self, path):
+        self.db = SharedSQLite(path, (
+            'CREATE TABLE IF NOT EXISTS buckets ('
+            'key TEXT PRIMARY KEY, tokens REAL, updated REAL, '
+            'expires REAL)',
+        ))
+        self.calls = 0
+
+    def consume(self, key, capacity, refill_rate):
+        """
+        Пополняет корзину по прошедшему времени и списывает один токен.
+        Возвращает (разрешено, остаток токенов, секунд до нового токена).
+        """
+        now = time.time()
+        with self.db.transaction() as connection:
+            row = connection.execute(
+                'SELECT tokens, updated FROM buckets WHERE key = ?', (key,)
+            ).fetchone()
+            tokens = capacity
+            if row is not None:
+                tokens = min(
+                    capacity, row[0] + (now - row[1]) * refill_rate
+                )
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            connection.execute(
+                'INSERT OR REPLACE INTO buckets VALUES (?, ?, ?, ?)',
+                (key, tokens, now, now + (capacity - tokens) / refill_rate),
+            )
+        self.calls += 1
+        if self.calls % THROTTLE_CLEANUP_EVERY == 0:
+            self.cleanup(now)
+        wait = 0 if allowed else (1 - tokens) / refill_rate
+        return allowed, tokens, wait
+
+    def cleanup(self, now):
+        """Удаляет полностью восстановившиеся корзины."""
+        self.db.execute('DELETE FROM buckets WHERE expires < ?', (now,))
+
+
+store = TokenBucketStore(settings.THROTTLE_STORE)
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Троттлинг по алгоритму token bucket.
+    Параметры берутся из settings.TOKEN_BUCKET_RATES по throttle_scope
+    представления: burst - емкость корзины, rate - скорость пополнения.
+    Остаток токенов сохраняется в request.throttle_budgets
+    для заголовков X-RateLimit-*.
+
+    DRF опрашивает все троттлы запроса, даже если один уже отказал.
+    Поэтому после первого отказа следующие корзины токен не списывают:
+    общая корзина scope стоит последней и тратится только на запросы,
+    которые пропустили корзины пользователя и IP.
+    """
+    scope_suffix = ''
+
+    def get_cache_key(self, request, view):
+        raise NotImplementedError('.get_cache_key() must be overridden')
+
+    def get_rates(self, view):
+        scope = getattr(view, 'throttle_scope', None)
+        try:
+            rates = settings.TOKEN_BUCKET_RATES[scope + self.scope_suffix]
+        except (KeyError, TypeError):
+            raise ImproperlyConfigured(
+                f'Не заданы параметры троттлинга для {scope!r}.'
+            )
+        return scope, rates['burst'], parse_rate(rates['rate'])
+
+    def allow_request(self, request, view):
+        self.scope, self.capacity, refill_rate = self.get_rates(view)
+        key = self.get_cache_key(request, view)
+        if key is None or getattr(request, 'throttle_rejected', False):
+            return True
+        allowed, tokens, self.wait_time = store.consume(
+            f'{self.scope}{self.scope_suffix}:{key}',
+            self.capacity, refill_rate,
+        )
+        budgets = getattr(request, 'throttle_budgets', None)
+        if budgets is None:
+            budgets = request.throttle_budgets = []
+        budgets.append((self.capacity, math.floor(tokens)))
+        if not allowed:
+            request.throttle_rejected = True
+        return allowed
+
+    def wait(self):
+        return self.wait_time
+
+
+class UserTokenBucketThrottle(TokenBucketThrottle):
+    """Корзина на пользователя, для анонимов - на IP."""
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return f'user:{request.user.pk}'
+        return f'ip:{self.get_ident(request)}'
+
+
+class IPTokenBucketThrottle(TokenBucketThrottle):
+    """Корзина на IP-адрес независимо от пользователя."""
+
+    def get_cache_key(self, request, view):
+        return f'ip:{self.get_ident(request)}'
+
+
+class ScopeTokenBucketThrottle(TokenBucketThrottle):
+    """
+    Общая корзина на весь scope: ограничивает суммарную нагрузку
+    от всех клиентов, параметры задаются для '<scope>.total'.
+    """
+    scope_suffix = '.total'
+
+    def get_cache_key(self, request, view):
+        return 'all'
@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
@@ -17,3 +18,19 @@ urlpatterns = [
     path('', include('djoser.urls')),
     path('auth/', include('djoser.urls.authtoken')),
 ]
+
+if settings.USE_ASGI:
+    from api import async_views
+
+    urlpatterns = [
+        path('tags/', async_views.tag_list, name='tag-list'),
+        path('tags/<int:pk>/', async_views.tag_detail, name='tag-detail'),
+        path('ingredients/', async_views.ingredient_list,
+             name='ingredient-list'),
+        path('ingredients/<int:pk>/', async_views.ingredient_detail,
+             name='ingredient-detail'),
+        path('recipes/<int:pk>/', async_views.recipe_detail,
+             name='recipe-detail'),
+        path('recipes/<int:pk>/get-link/', async_views.recipe_get_link,
+             name='recipe-get-link'),
+    ] + urlpatterns
@@ -17,18 +17,6 @@ def validate_password(serializer, data):
     return data
 
 
-def validate_subscription(serializer, data):
-    """Проверяет возможность подписки."""
-    from users.models import Subscription
-    user = data['user']
-    author = data['author']
-    if user == author:
-        raise ValidationError('Нельзя подписаться на самого себя')
-    if Subscription.objects.filter(user=user, author=author).exists():
-        raise ValidationError('Вы уже подписались на этого автора')
-    return data
-
-
 def validate_recipe(serializer, data):
     """Проверяет корректное создание рецепта."""
     from recipes.models import Recipe
@@ -53,23 +41,3 @@ def validate_recipe(serializer, data):
         raise ValidationError('Вы уже добавили этот рецепт.')
 
     return data
-
-
-def validate_shopping_cart(serializer, data):
-    """Проверяет возможность добавления в корзину."""
-    from recipes.models import ShoppingCart
-    user = data['user']
-    recipe = data['recipe']
-    if ShoppingCart.objects.filter(user=user, recipe=recipe).exists():
-        raise ValidationError('Рецепт уже добавлен в корзину')
-    return data
-
-
-def validate_favorite(serializer, data):
-    from recipes.models import Favorite
-    """Проверяет возможность добавления в избранное."""
-    if Favorite.objects.filter(**data).exists():
-        raise ValidationError(
-            'Рецепт уже добавлен в избранное.'
-        )
-    return data
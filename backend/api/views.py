@@ -1,32 +1,64 @@
-from django.db.models import Count, Exists, OuterRef, Sum
-from django.http import HttpResponse
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Exists, OuterRef
+from django.http import HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.urls import reverse
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import mixins, permissions, status, viewsets
 from rest_framework.decorators import action
+from rest_framework.parsers import FormParser, JSONParser, MultiPartParser
 from rest_framework.response import Response
 
+from api.conditional import (etag_matches, make_etag,
+                             not_modified_response)
+from api.fast_serializers import (RecipeValuesSerializer, accepts_fast_json,
+                                  render_json)
 from api.filters import IngredientFilter, RecipeFilter
-from api.pagination import CustomPagination
+from api.mixins import (AnonymousResponseCacheMixin, IdempotencyMixin,
+                        RateLimitHeadersMixin, SparseFieldsetsMixin)
+from api.pagination import CustomPagination, FeedPagination
+from api.parsers import MultiPartJSONParser
 from api.permissions import IsAuthorOrReadOnly
 from api.serializers import (AvatarSerializer, CustomUserCreateSerializer,
                              CustomUserSerializer, FavoriteSerializer,
-                             IngredientSerializer, RecipeIngredient,
-                             RecipeReadSerializer, RecipeWriteSerializer,
-                             SubscriptionGetSerializer, SubscriptionSerializer,
-                             TagSerializer)
-from recipes.models import Favorite, Ingredient, Recipe, Tag
+                             IngredientSerializer, MealPlanSerializer,
+                             MiniRecipeSerializer, RecipeBatchSerializer,
+                             RecipeIdsSerializer, RecipeReadSerializer,
+                             RecipeWriteSerializer, ServingsSerializer,
+                             ServingsUpdateSerializer, ShoppingCartSerializer,
+                             SubscriptionGetSerializer, TagSerializer)
+from api.throttling import (IPTokenBucketThrottle, ScopeTokenBucketThrottle,
+                            UserTokenBucketThrottle)
+from foodgram.cache import invalidate_on_commit
+from recipes.models import Favorite, Ingredient, Recipe, ShoppingCart, Tag
+from recipes.popularity import record_popularity
+from recipes.shopping import (get_cart_ingredients, get_plan_ingredients,
+                              render_shopping_list)
+from recipes.signals import CACHE_NAMESPACES
+from recipes.transfer import export_recipes
 from users.models import CustomUser, Subscription
 
+ALREADY_ADDED_MESSAGES = {
+    Favorite: 'Рецепт уже добавлен в избранное.',
+    ShoppingCart: 'Рецепт уже добавлен в корзину.',
+}
+NOT_ADDED_MESSAGES = {
+    Favorite: 'Рецепта нет в избранном.',
+    ShoppingCart: 'Рецепта нет в корзине.',
+}
+
 
 class UserViewSet(
+    IdempotencyMixin,
+    SparseFieldsetsMixin,
     mixins.CreateModelMixin,
     mixins.ListModelMixin,
     mixins.RetrieveModelMixin,
     viewsets.GenericViewSet,
 ):
     """Вьюсет для работы с пользователями."""
-    queryset = CustomUser.objects.annotate(recipes_count=Count('recipes'))
+    queryset = CustomUser.objects.all()
     serializer_class = CustomUserCreateSerializer
     pagination_class = CustomPagination
     permission_classes = (permissions.AllowAny,)
@@ -39,6 +71,26 @@ class UserViewSet(
             return CustomUserSerializer
         return super().get_serializer_class()
 
+    def get_queryset(self):
+        """
+        Для списка и карточки выбирает только запрошенные поля,
+        подписку текущего пользователя считает одним подзапросом.
+        """
+        queryset = super().get_queryset()
+        if self.action not in ['list', 'retrieve']:
+            return queryset
+        fields = self.get_sparse_fields()
+        if fields is not None:
+            queryset = queryset.only(*(
+                field for field in fields if field != 'is_subscribed'
+            ))
+        user = self.request.user
+        if user.is_authenticated and self.is_field_requested('is_subscribed'):
+            queryset = queryset.annotate(is_subscribed=Exists(
+                user.subscribers.filter(author_id=OuterRef('pk'))
+            ))
+        return queryset
+
     def get_permissions(self):
         if self.action in ['me', 'avatar', 'delete_avatar',
                            'subscriptions', 'subscribe']:
@@ -60,7 +112,8 @@ class UserViewSet(
         methods=['PUT'],
         detail=False,
         url_path='me/avatar',
-        url_name='avatar'
+        url_name='avatar',
+        parser_classes=(JSONParser, FormParser, MultiPartParser),
     )
     def avatar(self, request, *args, **kwargs):
         """Обновить аватар пользователя."""
@@ -87,8 +140,9 @@ class UserViewSet(
     )
     def subscriptions(self, request):
         """Получить список подписок пользователя."""
-        subscriptions = Subscription.objects.filter(subscriber=request.user)
-        authors = [subscription.author for subscription in subscriptions]
+        authors = CustomUser.objects.filter(
+            subscriptions__user=request.user
+        ).annotate(recipes_count=Count('recipes')).order_by('username')
         page = self.paginate_queryset(authors)
         serializer = SubscriptionGetSerializer(
             page,
@@ -103,123 +157,333 @@ class UserViewSet(
         url_path='subscribe',
     )
     def subscribe(self, request, pk=None):
-        """Подписаться или отписаться от автора."""
+        """
+        Подписаться или отписаться от автора.
+        Повторная подписка отсекается ограничением unique_subscription,
+        без предварительной проверки в базе.
+        """
         user = request.user
-        author = get_object_or_404(CustomUser, pk=pk)
-        if request.method == 'POST':
-            serializer = SubscriptionSerializer(
-                data={'subscriber': user.id, 'author': author.id},
-                context={'request': request}
-            )
-            serializer.is_valid(raise_exception=True)
-            subscription = serializer.save()
-            return Response(
-                SubscriptionSerializer(
-                    subscription,
-                    context={'request': request}
-                ).data,
-                status=status.HTTP_201_CREATED
-            )
-        elif request.method == 'DELETE':
+        if request.method == 'DELETE':
             deleted_count, _ = Subscription.objects.filter(
-                author=author,
+                author_id=pk,
                 user=user,
             ).delete()
-            if not deleted_count:
-                return Response(
-                    {'errors': 'Вы не подписаны на этого автора.'},
-                    status=status.HTTP_400_BAD_REQUEST,
-                )
-            return Response(status=status.HTTP_204_NO_CONTENT)
+            if deleted_count:
+                return Response(status=status.HTTP_204_NO_CONTENT)
+            get_object_or_404(CustomUser, pk=pk)
+            return Response(
+                {'errors': 'Вы не подписаны на этого автора.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        author = get_object_or_404(
+            self.get_queryset().annotate(recipes_count=Count('recipes')),
+            pk=pk,
+        )
+        if author == user:
+            return Response(
+                {'errors': 'Нельзя подписаться на самого себя'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            with transaction.atomic():
+                Subscription.objects.create(user=user, author=author)
+        except IntegrityError:
+            return Response(
+                {'errors': 'Вы уже подписались на этого автора'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return Response(
+            SubscriptionGetSerializer(
+                author,
+                context={'request': request}
+            ).data,
+            status=status.HTTP_201_CREATED
+        )
 
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+class TagViewSet(AnonymousResponseCacheMixin, viewsets.ReadOnlyModelViewSet):
     """Вьюсет для работы c тегами."""
+    response_cache_namespace = 'tags'
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permission_classes = (permissions.IsAuthenticatedOrReadOnly,)
     pagination_class = None
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(AnonymousResponseCacheMixin, RateLimitHeadersMixin,
+                        viewsets.ReadOnlyModelViewSet):
     """Вьюсет для работы c ингредиентами."""
+    response_cache_namespace = 'ingredients'
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     permission_classes = (permissions.IsAuthenticatedOrReadOnly,)
     pagination_class = None
     filter_backends = (DjangoFilterBackend,)
     filterset_class = IngredientFilter
+    throttle_scope = 'ingredient_search'
 
+    def get_throttles(self):
+        """Поиск по названию ограничивается корзинами токенов."""
+        if self.action == 'list' and 'name' in self.request.query_params:
+            return [UserTokenBucketThrottle(), ScopeTokenBucketThrottle()]
+        return super().get_throttles()
 
-class RecipeViewSet(viewsets.ModelViewSet):
+
+class RecipeViewSet(AnonymousResponseCacheMixin, IdempotencyMixin,
+                    RateLimitHeadersMixin, SparseFieldsetsMixin,
+                    viewsets.ModelViewSet):
     """Вьюсет для работы c рецептами."""
+    response_cache_namespace = 'recipes'
     permission_classes = (IsAuthorOrReadOnly,)
     pagination_class = CustomPagination
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
+    parser_classes = (JSONParser, FormParser, MultiPartJSONParser)
+    throttle_scope = None
+
+    def get_throttles(self):
+        """Создание рецепта c картинкой ограничивается корзинами токенов."""
+        if self.action == 'create':
+            self.throttle_scope = 'recipe_create'
+            return [
+                UserTokenBucketThrottle(),
+                IPTokenBucketThrottle(),
+                ScopeTokenBucketThrottle(),
+            ]
+        return super().get_throttles()
 
     def get_queryset(self):
-        """"Возвращает queryset рецептов для зарагестрированных юзеров."""
-        queryset = Recipe.objects.select_related('author').prefetch_related(
-            'tag', 'recipe_ingredients__ingredient'
-        )
+        """
+        Возвращает queryset рецептов для зарагестрированных юзеров.
+        Связи, аннотации и текст выбираются, только если поля запрошены.
+        Ингредиенты читаются из снимка в строке рецепта без prefetch.
+        """
+        queryset = Recipe.objects.all()
+        if self.is_field_requested('author'):
+            queryset = queryset.select_related('author')
+        if self.is_field_requested('tag'):
+            queryset = queryset.prefetch_related('tag')
+        if not self.is_field_requested('ingredients'):
+            queryset = queryset.defer('ingredients_snapshot')
+        if not self.is_field_requested('text'):
+            queryset = queryset.defer('text')
+        user = self.request.user
+        if not user.is_authenticated:
+            return queryset
+        if self.is_field_requested('is_favorited'):
+            queryset = queryset.annotate(is_favorited=Exists(
+                user.favorites.filter(recipe_id=OuterRef('pk'))
+            ))
+        if self.is_field_requested('is_in_shopping_cart'):
+            queryset = queryset.annotate(is_in_shopping_cart=Exists(
+                user.shopping_carts.filter(recipe_id=OuterRef('pk'))
+            ))
+        return queryset
+
+    def get_count_cache_namespace(self):
+        """
+        Число рецептов кешируется, только если оно не зависит от
+        избранного, корзины пользователя и рейтинга популярности.
+        """
+        params = self.request.query_params
+        if any(params.get(name) for name in (
+            'favorite_filter', 'shopping_cart_filter', 'ordering'
+        )):
+            return None
+        return 'recipes'
+
+    def get_serializer_class(self):
+        """Различные сериализаторы для операций чтения и записи."""
+        if (
+            self.request.method in permissions.SAFE_METHODS
+            or self.action == 'by_ids'
+        ):
+            return RecipeReadSerializer
+        return RecipeWriteSerializer
+
+    def use_fast_serializer(self, request):
+        """Можно ли отдать ответ через быстрый сериализатор."""
+        return settings.FAST_RECIPE_SERIALIZER and accepts_fast_json(request)
+
+    def fast_response(self, data):
+        return HttpResponse(render_json(data), content_type='application/json')
+
+    def get_revisions(self, queryset):
+        """
+        Легкий queryset для ETag: id и версия рецептов, а для
+        авторизованного пользователя еще избранное, корзина и подписка.
+        """
+        fields = ['id', 'revision']
         user = self.request.user
         if user.is_authenticated:
             queryset = queryset.annotate(
-                is_favorited=Exists(
+                viewer_favorited=Exists(
                     user.favorites.filter(recipe_id=OuterRef('pk'))
                 ),
-                is_in_shopping_cart=Exists(
+                viewer_in_cart=Exists(
                     user.shopping_carts.filter(recipe_id=OuterRef('pk'))
                 ),
+                viewer_subscribed=Exists(
+                    user.subscribers.filter(author_id=OuterRef('author_id'))
+                ),
             )
-        return queryset
+            fields += ['viewer_favorited', 'viewer_in_cart',
+                       'viewer_subscribed']
+        return queryset.select_related(None).prefetch_related(
+            None
+        ).values_list(*fields)
 
-    def get_serializer_class(self):
-        """Различные сериализаторы для операций чтения и записи."""
-        if self.request.method in permissions.SAFE_METHODS:
-            return RecipeReadSerializer
-        return RecipeWriteSerializer
+    def get_etag(self, revisions, *extra):
+        return make_etag(
+            self.request.get_full_path(),
+            self.request.accepted_media_type,
+            tuple(revisions),
+            *extra,
+        )
+
+    def serialize_recipes(self, queryset, recipe_ids):
+        """Сериализует рецепты из queryset в порядке recipe_ids."""
+        queryset = queryset.filter(id__in=recipe_ids)
+        if self.use_fast_serializer(self.request):
+            serializer = RecipeValuesSerializer(
+                self.request, self.get_sparse_fields()
+            )
+            rows = {row['id']: row for row in serializer.get_values(queryset)}
+            return serializer.to_representation(
+                [rows[pk] for pk in recipe_ids if pk in rows]
+            )
+        recipes = {recipe.id: recipe for recipe in queryset}
+        return self.get_serializer(
+            [recipes[pk] for pk in recipe_ids if pk in recipes],
+            many=True,
+        ).data
+
+    def list(self, request, *args, **kwargs):
+        """
+        Список рецептов c ETag.
+        Сначала выбираются только версии рецептов страницы: при совпадении
+        c If-None-Match ответ 304 отдается без сериализации.
+        C параметром ids=1,2,3 отдаются рецепты из списка.
+        """
+        if 'ids' in request.query_params:
+            return self.list_by_ids(request, [
+                pk for pk in request.query_params['ids'].split(',') if pk
+            ])
+        queryset = self.filter_queryset(self.get_queryset())
+        revisions = self.paginate_queryset(self.get_revisions(queryset))
+        paginated = revisions is not None
+        if paginated:
+            etag = self.get_etag(
+                revisions, self.paginator.page.paginator.count
+            )
+        else:
+            revisions = list(self.get_revisions(queryset))
+            etag = self.get_etag(revisions)
+        if etag_matches(request, etag):
+            return not_modified_response(etag)
+        data = self.serialize_recipes(
+            queryset, [row[0] for row in revisions]
+        )
+        if paginated:
+            response = self.get_paginated_response(data)
+        else:
+            response = Response(data)
+        if self.use_fast_serializer(request):
+            response = self.fast_response(response.data)
+        response['ETag'] = etag
+        return response
+
+    def list_by_ids(self, request, ids):
+        """
+        Рецепты по списку id одним ответом, в порядке запроса и без
+        пагинации. Queryset, фильтры и ETag те же, что у списка;
+        несуществующие id пропускаются.
+        """
+        serializer = RecipeIdsSerializer(data={'ids': ids})
+        serializer.is_valid(raise_exception=True)
+        recipe_ids = serializer.validated_data['ids']
+        queryset = self.filter_queryset(self.get_queryset()).filter(
+            id__in=recipe_ids
+        )
+        revisions = {row[0]: row for row in self.get_revisions(queryset)}
+        revisions = [revisions[pk] for pk in recipe_ids if pk in revisions]
+        etag = self.get_etag(revisions)
+        if etag_matches(request, etag):
+            return not_modified_response(etag)
+        data = self.serialize_recipes(
+            queryset, [row[0] for row in revisions]
+        )
+        if self.use_fast_serializer(request):
+            response = self.fast_response(data)
+        else:
+            response = Response(data)
+        response['ETag'] = etag
+        return response
+
+    def retrieve(self, request, *args, **kwargs):
+        """Рецепт по id c ETag, 304 отдается без сериализации."""
+        queryset = self.filter_queryset(self.get_queryset())
+        pk = kwargs[self.lookup_url_kwarg or self.lookup_field]
+        etag = self.get_etag(
+            [get_object_or_404(self.get_revisions(queryset), pk=pk)]
+        )
+        if etag_matches(request, etag):
+            return not_modified_response(etag)
+        if self.use_fast_serializer(request):
+            serializer = RecipeValuesSerializer(
+                request, self.get_sparse_fields()
+            )
+            row = get_object_or_404(serializer.get_values(queryset), pk=pk)
+            response = self.fast_response(
+                serializer.to_representation([row])[0]
+            )
+        else:
+            response = super().retrieve(request, *args, **kwargs)
+        response['ETag'] = etag
+        return response
 
     def perform_create(self, serializer):
         """Сохраняет рецепт с указанием автора."""
         serializer.save(author=self.request.user)
 
-    def add_favorite_cart(self, request, model, pk, serializer):
-        """Добавление рецепта из избранных."""
-        message = '{} уже в избранном.'
-        user = request.user
+    def add_favorite_cart(self, request, model, pk, serializer, **fields):
+        """
+        Добавление рецепта в избранное или корзину.
+        Дубликаты отсекаются уникальным ограничением модели.
+        """
         recipe = get_object_or_404(Recipe, id=pk)
-        if model.objects.filter(recipe=recipe, user=user).exists():
+        try:
+            with transaction.atomic():
+                instance = model.objects.create(
+                    recipe=recipe, user=request.user, **fields
+                )
+        except IntegrityError:
             return Response(
-                {'detail': message.format(recipe.name)},
+                {'errors': ALREADY_ADDED_MESSAGES[model]},
                 status=status.HTTP_400_BAD_REQUEST,
             )
-        serializers = serializer(
-            data={'recipe': recipe.id, 'user': user.id},
-            context={'request': request}
-        )
-        serializers.is_valid(raise_exception=True)
-        serializers.save()
+        record_popularity(model, [(recipe.id, instance.added_at)])
         return Response(
-            serializers.data, status=status.HTTP_201_CREATED
+            serializer(instance, context={'request': request}).data,
+            status=status.HTTP_201_CREATED
         )
 
     def delete_favorite_cart(self, request, model, pk):
-        """Удаление рецепта из избранных."""
-        user = request.use
-        deleted_count, _ = model.objects.filter(
-            recipe__id=pk, user=user
-        ).delete()
+        """Удаление рецепта из избранного или корзины."""
+        entries = model.objects.filter(recipe_id=pk, user=request.user)
+        removed = list(entries.values_list('recipe_id', 'added_at'))
+        deleted_count, _ = entries.delete()
         if deleted_count:
+            record_popularity(model, removed, removed=True)
             return Response(status=status.HTTP_204_NO_CONTENT)
-        return Response({'detail': 'Рецепт не существует'},
+        get_object_or_404(Recipe, id=pk)
+        return Response({'errors': NOT_ADDED_MESSAGES[model]},
                         status=status.HTTP_400_BAD_REQUEST,)
 
     def _handle_recipe_list_action(self, request, pk, model, serializer):
         if request.method == 'POST':
-            return self.add_favorite_cart(self, request, model, pk, serializer)
-        return self.delete_favorite_cart(self, request, model, pk, serializer)
+            return self.add_favorite_cart(request, model, pk, serializer)
+        return self.delete_favorite_cart(request, model, pk)
 
     @action(
         detail=True,
@@ -232,28 +496,212 @@ class RecipeViewSet(viewsets.ModelViewSet):
             request, pk, Favorite, FavoriteSerializer
         )
 
+    @action(
+        detail=True,
+        methods=['post', 'patch', 'delete'],
+        permission_classes=[permissions.IsAuthenticated]
+    )
+    def shopping_cart(self, request, pk=None):
+        """
+        Добавить рецепт в список покупок, изменить число его порций
+        или удалить. Порции передаются в теле: {"servings": 2}.
+        """
+        if request.method == 'DELETE':
+            return self.delete_favorite_cart(request, ShoppingCart, pk)
+        serializer = (
+            ServingsSerializer if request.method == 'POST'
+            else ServingsUpdateSerializer
+        )(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        servings = serializer.validated_data['servings']
+        if request.method == 'POST':
+            return self.add_favorite_cart(
+                request, ShoppingCart, pk, ShoppingCartSerializer,
+                servings=servings,
+            )
+        cart = get_object_or_404(
+            ShoppingCart.objects.select_related('recipe'),
+            recipe_id=pk, user=request.user,
+        )
+        cart.servings = servings
+        cart.save(update_fields=['servings'])
+        return Response(
+            ShoppingCartSerializer(cart, context={'request': request}).data,
+            status=status.HTTP_200_OK
+        )
+
+    def batch_add(self, request, model):
+        """
+        Добавляет пачку рецептов в избранное или корзину.
+        Число запросов к базе не зависит от размера пачки.
+        bulk_create не отправляет post_save, поэтому кеш списков
+        и рейтинга популярности сбрасывается явно.
+        """
+        serializer = RecipeBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        recipe_ids = serializer.validated_data['recipes']
+        user = request.user
+        present = dict(
+            Recipe.objects.filter(id__in=recipe_ids).annotate(
+                in_list=Exists(model.objects.filter(
+                    user=user, recipe_id=OuterRef('pk')
+                ))
+            ).values_list('id', 'in_list')
+        )
+        created_ids = [
+            recipe_id for recipe_id, in_list in present.items() if not in_list
+        ]
+        created = [
+            model(user=user, recipe_id=recipe_id) for recipe_id in created_ids
+        ]
+        model.objects.bulk_create(created, ignore_conflicts=True)
+        record_popularity(
+            model, [(entry.recipe_id, entry.added_at) for entry in created]
+        )
+        if created_ids:
+            invalidate_on_commit(*CACHE_NAMESPACES[model], 'popular')
+        results = []
+        for recipe_id in recipe_ids:
+            if recipe_id not in present:
+                result = 'not_found'
+            elif present[recipe_id]:
+                result = 'exists'
+            else:
+                result = 'created'
+            results.append({'id': recipe_id, 'status': result})
+        return Response({'results': results}, status=status.HTTP_200_OK)
+
+    def batch_remove(self, request, model):
+        """Удаляет пачку рецептов из избранного или корзины."""
+        serializer = RecipeBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        recipe_ids = serializer.validated_data['recipes']
+        entries = model.objects.filter(
+            user=request.user, recipe_id__in=recipe_ids
+        )
+        removed = dict(entries.values_list('recipe_id', 'added_at'))
+        entries.delete()
+        record_popularity(model, removed.items(), removed=True)
+        if removed:
+            invalidate_on_commit('popular')
+        return Response(
+            {'results': [
+                {
+                    'id': recipe_id,
+                    'status': 'deleted' if recipe_id in removed
+                    else 'not_found',
+                }
+                for recipe_id in recipe_ids
+            ]},
+            status=status.HTTP_200_OK,
+        )
+
+    def _handle_batch_action(self, request, model):
+        if request.method == 'POST':
+            return self.batch_add(request, model)
+        return self.batch_remove(request, model)
+
+    @action(
+        detail=False,
+        methods=['post', 'delete'],
+        url_path='favorite/batch',
+        url_name='favorite-batch',
+        permission_classes=[permissions.IsAuthenticated]
+    )
+    def favorite_batch(self, request):
+        """Добавить или удалить несколько рецептов в избранном."""
+        return self._handle_batch_action(request, Favorite)
+
+    @action(
+        detail=False,
+        methods=['post', 'delete'],
+        url_path='shopping_cart/batch',
+        url_name='shopping-cart-batch',
+        permission_classes=[permissions.IsAuthenticated]
+    )
+    def shopping_cart_batch(self, request):
+        """Добавить или удалить несколько рецептов в корзине."""
+        return self._handle_batch_action(request, ShoppingCart)
+
     @action(
         detail=False,
         methods=['get'],
+        permission_classes=[permissions.IsAdminUser]
+    )
+    def export(self, request):
+        """Все рецепты потоком NDJSON, только для администраторов."""
+        response = StreamingHttpResponse(
+            export_recipes(), content_type='application/x-ndjson'
+        )
+        response['Content-Disposition'] = (
+            'attachment; filename="recipes.ndjson"'
+        )
+        return response
+
+    @action(detail=False, methods=['post'], url_path='by_ids')
+    def by_ids(self, request):
+        """Рецепты по списку id из тела запроса, для длинных списков."""
+        ids = request.data.get('ids') if hasattr(request.data, 'get') else None
+        return self.list_by_ids(request, ids)
+
+    @action(
+        detail=False,
+        methods=['get'],
+        pagination_class=FeedPagination,
         permission_classes=[permissions.IsAuthenticated]
     )
+    def feed(self, request):
+        """
+        Лента новых рецептов авторов, на которых подписан пользователь.
+        Страница выбирается по индексу ленты, a не сортировкой рецептов.
+        """
+        recipe_ids = self.paginator.paginate_feed(request, request.user)
+        response = self.get_paginated_response(
+            self.serialize_recipes(self.get_queryset(), recipe_ids)
+        )
+        if self.use_fast_serializer(request):
+            response = self.fast_response(response.data)
+        return response
+
+    @action(
+        detail=False,
+        methods=['get'],
+        permission_classes=[permissions.IsAuthenticated],
+        throttle_classes=[UserTokenBucketThrottle, ScopeTokenBucketThrottle],
+        throttle_scope='shopping_cart_download',
+    )
     def download_shopping_cart(self, request):
         """Скачать список покупок в виде текстового файла."""
-        ingredients = RecipeIngredient.objects.filter(
-            recipe__shopping_carts__user=request.user
-        ).values(
-            'ingredient__name', 'ingredient__measurement_unit'
-        ).annotate(total=Sum('amount'))
-
-        shopping_list = "\n".join([
-            f"{item['ingredient__name']} - {item['total']} "
-            f"{item['ingredient__measurement_unit']}"
-            for item in ingredients
-        ])
-
-        response = HttpResponse(shopping_list, content_type='text/plain')
-        response['Content-Disposition'] = ('attachment; ',
-                                           'filename="shopping_list.txt"')
+        return self.shopping_list_response(
+            get_cart_ingredients(request.user)
+        )
+
+    @action(
+        detail=False,
+        methods=['post'],
+        url_path='shopping_list',
+        permission_classes=[permissions.AllowAny],
+        throttle_classes=[UserTokenBucketThrottle, ScopeTokenBucketThrottle],
+        throttle_scope='shopping_cart_download',
+    )
+    def shopping_list(self, request):
+        """
+        Список покупок для плана питания без корзины:
+        {"recipes": [{"id": 1, "servings": 2}, ...]}.
+        """
+        serializer = MealPlanSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return self.shopping_list_response(
+            get_plan_ingredients(serializer.validated_data['recipes'])
+        )
+
+    def shopping_list_response(self, ingredients):
+        response = HttpResponse(
+            render_shopping_list(ingredients), content_type='text/plain'
+        )
+        response['Content-Disposition'] = (
+            'attachment; filename="shopping_list.txt"'
+        )
         return response
 
     @action(
@@ -261,12 +709,35 @@ class RecipeViewSet(viewsets.ModelViewSet):
         methods=['get'],
         permission_classes=[permissions.AllowAny]
     )
-    def short_link(self, request, pk=None):
+    def similar(self, request, pk=None):
+        """Похожие рецепты из предрассчитанного списка соседей."""
+        recipes = Recipe.objects.filter(
+            similar_to__recipe_id=pk
+        ).order_by('-similar_to__score').only(
+            'id', 'name', 'image', 'cooking_time'
+        )
+        data = MiniRecipeSerializer(
+            recipes, many=True, context={'request': request}
+        ).data
+        if not data:
+            get_object_or_404(Recipe, pk=pk)
+        return Response(data, status=status.HTTP_200_OK)
+
+    @action(
+        detail=True,
+        methods=['get'],
+        url_path='get-link',
+        url_name='get-link',
+        permission_classes=[permissions.AllowAny]
+    )
+    def get_link(self, request, pk=None):
         """Короткая ссылка на рецепт."""
-        recipe = get_object_or_404(Recipe, pk=pk)
+        short_link = get_object_or_404(
+            Recipe.objects.values_list('short_link', flat=True), pk=pk
+        )
         return Response(
-            {'short_link': request.build_absolute_uri(
-                recipe.get_absolute_url()
+            {'short-link': request.build_absolute_uri(
+                reverse('short-link', args=[short_link])
             )},
             status=status.HTTP_200_OK
         )
@@ -0,0 +1,173 @@
+"""
+Нагрузочное сравнение WSGI и ASGI режимов бэкенда.
+
+Поднимает gunicorn c синхронными воркерами (foodgram.wsgi) и gunicorn
+c воркерами uvicorn (foodgram.asgi, USE_ASGI=True) поверх одной и той же
+базы данных, затем нагружает горячие эндпоинты чтения заданным числом
+одновременных клиентов. Кеш анонимных ответов выключен, чтобы сравнивались
+сами режимы, а не скорость отдачи готовых байтов; --response-cache
+включает его.
+
+Пример запуска из каталога backend:
+    python -m benchmarks.asgi_wsgi --concurrency 200 --duration 20
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+from urllib.parse import urlsplit
+
+DEFAULT_PATHS = (
+    '/api/tags/',
+    '/api/ingredients/?name=%D0%B0',
+    '/api/recipes/1/',
+)
+
+MODES = {
+    'wsgi': {
+        'args': ['foodgram.wsgi:application'],
+        'env': {'USE_ASGI': 'False'},
+    },
+    'asgi': {
+        'args': ['foodgram.asgi:application',
+                 '-k', 'uvicorn.workers.UvicornWorker'],
+        'env': {'USE_ASGI': 'True'},
+    },
+}
+
+
+async def fetch(host, port, path, read_delay):
+    """Выполняет один GET-запрос и возвращает код ответа."""
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(
+        f'GET {path} HTTP/1.1\r\nHost: {host}\r\n'
+        'Connection: close\r\n\r\n'.encode()
+    )
+    await writer.drain()
+    status_line = await reader.readline()
+    while True:
+        chunk = await reader.read(1024)
+        if not chunk:
+            break
+        if read_delay:
+            await asyncio.sleep(read_delay)
+    writer.close()
+    return int(status_line.split()[1])
+
+
+async def client(url, paths, deadline, read_delay, latencies, errors):
+    """Последовательно отправляет запросы до истечения времени."""
+    parts = urlsplit(url)
+    index = 0
+    while time.monotonic() < deadline:
+        path = paths[index % len(paths)]
+        index += 1
+        started = time.monotonic()
+        try:
+            status = await fetch(
+                parts.hostname, parts.port, path, read_delay
+            )
+        except OSError:
+            errors.append(path)
+            continue
+        if status >= 400:
+            errors.append(path)
+        latencies.append(time.monotonic() - started)
+
+
+async def run_load(url, paths, concurrency, duration, read_delay):
+    """Запускает нагрузку и возвращает задержки и ошибки."""
+    latencies, errors = [], []
+    deadline = time.monotonic() + duration
+    await asyncio.gather(*(
+        client(url, paths, deadline, read_delay, latencies, errors)
+        for _ in range(concurrency)
+    ))
+    return latencies, errors
+
+
+def wait_until_ready(url, timeout=30):
+    """Ожидает, пока сервер начнет принимать соединения."""
+    parts = urlsplit(url)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            asyncio.run(fetch(parts.hostname, parts.port, '/api/tags/', 0))
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f'Сервер {url} не запустился за {timeout} c')
+
+
+def benchmark_mode(mode, options):
+    """Запускает сервер в заданном режиме и измеряет пропускную способность."""
+    url = f'http://127.0.0.1:{options.port}'
+    env = {
+        **os.environ,
+        **MODES[mode]['env'],
+        'RESPONSE_CACHE': str(options.response_cache),
+    }
+    server = subprocess.Popen(
+        ['gunicorn', *MODES[mode]['args'],
+         '--bind', f'127.0.0.1:{options.port}',
+         '--workers', str(options.workers),
+         '--log-level', 'warning'],
+        env=env,
+    )
+    try:
+        wait_until_ready(url)
+        latencies, errors = asyncio.run(run_load(
+            url, options.paths, options.concurrency,
+            options.duration, options.read_delay,
+        ))
+    finally:
+        server.terminate()
+        server.wait()
+    latencies.sort()
+    count = len(latencies)
+    return {
+        'mode': mode,
+        'rps': count / options.duration,
+        'p50': statistics.median(latencies) * 1000 if count else 0,
+        'p99': latencies[int(count * 0.99) - 1] * 1000 if count else 0,
+        'errors': len(errors),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--concurrency', type=int, default=200)
+    parser.add_argument('--duration', type=float, default=15)
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument(
+        '--read-delay', type=float, default=0,
+        help='Пауза между чтениями по 1 КБ, имитирует медленных клиентов.'
+    )
+    parser.add_argument('--paths', nargs='+', default=DEFAULT_PATHS)
+    parser.add_argument(
+        '--response-cache', action='store_true',
+        help='Не выключать кеш анонимных ответов.'
+    )
+    parser.add_argument(
+        '--modes', nargs='+', choices=MODES, default=list(MODES)
+    )
+    options = parser.parse_args()
+
+    results = [benchmark_mode(mode, options) for mode in options.modes]
+    sys.stdout.write(
+        f'{"mode":<6}{"rps":>10}{"p50, ms":>10}{"p99, ms":>10}'
+        f'{"errors":>8}\n'
+    )
+    for row in results:
+        sys.stdout.write(
+            f'{row["mode"]:<6}{row["rps"]:>10.1f}{row["p50"]:>10.1f}'
+            f'{row["p99"]:>10.1f}{row["errors"]:>8}\n'
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,174 @@
+"""
+Подбор профиля gunicorn для текущего сервера.
+
+Перебирает классы воркеров, число воркеров, потоков и max_requests,
+для каждого сочетания поднимает gunicorn c foodgram.gunicorn_conf
+поверх базы, заданной окружением, и нагружает горячие эндпоинты API.
+Для каждого профиля печатает пропускную способность, задержки
+и суммарную память воркеров, в конце - лучший профиль в виде
+переменных окружения. Кеш анонимных ответов выключен, если не передан
+--response-cache.
+
+Пример запуска из каталога backend:
+    python -m benchmarks.gunicorn_profile --classes sync gthread \\
+        --workers 2 4 --threads 2 4 8 --duration 10
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+from benchmarks.asgi_wsgi import DEFAULT_PATHS, run_load, wait_until_ready
+from foodgram.gunicorn_conf import WORKER_CLASSES, get_cpu_count
+
+
+def get_workers_rss(pid):
+    """Суммарный RSS дочерних процессов мастера в МБ (только Linux)."""
+    children = Path(f'/proc/{pid}/task/{pid}/children')
+    if not children.exists():
+        return None
+    total = 0
+    for child in children.read_text().split():
+        try:
+            status = Path(f'/proc/{child}/status').read_text()
+        except OSError:
+            continue
+        for line in status.splitlines():
+            if line.startswith('VmRSS:'):
+                total += int(line.split()[1])
+    return total / 1024
+
+
+def get_profiles(options):
+    """Сочетания параметров; потоки перебираются только для gthread."""
+    for worker_class, workers, max_requests in itertools.product(
+        options.classes, options.workers, options.max_requests
+    ):
+        threads = options.threads if worker_class == 'gthread' else [1]
+        for thread_count in threads:
+            yield {
+                'GUNICORN_WORKER_CLASS': worker_class,
+                'GUNICORN_WORKERS': str(workers),
+                'GUNICORN_THREADS': str(thread_count),
+                'GUNICORN_MAX_REQUESTS': str(max_requests),
+            }
+
+
+def benchmark_profile(profile, options):
+    """Запускает gunicorn c профилем и измеряет его под нагрузкой."""
+    url = f'http://127.0.0.1:{options.port}'
+    env = {
+        **os.environ,
+        **profile,
+        'GUNICORN_BIND': f'127.0.0.1:{options.port}',
+        'GUNICORN_LOG_LEVEL': 'warning',
+        'RESPONSE_CACHE': str(options.response_cache),
+    }
+    server = subprocess.Popen(
+        ['gunicorn', '-c', 'python:foodgram.gunicorn_conf'], env=env
+    )
+    try:
+        wait_until_ready(url)
+        latencies, errors = asyncio.run(run_load(
+            url, options.paths, options.concurrency,
+            options.duration, 0,
+        ))
+        memory = get_workers_rss(server.pid)
+    finally:
+        server.terminate()
+        server.wait()
+    latencies.sort()
+    count = len(latencies)
+    return {
+        'profile': profile,
+        'rps': count / options.duration,
+        'p50': statistics.median(latencies) * 1000 if count else 0,
+        'p99': latencies[int(count * 0.99) - 1] * 1000 if count else 0,
+        'errors': len(errors),
+        'memory': memory,
+    }
+
+
+def recommend(results, max_p99):
+    """
+    Лучший профиль: без ошибок и c p99 не выше порога, максимум rps;
+    при разнице в rps меньше 5% выигрывает профиль c меньшей памятью.
+    """
+    suitable = [
+        row for row in results
+        if not row['errors'] and row['p99'] <= max_p99
+    ]
+    if not suitable:
+        return None
+    best_rps = max(row['rps'] for row in suitable)
+    close = [row for row in suitable if row['rps'] >= best_rps * 0.95]
+    return min(close, key=lambda row: row['memory'] or 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    cpu_count = get_cpu_count()
+    parser.add_argument(
+        '--classes', nargs='+', choices=WORKER_CLASSES,
+        default=list(WORKER_CLASSES),
+    )
+    parser.add_argument(
+        '--workers', nargs='+', type=int,
+        default=sorted({cpu_count, cpu_count + 1, 2 * cpu_count + 1}),
+    )
+    parser.add_argument('--threads', nargs='+', type=int, default=[2, 4, 8])
+    parser.add_argument(
+        '--max-requests', nargs='+', type=int, default=[1000],
+        help='0 отключает перезапуск воркеров.'
+    )
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--port', type=int, default=8766)
+    parser.add_argument(
+        '--max-p99', type=float, default=500,
+        help='Допустимый p99 в миллисекундах.'
+    )
+    parser.add_argument('--paths', nargs='+', default=DEFAULT_PATHS)
+    parser.add_argument(
+        '--response-cache', action='store_true',
+        help='Не выключать кеш анонимных ответов.'
+    )
+    options = parser.parse_args()
+
+    sys.stdout.write(
+        f'{"class":<9}{"workers":>8}{"threads":>8}{"max_req":>8}'
+        f'{"rps":>10}{"p50, ms":>10}{"p99, ms":>10}{"errors":>8}'
+        f'{"rss, MB":>10}\n'
+    )
+    results = []
+    for profile in get_profiles(options):
+        row = benchmark_profile(profile, options)
+        results.append(row)
+        memory = '-' if row['memory'] is None else round(row['memory'])
+        sys.stdout.write(
+            f'{profile["GUNICORN_WORKER_CLASS"]:<9}'
+            f'{profile["GUNICORN_WORKERS"]:>8}'
+            f'{profile["GUNICORN_THREADS"]:>8}'
+            f'{profile["GUNICORN_MAX_REQUESTS"]:>8}'
+            f'{row["rps"]:>10.1f}{row["p50"]:>10.1f}{row["p99"]:>10.1f}'
+            f'{row["errors"]:>8}'
+            f'{memory:>10}\n'
+        )
+
+    best = recommend(results, options.max_p99)
+    if best is None:
+        sys.stdout.write(
+            '\nНи один профиль не уложился в p99 без ошибок.\n'
+        )
+        return
+    sys.stdout.write('\nРекомендуемый профиль:\n')
+    for name, value in best['profile'].items():
+        sys.stdout.write(f'{name}={value}\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+"""
+Пиковая память при загрузке изображения рецепта.
+
+Сравнивает base64 в JSON со старым декодированием целиком,
+base64 c декодированием кусками во временный файл и multipart
+c записью файла на диск. Пик считается tracemalloc от разбора тела
+запроса до проверки изображения полем сериализатора; само тело запроса,
+которое в реальном сервере читается из сокета, не учитывается. В обоих
+вариантах base64 остаются строка тела и разобранная из нее строка
+изображения: это цена JSON, избавиться от нее позволяет только multipart.
+
+Пример запуска из каталога backend:
+    python -m benchmarks.image_upload --size-mb 5 --repeat 3
+"""
+import argparse
+import base64
+import io
+import json
+import os
+import statistics
+import time
+import tracemalloc
+import uuid
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
+django.setup()
+
+from django.core.files.base import ContentFile  # noqa: E402
+from django.core.files.uploadedfile import SimpleUploadedFile  # noqa: E402
+from django.test import RequestFactory  # noqa: E402
+from PIL import Image  # noqa: E402
+from rest_framework.parsers import JSONParser  # noqa: E402
+from rest_framework.request import Request  # noqa: E402
+
+from api.parsers import MultiPartJSONParser  # noqa: E402
+from api.serializers import Base64ImageField  # noqa: E402
+
+FIELDS = {
+    'name': 'Бенчмарк', 'text': 'Текст', 'cooking_time': 10,
+    'tag': [1], 'ingredients': [{'id': 1, 'amount': 10}],
+}
+
+
+class LegacyBase64ImageField(Base64ImageField):
+    """Прежнее поле: строка делится на части и декодируется целиком."""
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) and data.startswith('data:image'):
+            format, imgstr = data.split(';base64,')
+            ext = format.split('/')[-1]
+            filename = f'{self.file_prefix}_{uuid.uuid4()}.{ext}'
+            data = ContentFile(base64.b64decode(imgstr), name=filename)
+        return super().to_internal_value(data)
+
+
+def make_png(size_mb):
+    """PNG из шума: он почти не сжимается, размер близок к заданному."""
+    side = int((size_mb * 1024 * 1024 / 3) ** 0.5)
+    image = Image.frombytes('RGB', (side, side), os.urandom(side * side * 3))
+    buffer = io.BytesIO()
+    image.save(buffer, 'PNG', compress_level=0)
+    return buffer.getvalue()
+
+
+def json_request(png):
+    body = json.dumps({
+        **FIELDS,
+        'image': 'data:image/png;base64,' + base64.b64encode(png).decode(),
+    })
+    return RequestFactory().post(
+        '/api/recipes/', body, content_type='application/json'
+    )
+
+
+def multipart_request(png):
+    return RequestFactory().post('/api/recipes/', {
+        'data': json.dumps(FIELDS),
+        'image': SimpleUploadedFile('image.png', png, 'image/png'),
+    })
+
+
+def upload(django_request, field):
+    request = Request(
+        django_request, parsers=[JSONParser(), MultiPartJSONParser()]
+    )
+    image = field.to_internal_value(request.data['image'])
+    size = image.size
+    image.close()
+    return size
+
+
+def measure(make_request, field, repeat):
+    peaks, timings = [], []
+    for _ in range(repeat):
+        django_request = make_request()
+        tracemalloc.start()
+        started = time.perf_counter()
+        upload(django_request, field)
+        timings.append(time.perf_counter() - started)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return max(peaks), statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--size-mb', type=float, default=5)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    png = make_png(args.size_mb)
+    cases = (
+        ('base64, целиком', lambda: json_request(png),
+         LegacyBase64ImageField()),
+        ('base64, кусками', lambda: json_request(png),
+         Base64ImageField()),
+        ('multipart', lambda: multipart_request(png),
+         Base64ImageField()),
+    )
+    print(f'Изображение: {len(png) / 2 ** 20:.2f} МБ')
+    print(f'{"Способ":<22}{"Пик, МБ":>10}{"Время, мс":>12}')
+    for name, make_request, field in cases:
+        peak, elapsed = measure(make_request, field, args.repeat)
+        print(f'{name:<22}{peak / 2 ** 20:>10.2f}{elapsed * 1000:>12.1f}')
+
+
+if __name__ == '__main__':
+    main()
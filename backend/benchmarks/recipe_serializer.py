@@ -0,0 +1,102 @@
+"""
+Сравнение быстрого сериализатора рецептов c DRF-сериализатором.
+
+Измеряет процессорное время на запрос списка и детальной страницы
+рецепта в обоих режимах для анонима и для пользователя c подписками
+и избранным. Побайтное совпадение ответов проверяет
+api.tests.FastRecipeSerializerTests. Кеш анонимных ответов выключен,
+иначе измерялась бы отдача готовых байтов.
+
+Работает c базой из настроек проекта. Пример запуска из каталога backend:
+    python -m benchmarks.recipe_serializer --iterations 50
+"""
+import argparse
+import os
+import sys
+import time
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
+django.setup()
+
+from django.test.utils import override_settings  # noqa: E402
+from rest_framework.test import APIClient  # noqa: E402
+
+from recipes.models import Favorite, Recipe, ShoppingCart  # noqa: E402
+from users.models import CustomUser, Subscription  # noqa: E402
+
+
+def get_reader():
+    """Пользователь c подписками, избранным и корзиной."""
+    user, _ = CustomUser.objects.get_or_create(
+        email='bench_reader@bench.local',
+        defaults={'username': 'bench_reader', 'first_name': 'Bench',
+                  'last_name': 'Reader'},
+    )
+    recipes = list(Recipe.objects.values_list('id', 'author_id')[:10])
+    for model in (Favorite, ShoppingCart):
+        model.objects.bulk_create(
+            [model(user=user, recipe_id=recipe_id)
+             for recipe_id, _ in recipes[::2]],
+            ignore_conflicts=True,
+        )
+    Subscription.objects.bulk_create(
+        [Subscription(user=user, author_id=author_id)
+         for _, author_id in recipes if author_id != user.id],
+        ignore_conflicts=True,
+    )
+    return user
+
+
+def fetch(client, url, fast):
+    with override_settings(
+        FAST_RECIPE_SERIALIZER=fast, RESPONSE_CACHE=False
+    ):
+        response = client.get(url, HTTP_ACCEPT='application/json')
+    assert response.status_code == 200, (url, response.status_code)
+    return response.content
+
+
+def cpu_per_request(client, url, fast, iterations):
+    started = time.process_time()
+    for _ in range(iterations):
+        fetch(client, url, fast)
+    return (time.process_time() - started) / iterations * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--iterations', type=int, default=30)
+    parser.add_argument('--limit', type=int, default=100)
+    options = parser.parse_args()
+
+    recipe = Recipe.objects.first()
+    if recipe is None:
+        sys.exit('Нет рецептов: заполните базу перед запуском.')
+    anonymous = APIClient()
+    reader = APIClient()
+    reader.force_authenticate(get_reader())
+    urls = (
+        '/api/recipes/',
+        f'/api/recipes/?limit={options.limit}',
+        f'/api/recipes/{recipe.id}/',
+    )
+    clients = (('anonymous', anonymous), ('reader', reader))
+
+    sys.stdout.write(
+        f'{"client":<10}{"url":<28}{"drf, ms":>10}{"fast, ms":>10}'
+        f'{"speedup":>9}\n'
+    )
+    for client_name, client in clients:
+        for url in urls:
+            slow = cpu_per_request(client, url, False, options.iterations)
+            fast = cpu_per_request(client, url, True, options.iterations)
+            sys.stdout.write(
+                f'{client_name:<10}{url:<28}{slow:>10.2f}{fast:>10.2f}'
+                f'{slow / fast:>8.1f}x\n'
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""
+Нагрузочная проверка переключателей избранного, корзины и подписок.
+
+Отправляет одновременные дублирующиеся POST-запросы на один и тот же
+рецепт (или автора) из нескольких потоков и проверяет, что ровно один
+из них создает запись, а остальные получают 400 без ошибок 500.
+Выводит пропускную способность и среднее число SQL-запросов на запрос.
+
+Работает c базой из настроек проекта. Пример запуска из каталога backend:
+    python -m benchmarks.toggles --threads 32 --rounds 50
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from threading import Barrier
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
+django.setup()
+
+from django.db import close_old_connections, connection  # noqa: E402
+from django.test.utils import CaptureQueriesContext  # noqa: E402
+from rest_framework.test import APIClient  # noqa: E402
+
+from recipes.models import Favorite, Recipe, ShoppingCart  # noqa: E402
+from users.models import CustomUser, Subscription  # noqa: E402
+
+ENDPOINTS = {
+    'favorite': (Favorite, '/api/recipes/{recipe}/favorite/'),
+    'shopping_cart': (ShoppingCart, '/api/recipes/{recipe}/shopping_cart/'),
+    'subscribe': (Subscription, '/api/users/{author}/subscribe/'),
+}
+
+
+def get_bench_user(name):
+    """Возвращает (или создает) пользователя для бенчмарка."""
+    user, _ = CustomUser.objects.get_or_create(
+        email=f'{name}@bench.local',
+        defaults={'username': name, 'first_name': 'Bench',
+                  'last_name': 'User'},
+    )
+    return user
+
+
+def send(user, method, url, barrier, statuses, queries):
+    """Отправляет запрос одновременно c остальными потоками."""
+    client = APIClient()
+    client.force_authenticate(user)
+    barrier.wait()
+    try:
+        with CaptureQueriesContext(connection) as captured:
+            response = getattr(client, method)(url)
+        statuses[response.status_code] += 1
+        queries.append(len(captured))
+    finally:
+        close_old_connections()
+
+
+def run_round(pool, threads, user, method, url):
+    """Выполняет одну волну одновременных одинаковых запросов."""
+    barrier = Barrier(threads)
+    statuses, queries = Counter(), []
+    futures = [
+        pool.submit(send, user, method, url, barrier, statuses, queries)
+        for _ in range(threads)
+    ]
+    for future in futures:
+        future.result()
+    return statuses, queries
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--rounds', type=int, default=20)
+    parser.add_argument(
+        '--endpoints', nargs='+', choices=ENDPOINTS, default=list(ENDPOINTS)
+    )
+    options = parser.parse_args()
+    logging.getLogger('django.request').setLevel(logging.ERROR)
+
+    user = get_bench_user('bench_toggler')
+    author = get_bench_user('bench_author')
+    recipe = Recipe.objects.first()
+    if recipe is None:
+        sys.exit('Нет рецептов: заполните базу перед запуском.')
+    urls = {'recipe': recipe.id, 'author': author.id}
+
+    with ThreadPoolExecutor(max_workers=options.threads) as pool:
+        for name in options.endpoints:
+            model, template = ENDPOINTS[name]
+            url = template.format(**urls)
+            total, queries = Counter(), []
+            started = time.monotonic()
+            for _ in range(options.rounds):
+                model.objects.filter(user=user).delete()
+                statuses, round_queries = run_round(
+                    pool, options.threads, user, 'post', url
+                )
+                if statuses[201] != 1 or statuses[500]:
+                    sys.stdout.write(f'{name}: ошибка волны {statuses}\n')
+                total.update(statuses)
+                queries.extend(round_queries)
+            elapsed = time.monotonic() - started
+            requests = options.threads * options.rounds
+            sys.stdout.write(
+                f'{name:<14}{requests / elapsed:>9.1f} req/s  '
+                f'{sum(queries) / len(queries):>5.2f} queries/req  '
+                f'{dict(sorted(total.items()))}\n'
+            )
+            model.objects.filter(user=user).delete()
+
+
+if __name__ == '__main__':
+    main()
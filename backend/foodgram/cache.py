@@ -0,0 +1,323 @@
+import os
+import pickle
+import socket
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.core.cache import cache
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.db import transaction
+
+from foodgram.constants import CULL_EVERY
+from foodgram.shared_store import SharedSQLite
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS entries ('
+    'key TEXT PRIMARY KEY, namespace TEXT, value BLOB, expires REAL)',
+    'CREATE INDEX IF NOT EXISTS entries_namespace ON entries (namespace)',
+    'CREATE INDEX IF NOT EXISTS entries_expires ON entries (expires)',
+    'CREATE TABLE IF NOT EXISTS events ('
+    'id INTEGER PRIMARY KEY AUTOINCREMENT, worker TEXT, namespace TEXT, '
+    'key TEXT, created REAL)',
+    'CREATE TABLE IF NOT EXISTS stats ('
+    'worker TEXT PRIMARY KEY, local_hits INTEGER, shared_hits INTEGER, '
+    'misses INTEGER, updated REAL)',
+)
+
+
+def get_namespace(key):
+    """Пространство имен ключа - часть до первого двоеточия."""
+    return key.split(':', 1)[0]
+
+
+class TwoTierCache(BaseCache):
+    """
+    Двухуровневый кеш: LRU в памяти процесса перед общим хранилищем
+    в файле SQLite (LOCATION), которое видят все воркеры на сервере.
+    В памяти значения хранятся сериализованными, как в locmem.
+
+    Запись и удаление ключа, а также сброс пространства имен
+    публикуются в журнал событий. Перед чтением воркер не чаще раза
+    в POLL_INTERVAL секунд забирает новые события и выбрасывает
+    устаревшие записи из своей памяти, поэтому чужие изменения видны
+    c задержкой не больше POLL_INTERVAL. Если воркер не читал журнал
+    дольше EVENT_RETENTION, локальный уровень очищается целиком.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.local_max_entries = int(options.get('LOCAL_MAX_ENTRIES', 1000))
+        self.poll_interval = float(options.get('POLL_INTERVAL', 1))
+        self.event_retention = float(options.get('EVENT_RETENTION', 300))
+        self.db = SharedSQLite(location, SCHEMA)
+        self.lock = threading.RLock()
+        self.pid = None
+
+    def _check_process(self):
+        """После fork начинаем c пустой памятью и своей статистикой."""
+        if self.pid == os.getpid():
+            return
+        self.pid = os.getpid()
+        self.worker = f'{socket.gethostname()}:{self.pid}'
+        self.local = OrderedDict()
+        self.local_hits = self.shared_hits = self.misses = 0
+        self.last_poll = 0
+        self.polls = 0
+        self.last_event = self.db.execute(
+            'SELECT COALESCE(MAX(id), 0) FROM events'
+        ).fetchone()[0]
+
+    def _poll(self):
+        """Применяет к памяти процесса события других воркеров."""
+        now = time.time()
+        if now - self.last_poll < self.poll_interval:
+            return
+        stale = now - self.last_poll > self.event_retention
+        self.last_poll = now
+        events = self.db.execute(
+            'SELECT id, worker, namespace, key FROM events '
+            'WHERE id > ? ORDER BY id', (self.last_event,)
+        ).fetchall()
+        if stale:
+            self.local.clear()
+        for event_id, worker, namespace, key in events:
+            self.last_event = event_id
+            if stale or worker == self.worker:
+                continue
+            if key is not None:
+                self.local.pop(key, None)
+                continue
+            for local_key in [
+                local_key for local_key, (entry_namespace, _, _)
+                in self.local.items() if entry_namespace == namespace
+            ]:
+                del self.local[local_key]
+        self._save_stats(now)
+
+    def _save_stats(self, now):
+        self.polls += 1
+        if self.polls % CULL_EVERY == 0:
+            self.cull()
+        with self.db.transaction() as connection:
+            connection.execute(
+                'INSERT OR REPLACE INTO stats VALUES (?, ?, ?, ?, ?)',
+                (self.worker, self.local_hits, self.shared_hits,
+                 self.misses, now),
+            )
+            connection.execute(
+                'DELETE FROM events WHERE created < ?',
+                (now - self.event_retention,)
+            )
+
+    def _publish(self, connection, namespace, key=None):
+        connection.execute(
+            'INSERT INTO events (worker, namespace, key, created) '
+            'VALUES (?, ?, ?, ?)',
+            (self.worker, namespace, key, time.time()),
+        )
+
+    def _remember(self, key, namespace, expires, value):
+        self.local[key] = (namespace, expires, value)
+        self.local.move_to_end(key)
+        while len(self.local) > self.local_max_entries:
+            self.local.popitem(last=False)
+
+    def _prepare(self, key, version):
+        self._check_process()
+        self._poll()
+        full_key = self.make_key(key, version=version)
+        self.validate_key(full_key)
+        return full_key, get_namespace(key)
+
+    def get(self, key, default=None, version=None):
+        with self.lock:
+            key, namespace = self._prepare(key, version)
+            now = time.time()
+            entry = self.local.get(key)
+            if entry is not None:
+                if entry[1] is None or entry[1] > now:
+                    self.local.move_to_end(key)
+                    self.local_hits += 1
+                    return pickle.loads(entry[2])
+                del self.local[key]
+            row = self.db.execute(
+                'SELECT value, expires FROM entries WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None or row[1] is not None and row[1] <= now:
+                self.misses += 1
+                return default
+            self.shared_hits += 1
+            self._remember(key, namespace, row[1], row[0])
+            return pickle.loads(row[0])
+
+    def _write(self, key, value, timeout, version, only_new):
+        with self.lock:
+            key, namespace = self._prepare(key, version)
+            expires = self.get_backend_timeout(timeout)
+            pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+            with self.db.transaction() as connection:
+                if only_new:
+                    row = connection.execute(
+                        'SELECT expires FROM entries WHERE key = ?', (key,)
+                    ).fetchone()
+                    if row is not None and (
+                        row[0] is None or row[0] > time.time()
+                    ):
+                        return False
+                connection.execute(
+                    'INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)',
+                    (key, namespace, pickled, expires),
+                )
+                self._publish(connection, namespace, key)
+            self._remember(key, namespace, expires, pickled)
+            return True
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._write(key, value, timeout, version, only_new=False)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        return self._write(key, value, timeout, version, only_new=True)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        with self.lock:
+            key, _ = self._prepare(key, version)
+            expires = self.get_backend_timeout(timeout)
+            updated = self.db.execute(
+                'UPDATE entries SET expires = ? WHERE key = ?',
+                (expires, key)
+            ).rowcount
+            if key in self.local:
+                namespace, _, value = self.local[key]
+                self.local[key] = (namespace, expires, value)
+            return bool(updated)
+
+    def delete(self, key, version=None):
+        with self.lock:
+            key, namespace = self._prepare(key, version)
+            self.local.pop(key, None)
+            with self.db.transaction() as connection:
+                deleted = connection.execute(
+                    'DELETE FROM entries WHERE key = ?', (key,)
+                ).rowcount
+                self._publish(connection, namespace, key)
+            return bool(deleted)
+
+    def has_key(self, key, version=None):
+        return self.get(key, self, version=version) is not self
+
+    def invalidate(self, *namespaces):
+        """Сбрасывает пространства имен во всех воркерах."""
+        with self.lock:
+            self._check_process()
+            with self.db.transaction() as connection:
+                for namespace in namespaces:
+                    connection.execute(
+                        'DELETE FROM entries WHERE namespace = ?',
+                        (namespace,)
+                    )
+                    self._publish(connection, namespace)
+            for key in [
+                key for key, (namespace, _, _) in self.local.items()
+                if namespace in namespaces
+            ]:
+                del self.local[key]
+
+    def clear(self):
+        with self.lock:
+            self._check_process()
+            with self.db.transaction() as connection:
+                namespaces = [
+                    row[0] for row in connection.execute(
+                        'SELECT DISTINCT namespace FROM entries'
+                    )
+                ]
+                connection.execute('DELETE FROM entries')
+                for namespace in namespaces:
+                    self._publish(connection, namespace)
+            self.local.clear()
+
+    def cull(self):
+        """Удаляет из общего хранилища просроченные записи."""
+        self.db.execute(
+            'DELETE FROM entries WHERE expires <= ?', (time.time(),)
+        )
+
+    def stats(self):
+        """
+        Статистика попаданий по воркерам из общего хранилища
+        и суммарная доля попаданий.
+        """
+        with self.lock:
+            self._check_process()
+            self._save_stats(time.time())
+        workers = [
+            dict(zip(
+                ('worker', 'local_hits', 'shared_hits', 'misses', 'updated'),
+                row
+            ))
+            for row in self.db.execute(
+                'SELECT worker, local_hits, shared_hits, misses, updated '
+                'FROM stats ORDER BY worker'
+            )
+        ]
+        total = {
+            name: sum(worker[name] for worker in workers)
+            for name in ('local_hits', 'shared_hits', 'misses')
+        }
+        requests = sum(total.values())
+        total['hit_rate'] = (
+            (total['local_hits'] + total['shared_hits']) / requests
+            if requests else 0
+        )
+        return {'workers': workers, 'total': total}
+
+    def reset_stats(self):
+        with self.lock:
+            self._check_process()
+            self.local_hits = self.shared_hits = self.misses = 0
+            self.db.execute('DELETE FROM stats')
+
+
+_pending = threading.local()
+
+
+def get_generation(namespace):
+    """
+    Текущее поколение пространства имен, меняется при каждом сбросе.
+    Ключи c поколением не переживут сброс, даже если значение было
+    вычислено до него, а записано после.
+    """
+    return cache.get(f'generation:{namespace}', '0')
+
+
+def invalidate_on_commit(*namespaces, using=None):
+    """
+    Сбрасывает пространства имен кеша после фиксации транзакции.
+    Все сбросы одной транзакции объединяются в один.
+    """
+    connection = transaction.get_connection(using)
+    flush = getattr(_pending, 'flush', None)
+    if flush is not None and any(
+        func is flush for _, func in connection.run_on_commit
+    ):
+        _pending.namespaces.update(namespaces)
+        return
+    _pending.namespaces = set(namespaces)
+
+    def flush():
+        pending = _pending.namespaces
+        _pending.flush = None
+        if hasattr(cache, 'invalidate'):
+            cache.invalidate(*pending)
+        else:
+            cache.clear()
+        cache.set_many({
+            f'generation:{namespace}': uuid.uuid4().hex
+            for namespace in pending
+        }, None)
+
+    _pending.flush = flush
+    transaction.on_commit(flush, using=using)
@@ -11,3 +11,37 @@ PAGE_SIZE = 6
 MAX_IMAGES = 33
 NULL = 0
 PASS = 8
+SHORT_LINK_LENGTH = 6
+SHORT_LINK_CACHE_MAX_AGE = 60 * 60 * 24 * 30
+SHORT_LINK_ATTEMPTS = 5
+BATCH_SIZE = 1000
+MAX_BATCH_SIZE = 100
+FEED_FANOUT_THRESHOLD = 10000
+FEED_BACKFILL_LIMIT = 50
+FEED_TIMELINE_LIMIT = 1000
+SIMILAR_TOP_K = 10
+SIMILARITY_CHUNK_SIZE = 128
+SIGNATURE_LENGTH = 32
+POPULARITY_HALF_LIFE = 60 * 60 * 24 * 7
+POPULARITY_FAVORITE_WEIGHT = 1.0
+POPULARITY_CART_WEIGHT = 0.5
+POPULAR_TOP_N = 100
+POPULAR_CACHE_TTL = 60
+ESTIMATED_COUNT_THRESHOLD = 100000
+THROTTLE_CLEANUP_EVERY = 1000
+CULL_EVERY = 60
+RESPONSE_CACHE_TTL = 60
+RESPONSE_CACHE_LOCK_TIMEOUT = 5
+RESPONSE_CACHE_POLL = 0.05
+COUNT_CACHE_TTL = 300
+WORKER_MEMORY_MB = 150
+WORKER_MEMORY_SHARE = 0.75
+GTHREAD_THREADS = 4
+MAX_REQUESTS = 1000
+MAX_REQUESTS_JITTER = 100
+MAX_SERVINGS = 100
+BASE64_CHUNK_SIZE = 64 * 1024
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+IDEMPOTENCY_LOCK_TIMEOUT = 30
+IDEMPOTENCY_POLL = 0.05
+MEMORY_PROFILE_TOP = 10
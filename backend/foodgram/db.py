@@ -0,0 +1,40 @@
+import re
+
+from django.db import connections
+
+PLAN_ROWS = re.compile(r'rows=(\d+)')
+
+
+def estimate_count(queryset):
+    """
+    Оценка числа строк от планировщика PostgreSQL.
+    Для запроса без условий берется reltuples таблицы, иначе
+    оценка из EXPLAIN. Для других СУБД возвращает None.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    if not queryset.query.where:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class '
+                'WHERE oid = %s::regclass',
+                [queryset.model._meta.db_table],
+            )
+            row = cursor.fetchone()
+        return row[0] if row and row[0] >= 0 else None
+    match = PLAN_ROWS.search(queryset.explain())
+    return int(match.group(1)) if match else None
+
+
+def check_connections(**kwargs):
+    """
+    Проверка постоянных соединений в начале запроса, как
+    CONN_HEALTH_CHECKS в Django 4.1: соединение, которое пережило
+    предыдущий запрос, но уже не отвечает (перезапуск PostgreSQL,
+    обрыв по таймауту), закрывается до первого запроса к базе,
+    и Django тут же откроет новое.
+    """
+    for connection in connections.all():
+        if connection.connection is not None and not connection.is_usable():
+            connection.close()
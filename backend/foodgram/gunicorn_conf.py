@@ -0,0 +1,162 @@
+"""
+Конфигурация gunicorn: gunicorn -c python:foodgram.gunicorn_conf
+
+Класс воркеров выбирается переменной GUNICORN_WORKER_CLASS:
+sync, gthread (по умолчанию) или uvicorn - ASGI-приложение
+c USE_ASGI=True. Число воркеров и потоков считается по доступным
+CPU и памяти контейнера (c учетом cgroup), любое значение можно
+переопределить переменными окружения. Подобрать профиль под сервер
+помогает python -m benchmarks.gunicorn_profile.
+"""
+import math
+import os
+from pathlib import Path
+
+from foodgram.constants import (GTHREAD_THREADS, MAX_REQUESTS,
+                                MAX_REQUESTS_JITTER, WORKER_MEMORY_MB,
+                                WORKER_MEMORY_SHARE)
+
+WORKER_CLASSES = {
+    'sync': 'sync',
+    'gthread': 'gthread',
+    'uvicorn': 'uvicorn.workers.UvicornWorker',
+}
+UNLIMITED = 2 ** 60
+
+
+def read_cgroup_cpu_quota():
+    """Квота CPU контейнера в ядрах или None, если ее нет."""
+    try:
+        quota, period = Path('/sys/fs/cgroup/cpu.max').read_text().split()
+        if quota != 'max':
+            return int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+    try:
+        quota = int(
+            Path('/sys/fs/cgroup/cpu/cpu.cfs_quota_us').read_text()
+        )
+        period = int(
+            Path('/sys/fs/cgroup/cpu/cpu.cfs_period_us').read_text()
+        )
+        if quota > 0:
+            return quota / period
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def get_cpu_count():
+    """Число CPU, доступных процессу, c учетом affinity и квоты."""
+    try:
+        count = len(os.sched_getaffinity(0))
+    except AttributeError:
+        count = os.cpu_count() or 1
+    quota = read_cgroup_cpu_quota()
+    if quota:
+        count = min(count, max(1, math.ceil(quota)))
+    return count
+
+
+def get_memory_limit():
+    """Доступная память в байтах: лимит cgroup или физическая память."""
+    limits = [os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')]
+    for path in (
+        '/sys/fs/cgroup/memory.max',
+        '/sys/fs/cgroup/memory/memory.limit_in_bytes',
+    ):
+        try:
+            value = Path(path).read_text().strip()
+        except OSError:
+            continue
+        if value.isdigit() and int(value) < UNLIMITED:
+            limits.append(int(value))
+    return min(limits)
+
+
+def get_profile(worker_class, cpu_count, memory, worker_memory):
+    """
+    Число воркеров и потоков для класса воркеров.
+    sync держит один запрос на процесс, поэтому воркеров 2 * CPU + 1;
+    gthread и uvicorn ждут базу и клиентов без блокировки процесса,
+    им хватает CPU + 1 и CPU воркеров. Все варианты ограничены
+    долей памяти, которую можно отдать воркерам.
+    """
+    by_memory = max(1, int(memory * WORKER_MEMORY_SHARE // worker_memory))
+    if worker_class == 'sync':
+        workers, threads = 2 * cpu_count + 1, 1
+    elif worker_class == 'gthread':
+        workers, threads = cpu_count + 1, GTHREAD_THREADS
+    else:
+        workers, threads = cpu_count, 1
+    return min(workers, by_memory), threads
+
+
+worker_kind = os.getenv(
+    'GUNICORN_WORKER_CLASS',
+    'uvicorn' if os.getenv('USE_ASGI', '').lower() == 'true' else 'gthread'
+)
+if worker_kind not in WORKER_CLASSES:
+    raise ValueError(
+        f'GUNICORN_WORKER_CLASS должен быть одним из: '
+        f'{", ".join(WORKER_CLASSES)}'
+    )
+if worker_kind == 'uvicorn':
+    os.environ['USE_ASGI'] = 'True'
+    wsgi_app = 'foodgram.asgi:application'
+else:
+    wsgi_app = 'foodgram.wsgi:application'
+
+default_workers, default_threads = get_profile(
+    worker_kind,
+    get_cpu_count(),
+    get_memory_limit(),
+    int(os.getenv('GUNICORN_WORKER_MEMORY_MB', WORKER_MEMORY_MB)) * 2 ** 20,
+)
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+worker_class = WORKER_CLASSES[worker_kind]
+workers = int(os.getenv('GUNICORN_WORKERS', default_workers))
+threads = int(os.getenv('GUNICORN_THREADS', default_threads))
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', MAX_REQUESTS))
+max_requests_jitter = int(
+    os.getenv('GUNICORN_MAX_REQUESTS_JITTER', MAX_REQUESTS_JITTER)
+)
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 30))
+graceful_timeout = timeout
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 5))
+preload_app = os.getenv('GUNICORN_PRELOAD', 'True').lower() == 'true'
+loglevel = os.getenv('GUNICORN_LOG_LEVEL', 'info')
+
+# tracemalloc видит выделения всех потоков процесса, поэтому память
+# запросов профилируется только в однопоточных sync-воркерах.
+memory_profiling_disabled = (
+    float(os.getenv('MEMORY_PROFILE_RATE', 0)) > 0
+    and (worker_kind != 'sync' or threads > 1)
+)
+if memory_profiling_disabled:
+    os.environ['MEMORY_PROFILE_RATE'] = '0'
+
+
+def on_starting(server):
+    server.log.info(
+        'Профиль: %s, воркеров %s, потоков %s, max_requests %s',
+        worker_kind, workers, threads, max_requests,
+    )
+    if memory_profiling_disabled:
+        server.log.warning(
+            'MEMORY_PROFILE_RATE игнорируется: профилирование памяти '
+            'работает только в sync-воркерах без потоков'
+        )
+
+
+def pre_fork(server, worker):
+    """
+    При preload_app мастер уже ходил в базу (прогрев коротких ссылок).
+    Его соединения закрываются до fork, иначе воркеры унаследуют
+    один сокет и будут мешать друг другу.
+    """
+    from django.conf import settings
+    if settings.configured:
+        from django.db import connections
+        connections.close_all()
@@ -0,0 +1,152 @@
+import glob
+import json
+import os
+import random
+import sysconfig
+import threading
+import time
+import tracemalloc
+
+from django.conf import settings
+
+from foodgram.constants import MEMORY_PROFILE_TOP
+
+PROJECT_DIR = str(settings.BASE_DIR)
+STDLIB_DIR = sysconfig.get_paths()['stdlib']
+IGNORED_TRACES = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<unknown>'),
+)
+
+profile_lock = threading.Lock()
+state_lock = threading.Lock()
+
+
+def short_path(filename):
+    """Путь относительно проекта, site-packages или stdlib."""
+    if filename.startswith(PROJECT_DIR):
+        return os.path.relpath(filename, PROJECT_DIR)
+    if 'site-packages/' in filename:
+        return filename.rpartition('site-packages/')[2]
+    if filename.startswith(STDLIB_DIR):
+        return 'stdlib/' + os.path.relpath(filename, STDLIB_DIR)
+    return filename
+
+
+def get_route(request):
+    match = request.resolver_match
+    name = match.view_name if match is not None else request.path
+    return f'{request.method} {name}'
+
+
+def top_sites(snapshot, limit=MEMORY_PROFILE_TOP):
+    """Строки кода, выделившие больше всего живой памяти."""
+    statistics = snapshot.filter_traces(IGNORED_TRACES).statistics('lineno')
+    return [
+        {
+            'site': f'{short_path(frame.filename)}:{frame.lineno}',
+            'size': statistic.size,
+            'count': statistic.count,
+        }
+        for statistic in statistics[:limit]
+        for frame in statistic.traceback[:1]
+    ]
+
+
+def write_report(report, directory, release):
+    """Отчеты пишутся построчно в файл релиза и процесса."""
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f'{release}-{os.getpid()}.ndjson')
+    with open(path, 'a', encoding='utf-8') as file:
+        file.write(json.dumps(report, ensure_ascii=False) + '\n')
+
+
+def read_reports(source, directory):
+    """
+    Отчеты из файла, каталога или релиза: имя релиза ищется
+    в каталоге отчетов как <релиз>-*.ndjson.
+    """
+    if os.path.isfile(source):
+        paths = [source]
+    elif os.path.isdir(source):
+        paths = glob.glob(os.path.join(source, '*.ndjson'))
+    else:
+        paths = glob.glob(os.path.join(directory, f'{source}-*.ndjson'))
+    reports = []
+    for path in sorted(paths):
+        with open(path, encoding='utf-8') as file:
+            reports.extend(json.loads(line) for line in file if line.strip())
+    return reports
+
+
+class MemoryProfileMiddleware:
+    """
+    Профилирует память доли MEMORY_PROFILE_RATE запросов через
+    tracemalloc: пик выделений за запрос, включая рендеринг ответа,
+    и строки кода c наибольшим объемом живой памяти к его концу.
+    tracemalloc общий на процесс и видит выделения всех потоков,
+    поэтому запрос профилируется, только если он единственный
+    в процессе, a отчет отбрасывается, если за это время пришел
+    другой запрос. Выделения фоновых потоков (опрос кеша) все равно
+    попадают в отчет. B воркерах c потоками (gthread, uvicorn)
+    профилировать почти нечего, и gunicorn_conf отключает
+    профилирование для них. Отчеты пишутся в MEMORY_PROFILE_DIR,
+    по файлу на релиз (MEMORY_PROFILE_RELEASE) и процесс.
+    Подключается в settings, только если MEMORY_PROFILE_RATE больше 0.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.rate = settings.MEMORY_PROFILE_RATE
+        self.directory = settings.MEMORY_PROFILE_DIR
+        self.release = settings.MEMORY_PROFILE_RELEASE
+        self.active = 0
+        self.overlapped = False
+
+    def __call__(self, request):
+        with state_lock:
+            self.active += 1
+            self.overlapped = True
+        try:
+            if random.random() >= self.rate or tracemalloc.is_tracing():
+                return self.get_response(request)
+            return self.profile(request)
+        finally:
+            with state_lock:
+                self.active -= 1
+
+    def profile(self, request):
+        if not profile_lock.acquire(blocking=False):
+            return self.get_response(request)
+        try:
+            with state_lock:
+                alone = self.active == 1
+                if alone:
+                    tracemalloc.start()
+                    self.overlapped = False
+            if not alone:
+                return self.get_response(request)
+            started = time.perf_counter()
+            try:
+                response = self.get_response(request)
+                elapsed = time.perf_counter() - started
+                current, peak = tracemalloc.get_traced_memory()
+                snapshot = tracemalloc.take_snapshot()
+            finally:
+                with state_lock:
+                    tracemalloc.stop()
+                    overlapped = self.overlapped
+            if not overlapped:
+                write_report({
+                    'route': get_route(request),
+                    'status': response.status_code,
+                    'time': time.time(),
+                    'duration': round(elapsed, 4),
+                    'peak': peak,
+                    'current': current,
+                    'sites': top_sites(snapshot),
+                }, self.directory, self.release)
+        finally:
+            profile_lock.release()
+        return response
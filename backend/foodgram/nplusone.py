@@ -0,0 +1,160 @@
+import os
+import re
+import sys
+import warnings
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from rest_framework.serializers import Serializer
+
+DETECT_HEADER = 'HTTP_X_DETECT_N_PLUS_ONE'
+REPORT_HEADER = 'X-N-Plus-One'
+PROJECT_DIR = str(settings.BASE_DIR)
+SERIALIZER_CODE = Serializer.to_representation.__code__
+
+IN_LIST = re.compile(r'\bIN \((?:%s, )*%s\)')
+STRING = re.compile(r"'(?:[^']|'')*'")
+NUMBER = re.compile(r'\b\d+\b')
+SPACES = re.compile(r'\s+')
+
+
+class NPlusOneWarning(RuntimeWarning):
+    pass
+
+
+class NPlusOneError(AssertionError):
+    pass
+
+
+def normalize_sql(sql):
+    """Шаблон запроса: без списков IN, литералов и лишних пробелов."""
+    sql = IN_LIST.sub('IN (...)', sql)
+    sql = STRING.sub("'?'", sql)
+    sql = NUMBER.sub('N', sql)
+    return SPACES.sub(' ', sql).strip()
+
+
+def is_project_frame(frame):
+    filename = frame.f_code.co_filename
+    return (
+        filename.startswith(PROJECT_DIR)
+        and filename != __file__
+        and 'site-packages' not in filename
+    )
+
+
+def inspect_stack():
+    """
+    Место вызова - ближайший кадр из кода проекта, поле -
+    ближайшее поле сериализатора DRF, которое сейчас отдается.
+    """
+    site = field = None
+    frame = sys._getframe(2)
+    while frame is not None and (site is None or field is None):
+        if site is None and is_project_frame(frame):
+            site = (
+                f'{os.path.relpath(frame.f_code.co_filename, PROJECT_DIR)}'
+                f':{frame.f_lineno} ({frame.f_code.co_name})'
+            )
+        if field is None and frame.f_code is SERIALIZER_CODE:
+            current = frame.f_locals.get('field')
+            if current is not None:
+                serializer = type(frame.f_locals['self']).__name__
+                field = f'{serializer}.{current.field_name}'
+        frame = frame.f_back
+    return site, field
+
+
+class NPlusOneDetector:
+    """
+    Группирует выполненные запросы по шаблону и месту вызова.
+    Группа, повторенная больше threshold раз, считается N+1:
+    о ней сообщается предупреждением NPlusOneWarning или,
+    если raise_error, исключением NPlusOneError. При quiet
+    результаты только собираются в problems.
+    """
+
+    def __init__(self, threshold=None, raise_error=None, quiet=False):
+        self.threshold = (
+            settings.N_PLUS_ONE_THRESHOLD if threshold is None else threshold
+        )
+        self.raise_error = (
+            settings.N_PLUS_ONE_RAISE if raise_error is None else raise_error
+        )
+        self.quiet = quiet
+        self.counts = Counter()
+        self.fields = {}
+        self.stack = None
+
+    def __call__(self, execute, sql, params, many, context):
+        site, field = inspect_stack()
+        key = (normalize_sql(sql), site)
+        self.counts[key] += 1
+        self.fields.setdefault(key, field)
+        return execute(sql, params, many, context)
+
+    def __enter__(self):
+        self.stack = ExitStack()
+        for connection in connections.all():
+            self.stack.enter_context(connection.execute_wrapper(self))
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stack.close()
+        if exc_type is None and not self.quiet and self.problems:
+            self.report()
+
+    @property
+    def problems(self):
+        """[(число повторов, место вызова, поле, шаблон)], частые первыми."""
+        return sorted(
+            (
+                (count, site, self.fields[(template, site)], template)
+                for (template, site), count in self.counts.items()
+                if count > self.threshold
+            ),
+            key=lambda problem: -problem[0],
+        )
+
+    def describe(self):
+        return [
+            f'{count} x {site or "?"}'
+            + (f', поле {field}' if field else '')
+            + f': {template}'
+            for count, site, field, template in self.problems
+        ]
+
+    def report(self):
+        message = 'N+1 запросы:\n' + '\n'.join(self.describe())
+        if self.raise_error:
+            raise NPlusOneError(message)
+        warnings.warn(message, NPlusOneWarning, stacklevel=3)
+
+
+class NPlusOneMiddleware:
+    """
+    Включает детектор на время запроса: всегда при
+    N_PLUS_ONE_DETECTION = 'always', при 'header' - только
+    c заголовком X-Detect-N-Plus-One. Найденные повторы
+    перечисляются в заголовке ответа X-N-Plus-One.
+    Подключается в settings, только если детектор включен.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.always = settings.N_PLUS_ONE_DETECTION == 'always'
+
+    def __call__(self, request):
+        if not self.always and DETECT_HEADER not in request.META:
+            return self.get_response(request)
+        with NPlusOneDetector() as detector:
+            response = self.get_response(request)
+        problems = detector.problems
+        if problems:
+            response[REPORT_HEADER] = '; '.join(
+                f'{count} x {field or site}'
+                for count, site, field, _ in problems
+            )
+        return response
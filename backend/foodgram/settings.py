@@ -1,4 +1,5 @@
 import os
+import tempfile
 from pathlib import Path
 
 from django.core.management.utils import get_random_secret_key
@@ -18,6 +19,28 @@ ALLOWED_HOSTS = os.getenv('ALLOWED_HOSTS', '').split(',')
 
 DATABASE_USE = os.getenv('USE_DATA', 'False').lower() == 'true'
 
+USE_ASGI = os.getenv('USE_ASGI', 'False').lower() == 'true'
+
+# Под ASGI синхронный код выполняется в пуле потоков, и постоянные
+# соединения копились бы по одному на поток, поэтому они отключены.
+CONN_MAX_AGE = 0 if USE_ASGI else int(os.getenv('CONN_MAX_AGE', 60))
+
+CONN_HEALTH_CHECKS = os.getenv(
+    'CONN_HEALTH_CHECKS', 'True'
+).lower() == 'true'
+
+ASYNC_THREAD_POOL_SIZE = int(os.getenv('ASYNC_THREAD_POOL_SIZE', 8))
+
+FAST_RECIPE_SERIALIZER = os.getenv(
+    'FAST_RECIPE_SERIALIZER', 'True'
+).lower() == 'true'
+
+RECIPE_IDS_LIMIT = int(os.getenv('RECIPE_IDS_LIMIT', 100))
+
+RESPONSE_CACHE = os.getenv('RESPONSE_CACHE', 'True').lower() == 'true'
+
+IDEMPOTENCY_TTL = int(os.getenv('IDEMPOTENCY_TTL', 60 * 60 * 24))
+
 INSTALLED_APPS = [
     'django.contrib.admin',
     'django.contrib.auth',
@@ -44,6 +67,22 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+N_PLUS_ONE_DETECTION = os.getenv('N_PLUS_ONE_DETECTION', '').lower()
+N_PLUS_ONE_THRESHOLD = int(os.getenv('N_PLUS_ONE_THRESHOLD', 5))
+N_PLUS_ONE_RAISE = os.getenv('N_PLUS_ONE_RAISE', 'False').lower() == 'true'
+
+if N_PLUS_ONE_DETECTION in ('header', 'always'):
+    MIDDLEWARE.insert(0, 'foodgram.nplusone.NPlusOneMiddleware')
+
+MEMORY_PROFILE_RATE = float(os.getenv('MEMORY_PROFILE_RATE', 0))
+MEMORY_PROFILE_DIR = os.getenv('MEMORY_PROFILE_DIR') or os.path.join(
+    tempfile.gettempdir(), 'foodgram_memory'
+)
+MEMORY_PROFILE_RELEASE = os.getenv('MEMORY_PROFILE_RELEASE') or 'dev'
+
+if MEMORY_PROFILE_RATE > 0:
+    MIDDLEWARE.insert(0, 'foodgram.memprofile.MemoryProfileMiddleware')
+
 ROOT_URLCONF = 'foodgram.urls'
 
 TEMPLATES = [
@@ -64,11 +103,14 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'foodgram.wsgi.application'
 
+ASGI_APPLICATION = 'foodgram.asgi.application'
+
 if DATABASE_USE:
     DATABASES = {
         'default': {
             'ENGINE': 'django.db.backends.sqlite3',
             'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+            'CONN_MAX_AGE': CONN_MAX_AGE,
         }
     }
 else:
@@ -79,7 +121,8 @@ else:
             'USER': os.getenv('POSTGRES_USER', 'django'),
             'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
             'HOST': os.getenv('DB_HOST', ''),
-            'PORT': os.getenv('DB_PORT', 5432)
+            'PORT': os.getenv('DB_PORT', 5432),
+            'CONN_MAX_AGE': CONN_MAX_AGE,
         }
     }
 
@@ -110,10 +153,16 @@ USE_TZ = True
 
 STATIC_URL = '/static/'
 STATIC_ROOT = BASE_DIR / 'collected_static'
+STATIC_EXPORT_DIR = os.getenv('STATIC_EXPORT_DIR')
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+FILE_UPLOAD_HANDLERS = [
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+FILE_UPLOAD_TEMP_DIR = os.getenv('FILE_UPLOAD_TEMP_DIR') or None
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
@@ -125,6 +174,40 @@ REST_FRAMEWORK = {
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': PAGE_SIZE,
+    'NUM_PROXIES': (
+        int(os.getenv('NUM_PROXIES')) if os.getenv('NUM_PROXIES') else None
+    ),
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': 'foodgram.cache.TwoTierCache',
+        'LOCATION': os.getenv(
+            'CACHE_LOCATION',
+            os.path.join(tempfile.gettempdir(), 'foodgram_cache.sqlite3')
+        ),
+        'TIMEOUT': 300,
+        'OPTIONS': {
+            'LOCAL_MAX_ENTRIES': int(
+                os.getenv('CACHE_LOCAL_MAX_ENTRIES', 1000)
+            ),
+            'POLL_INTERVAL': float(os.getenv('CACHE_POLL_INTERVAL', 1)),
+        },
+    },
+}
+
+THROTTLE_STORE = os.getenv(
+    'THROTTLE_STORE',
+    os.path.join(tempfile.gettempdir(), 'foodgram_throttle.sqlite3')
+)
+
+TOKEN_BUCKET_RATES = {
+    'shopping_cart_download': {'burst': 5, 'rate': '30/hour'},
+    'shopping_cart_download.total': {'burst': 20, 'rate': '300/min'},
+    'recipe_create': {'burst': 5, 'rate': '50/hour'},
+    'recipe_create.total': {'burst': 50, 'rate': '600/min'},
+    'ingredient_search': {'burst': 30, 'rate': '120/min'},
+    'ingredient_search.total': {'burst': 300, 'rate': '6000/min'},
 }
 
 AUTH_USER_MODEL = 'users.CustomUser'
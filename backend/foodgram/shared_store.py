@@ -0,0 +1,46 @@
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+
+class SharedSQLite:
+    """
+    Файл SQLite, общий для всех воркеров на сервере.
+    Соединение создается отдельно для каждого потока и заново после
+    fork, схема создается при первом подключении.
+    """
+
+    def __init__(self, path, schema):
+        self.path = path
+        self.schema = schema
+        self.local = threading.local()
+
+    def get_connection(self):
+        connection = getattr(self.local, 'connection', None)
+        if connection is None or self.local.pid != os.getpid():
+            connection = sqlite3.connect(
+                self.path, timeout=5, isolation_level=None
+            )
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            for statement in self.schema:
+                connection.execute(statement)
+            self.local.connection = connection
+            self.local.pid = os.getpid()
+        return connection
+
+    def execute(self, sql, params=()):
+        return self.get_connection().execute(sql, params)
+
+    @contextmanager
+    def transaction(self):
+        """Транзакция c блокировкой на запись (BEGIN IMMEDIATE)."""
+        connection = self.get_connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            yield connection
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
@@ -1,7 +1,20 @@
+from django.conf import settings
 from django.contrib import admin
-from django.urls import include, path
+from django.urls import include, path, re_path
+
+from recipes.views import short_link_redirect
+
+SHORT_LINK_PATTERN = r'^s/(?P<code>[0-9A-Za-z]+)/?$'
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('api.urls', namespace='api')),
+    re_path(SHORT_LINK_PATTERN, short_link_redirect, name='short-link'),
 ]
+
+if settings.USE_ASGI:
+    from api.async_views import async_short_link_redirect
+
+    urlpatterns[-1] = re_path(
+        SHORT_LINK_PATTERN, async_short_link_redirect, name='short-link'
+    )
@@ -1,7 +1,14 @@
 import os
 
 from django.core.wsgi import get_wsgi_application
+from django.db import DatabaseError
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
 
 application = get_wsgi_application()
+
+try:
+    from recipes.short_links import warm_short_links
+    warm_short_links()
+except DatabaseError:
+    pass
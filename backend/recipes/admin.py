@@ -1,23 +1,56 @@
 from django.contrib import admin
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 
 from foodgram.constants import NULL
+from recipes.admin_utils import AutocompleteFilter, LargeTableAdmin
 from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
                             ShoppingCart, Tag)
+from recipes.snapshots import refresh_snapshots
 
 
 class RecipeIngredientInline(admin.TabularInline):
     model = RecipeIngredient
     extra = NULL
+    autocomplete_fields = ('ingredient',)
 
 
 @admin.register(Recipe)
-class RecipeAdmin(admin.ModelAdmin):
+class RecipeAdmin(LargeTableAdmin):
     inlines = (RecipeIngredientInline, )
-    list_display = ('author', 'name', 'cooking_time')
-    search_fields = ('name', 'author', 'tag')
-    list_filter = ('author', 'name', 'tag')
+    list_display = ('name', 'author', 'cooking_time', 'favorites_count')
+    list_select_related = ('author',)
+    search_fields = ('name', 'author__username')
+    list_filter = (('author', AutocompleteFilter), 'tag')
+    autocomplete_fields = ('author',)
+    ordering = ('-id',)
     empty_value_display = '-пусто-'
 
+    def get_queryset(self, request):
+        """
+        Число добавлений в избранное считается подзапросом,
+        только для рецептов текущей страницы.
+        """
+        favorites_count = Favorite.objects.filter(
+            recipe=OuterRef('pk')
+        ).order_by().values('recipe').annotate(
+            count=Count('pk')
+        ).values('count')
+        return super().get_queryset(request).annotate(
+            favorites_count=Coalesce(
+                Subquery(favorites_count, output_field=IntegerField()), 0
+            )
+        )
+
+    @admin.display(description='В избранном', ordering='favorites_count')
+    def favorites_count(self, recipe):
+        return recipe.favorites_count
+
+    def save_related(self, request, form, formsets, change):
+        """Ингредиенты из инлайна попадают в снимок рецепта."""
+        super().save_related(request, form, formsets, change)
+        refresh_snapshots(Recipe.objects.filter(pk=form.instance.pk))
+
 
 @admin.register(Ingredient)
 class IngredientAdmin(admin.ModelAdmin):
@@ -36,16 +69,24 @@ class TagAdmin(admin.ModelAdmin):
 
 
 @admin.register(Favorite)
-class FavoriteAdmin(admin.ModelAdmin):
+class FavoriteAdmin(LargeTableAdmin):
     list_display = ('user', 'recipe')
-    list_filter = ('user', 'recipe')
-    search_fields = ('user', 'recipe')
+    list_select_related = ('user', 'recipe__author')
+    list_filter = (('user', AutocompleteFilter),
+                   ('recipe', AutocompleteFilter))
+    search_fields = ('user__username', 'recipe__name')
+    autocomplete_fields = ('user', 'recipe')
+    ordering = ('-id',)
     empty_value_display = '-пусто-'
 
 
 @admin.register(ShoppingCart)
-class ShoppingCartAdmin(admin.ModelAdmin):
-    list_display = ('recipe', 'user')
-    list_filter = ('recipe', 'user')
-    search_fields = ('user', )
+class ShoppingCartAdmin(LargeTableAdmin):
+    list_display = ('recipe', 'user', 'servings')
+    list_select_related = ('user', 'recipe__author')
+    list_filter = (('recipe', AutocompleteFilter),
+                   ('user', AutocompleteFilter))
+    search_fields = ('user__username', 'recipe__name')
+    autocomplete_fields = ('user', 'recipe')
+    ordering = ('-id',)
     empty_value_display = '-пусто-'
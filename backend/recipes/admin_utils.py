@@ -0,0 +1,77 @@
+from django import forms
+from django.contrib import admin
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.core.paginator import Paginator
+from django.utils.functional import cached_property
+
+from foodgram.constants import ESTIMATED_COUNT_THRESHOLD
+from foodgram.db import estimate_count
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Пагинатор, который на больших таблицах не делает COUNT(*),
+    а берет оценку планировщика. Точный подсчет остается для выборок
+    меньше ESTIMATED_COUNT_THRESHOLD строк.
+    """
+
+    @cached_property
+    def count(self):
+        estimate = estimate_count(self.object_list)
+        if estimate is None or estimate < ESTIMATED_COUNT_THRESHOLD:
+            return super().count
+        return estimate
+
+
+class AutocompleteFilter(admin.FieldListFilter):
+    """
+    Фильтр по внешнему ключу c полем автодополнения вместо списка
+    всех связанных объектов. Использует autocomplete-view админки,
+    у админки связанной модели должны быть заданы search_fields.
+    """
+    template = 'admin/autocomplete_filter.html'
+
+    def __init__(self, field, request, params, model, model_admin,
+                 field_path):
+        self.lookup_kwarg = f'{field_path}__{field.target_field.name}__exact'
+        self.lookup_val = params.get(self.lookup_kwarg)
+        super().__init__(
+            field, request, params, model, model_admin, field_path
+        )
+        form_field = forms.ModelChoiceField(
+            queryset=field.remote_field.model._default_manager.all(),
+            widget=AutocompleteSelect(field, model_admin.admin_site),
+            required=False,
+        )
+        self.widget_id = f'id_{self.lookup_kwarg}'
+        self.rendered_widget = form_field.widget.render(
+            self.lookup_kwarg, self.lookup_val, {'id': self.widget_id}
+        )
+
+    def expected_parameters(self):
+        return [self.lookup_kwarg]
+
+    def has_output(self):
+        return True
+
+    def choices(self, changelist):
+        yield {
+            'selected': self.lookup_val is None,
+            'query_string': changelist.get_query_string(
+                remove=[self.lookup_kwarg]
+            ),
+            'display': 'Все',
+        }
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """
+    Базовая админка для больших таблиц: оценка числа строк вместо
+    COUNT(*) и статика для фильтров c автодополнением.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    @property
+    def media(self):
+        return super().media + AutocompleteSelect(None, self.admin_site).media
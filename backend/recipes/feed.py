@@ -0,0 +1,177 @@
+from django.db.models import Q
+
+from foodgram.constants import (BATCH_SIZE, FEED_BACKFILL_LIMIT,
+                                FEED_FANOUT_THRESHOLD, FEED_TIMELINE_LIMIT,
+                                PAGE_SIZE)
+
+
+def exceeds_fanout_threshold(author_id):
+    """Проверяет по точному числу подписчиков, что их больше порога."""
+    from users.models import Subscription
+    return Subscription.objects.filter(
+        author_id=author_id
+    )[FEED_FANOUT_THRESHOLD:FEED_FANOUT_THRESHOLD + 1].exists()
+
+
+def is_celebrity(author_id):
+    """
+    Отмечен ли автор знаменитостью. Отметка одна для записи и чтения
+    ленты и меняется в update_celebrity при переходе через порог.
+    """
+    from recipes.models import Celebrity
+    return Celebrity.objects.filter(author_id=author_id).exists()
+
+
+def fan_out(author_id, recipes, follower_ids):
+    """Раскладывает пары (id рецепта, дата) автора по лентам подписчиков."""
+    from recipes.models import TimelineEntry
+    batch = []
+    for user_id in follower_ids:
+        batch.extend(
+            TimelineEntry(
+                user_id=user_id, author_id=author_id,
+                recipe_id=recipe_id, pub_date=pub_date,
+            )
+            for recipe_id, pub_date in recipes
+        )
+        if len(batch) >= BATCH_SIZE:
+            TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def get_follower_ids(author_id):
+    from users.models import Subscription
+    return Subscription.objects.filter(
+        author_id=author_id
+    ).values_list('user_id', flat=True).iterator(chunk_size=BATCH_SIZE)
+
+
+def get_recent_recipes(author_id):
+    """Последние FEED_BACKFILL_LIMIT пар (id рецепта, дата) автора."""
+    from recipes.models import Recipe
+    return list(Recipe.objects.filter(author_id=author_id).order_by(
+        '-pub_date'
+    ).values_list('id', 'pub_date')[:FEED_BACKFILL_LIMIT])
+
+
+def fan_out_recipe(recipe):
+    """Раскладывает новый рецепт по лентам подписчиков автора."""
+    if is_celebrity(recipe.author_id):
+        return
+    fan_out(
+        recipe.author_id, [(recipe.id, recipe.pub_date)],
+        get_follower_ids(recipe.author_id),
+    )
+
+
+def fan_out_recipes(recipes):
+    """
+    Раскладывает пачку новых рецептов - тройки (id рецепта, id автора,
+    дата) - по лентам подписчиков, одним проходом на автора.
+    """
+    by_author = {}
+    for recipe_id, author_id, pub_date in recipes:
+        by_author.setdefault(author_id, []).append((recipe_id, pub_date))
+    for author_id, author_recipes in by_author.items():
+        if not is_celebrity(author_id):
+            fan_out(author_id, author_recipes, get_follower_ids(author_id))
+
+
+def backfill_timeline(user_id, author_id):
+    """Добавляет в ленту последние рецепты автора после подписки."""
+    if is_celebrity(author_id):
+        return
+    fan_out(author_id, get_recent_recipes(author_id), [user_id])
+
+
+def prune_timeline(user_id, author_id):
+    """Убирает из ленты рецепты автора после отписки."""
+    from recipes.models import TimelineEntry
+    TimelineEntry.objects.filter(
+        user_id=user_id, author_id=author_id
+    ).delete()
+
+
+def update_celebrity(author_id):
+    """
+    Сверяет отметку знаменитости c числом подписчиков после подписки
+    или отписки. Рецепты нового знаменитого автора убираются из лент:
+    они подмешиваются при чтении. Последние рецепты автора, который
+    опустился до порога, раскладываются по лентам всех подписчиков,
+    иначе опубликованное за время над порогом пропало бы из лент.
+    """
+    from recipes.models import Celebrity, TimelineEntry
+    if exceeds_fanout_threshold(author_id):
+        _, created = Celebrity.objects.get_or_create(author_id=author_id)
+        if created:
+            TimelineEntry.objects.filter(author_id=author_id).delete()
+        return
+    deleted, _ = Celebrity.objects.filter(author_id=author_id).delete()
+    if deleted:
+        fan_out(
+            author_id, get_recent_recipes(author_id),
+            get_follower_ids(author_id),
+        )
+
+
+def trim_timeline(user_id, limit=FEED_TIMELINE_LIMIT):
+    """Оставляет в ленте пользователя limit самых новых записей."""
+    from recipes.models import TimelineEntry
+    entries = TimelineEntry.objects.filter(user_id=user_id)
+    boundary = entries.order_by('-pub_date', '-recipe_id').values_list(
+        'pub_date', 'recipe_id'
+    )[limit:limit + 1].first()
+    if boundary is None:
+        return 0
+    pub_date, recipe_id = boundary
+    deleted, _ = entries.filter(
+        Q(pub_date__lt=pub_date)
+        | Q(pub_date=pub_date, recipe_id__lte=recipe_id)
+    ).delete()
+    return deleted
+
+
+def get_page_keys(queryset, id_field, boundary, limit, reverse):
+    """
+    До limit пар (дата, id рецепта) из queryset после boundary
+    по убыванию или, если reverse, до него по возрастанию.
+    """
+    lookup, sign = ('gt', '') if reverse else ('lt', '-')
+    if boundary is not None:
+        pub_date, recipe_id = boundary
+        queryset = queryset.filter(
+            Q(**{f'pub_date__{lookup}': pub_date})
+            | Q(pub_date=pub_date, **{f'{id_field}__{lookup}': recipe_id})
+        )
+    return queryset.order_by(
+        f'{sign}pub_date', f'{sign}{id_field}'
+    ).values_list('pub_date', id_field)[:limit]
+
+
+def get_feed_page(user, boundary=None, limit=PAGE_SIZE, reverse=False):
+    """
+    Ключи (дата публикации, id рецепта) страницы ленты пользователя:
+    записи его ленты и рецепты знаменитостей, на которых он подписан.
+    Каждый источник читается по индексу не дальше limit строк после
+    границы boundary, результаты сливаются. Ключи идут по убыванию,
+    a при reverse - по возрастанию, к более новым рецептам.
+    """
+    from recipes.models import Celebrity, Recipe, TimelineEntry
+    keys = {}
+    sources = (
+        (TimelineEntry.objects.filter(user=user), 'recipe_id'),
+        (Recipe.objects.filter(author__in=Celebrity.objects.filter(
+            author__subscriptions__user=user
+        ).values('author_id')), 'id'),
+    )
+    for queryset, id_field in sources:
+        keys.update(
+            (recipe_id, pub_date) for pub_date, recipe_id in get_page_keys(
+                queryset, id_field, boundary, limit, reverse
+            )
+        )
+    return sorted(
+        ((pub_date, recipe_id) for recipe_id, pub_date in keys.items()),
+        reverse=not reverse,
+    )[:limit]
@@ -0,0 +1,39 @@
+from time import monotonic
+
+from django.core.management.base import BaseCommand
+
+from foodgram.constants import SIMILAR_TOP_K, SIMILARITY_CHUNK_SIZE
+from recipes.similarity import build_similar_recipes
+
+
+class Command(BaseCommand):
+    """
+    Кастомная команда для расчета похожих рецептов
+    по общим ингредиентам и тегам.
+    """
+
+    help = 'Рассчитывает списки похожих рецептов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--incremental', action='store_true',
+            help='Пересчитать только рецепты, измененные c прошлого запуска.'
+        )
+        parser.add_argument('--top-k', type=int, default=SIMILAR_TOP_K)
+        parser.add_argument(
+            '--chunk-size', type=int, default=SIMILARITY_CHUNK_SIZE
+        )
+        parser.add_argument('--workers', type=int, default=1)
+
+    def handle(self, *args, **options):
+        started = monotonic()
+        count = build_similar_recipes(
+            incremental=options['incremental'],
+            top_k=options['top_k'],
+            chunk_size=options['chunk_size'],
+            workers=options['workers'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересчитано рецептов: {count} '
+            f'за {monotonic() - started:.1f} c'
+        ))
@@ -0,0 +1,44 @@
+from datetime import datetime
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    """
+    Кастомная команда для просмотра статистики двухуровневого кеша:
+    попадания в память процесса, в общее хранилище и промахи
+    по каждому воркеру и в сумме.
+    """
+
+    help = 'Показывает долю попаданий в кеш по воркерам'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset', action='store_true',
+            help='Сбросить накопленную статистику',
+        )
+
+    def handle(self, *args, **options):
+        if not hasattr(cache, 'stats'):
+            raise CommandError('Кеш по умолчанию не ведет статистику.')
+        if options['reset']:
+            cache.reset_stats()
+            self.stdout.write(self.style.SUCCESS('Статистика сброшена'))
+            return
+        stats = cache.stats()
+        for worker in stats['workers']:
+            updated = datetime.fromtimestamp(worker['updated'])
+            self.stdout.write(
+                f'{worker["worker"]}: память {worker["local_hits"]}, '
+                f'общее хранилище {worker["shared_hits"]}, '
+                f'промахи {worker["misses"]} '
+                f'(обновлено {updated:%Y-%m-%d %H:%M:%S})'
+            )
+        total = stats['total']
+        self.stdout.write(self.style.SUCCESS(
+            f'Всего: память {total["local_hits"]}, '
+            f'общее хранилище {total["shared_hits"]}, '
+            f'промахи {total["misses"]}, '
+            f'доля попаданий {total["hit_rate"]:.1%}'
+        ))
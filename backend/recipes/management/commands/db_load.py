@@ -2,7 +2,7 @@ import os
 from csv import reader
 
 from django.conf import settings
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 
 from recipes.models import Ingredient, Tag
 
@@ -12,12 +12,17 @@ class Command(BaseCommand):
     Кастомная команда для загрузки данных из CSV-файлов
     в модели Ingredient и Tag.
     Реализует автоматическое заполнение базы данных.
+    При ошибке в любом файле команда завершается c CommandError,
+    чтобы startup не считал шаг выполненным.
     """
 
     help = 'Заполняет базу данных ингредиентами и тегами из CSV'
 
     def _process_csv_file(self, file_path, model_class, fields_map):
-        """Внутренний метод для обработки CSV файла и создания записей."""
+        """
+        Внутренний метод для обработки CSV файла и создания записей.
+        Ошибки чтения и записи превращаются в CommandError.
+        """
         items_to_create = []
         existing_count = 0
 
@@ -55,10 +60,12 @@ class Command(BaseCommand):
                 )
             )
 
-        except FileNotFoundError:
-            self.stdout.write(self.style.ERROR(f'Файл не найден: {file_path}'))
+        except FileNotFoundError as error:
+            raise CommandError(f'Файл не найден: {file_path}') from error
         except Exception as error:
-            self.stdout.write(self.style.ERROR(f'Ошибка: {str(error)}'))
+            raise CommandError(
+                f'Ошибка в {file_path}: {str(error)}'
+            ) from error
 
     def handle(self, *args, **kwargs):
         """
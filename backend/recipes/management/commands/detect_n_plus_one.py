@@ -0,0 +1,93 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.test.utils import override_settings
+from rest_framework.authtoken.models import Token
+
+from foodgram.constants import PAGE_SIZE
+from foodgram.nplusone import NPlusOneDetector
+from recipes.startup import get_warmup_hosts
+from users.models import CustomUser
+
+PUBLIC_URLS = (
+    '/api/tags/',
+    '/api/ingredients/',
+    f'/api/recipes/?limit={PAGE_SIZE}',
+    '/api/users/',
+)
+USER_URLS = (
+    '/api/users/me/',
+    '/api/users/subscriptions/',
+    f'/api/recipes/?limit={PAGE_SIZE}&favorite_filter=1',
+    f'/api/recipes/?limit={PAGE_SIZE}&shopping_cart_filter=1',
+)
+
+
+class Command(BaseCommand):
+    """
+    Запрашивает адреса API c детектором N+1 и печатает повторяющиеся
+    запросы c местом вызова и полем сериализатора. Кеш анонимных
+    ответов на время проверки выключается. Если повторы найдены,
+    команда завершается c ошибкой, поэтому ее можно запускать в CI.
+    """
+
+    help = 'Поиск N+1 запросов на основных адресах API'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'urls', nargs='*',
+            help='Адреса для проверки; по умолчанию основные списки API',
+        )
+        parser.add_argument(
+            '--user',
+            help='Email пользователя для адресов c авторизацией',
+        )
+        parser.add_argument(
+            '--threshold', type=int, default=settings.N_PLUS_ONE_THRESHOLD,
+            help='Допустимое число одинаковых запросов из одного места',
+        )
+        parser.add_argument(
+            '--no-fast', action='store_true',
+            help='Отдавать рецепты сериализатором DRF, а не быстрым',
+        )
+
+    def get_client(self, email):
+        client = Client(
+            HTTP_HOST=get_warmup_hosts()[0],
+            HTTP_ACCEPT='application/json',
+        )
+        if email is None:
+            return client
+        user = CustomUser.objects.filter(email=email).first()
+        if user is None:
+            raise CommandError(f'Пользователь не найден: {email}.')
+        token, _ = Token.objects.get_or_create(user=user)
+        client.defaults['HTTP_AUTHORIZATION'] = f'Token {token.key}'
+        return client
+
+    def handle(self, *args, **options):
+        client = self.get_client(options['user'])
+        urls = options['urls'] or [
+            *PUBLIC_URLS, *(USER_URLS if options['user'] else ()),
+        ]
+        found = 0
+        with override_settings(
+            FAST_RECIPE_SERIALIZER=(
+                settings.FAST_RECIPE_SERIALIZER and not options['no_fast']
+            ),
+            RESPONSE_CACHE=False,
+        ):
+            for url in urls:
+                with NPlusOneDetector(
+                    options['threshold'], quiet=True
+                ) as detector:
+                    response = client.get(url)
+                problems = detector.describe()
+                status = 'OK' if not problems else f'N+1: {len(problems)}'
+                self.stdout.write(f'{response.status_code} {url}  {status}')
+                for problem in problems:
+                    self.stdout.write(f'    {problem}')
+                found += len(problems)
+        if found:
+            raise CommandError(f'Найдено N+1 запросов: {found}.')
+        self.stdout.write(self.style.SUCCESS('N+1 запросов не найдено.'))
@@ -0,0 +1,37 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from foodgram.constants import BATCH_SIZE
+from recipes.transfer import export_recipes
+
+
+class Command(BaseCommand):
+    """
+    Выгружает все рецепты в NDJSON в файл или в stdout,
+    не загружая их в память целиком.
+    """
+
+    help = 'Выгружает рецепты в формате NDJSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?', default='-',
+            help='Файл для выгрузки, по умолчанию stdout',
+        )
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        lines = export_recipes(options['batch_size'])
+        if path == '-':
+            sys.stdout.buffer.writelines(lines)
+            return
+        count = 0
+        with open(path, 'wb') as file:
+            for line in lines:
+                file.write(line)
+                count += 1
+        self.stdout.write(
+            self.style.SUCCESS(f'Выгружено рецептов: {count}')
+        )
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from foodgram.constants import BATCH_SIZE
+from recipes.models import Recipe
+from recipes.short_links import generate_short_link
+
+
+class Command(BaseCommand):
+    """
+    Кастомная команда для заполнения коротких ссылок
+    у рецептов, созданных до их появления.
+    """
+
+    help = 'Генерирует короткие ссылки для рецептов без них'
+
+    def handle(self, *args, **kwargs):
+        """Заполняет пустые short_link пачками через bulk_update."""
+        recipes = Recipe.objects.filter(
+            Q(short_link__isnull=True) | Q(short_link='')
+        ).only('id')
+        if not recipes.exists():
+            self.stdout.write('Все рецепты уже имеют короткие ссылки.')
+            return
+        used = set(
+            Recipe.objects.exclude(short_link__isnull=True)
+            .values_list('short_link', flat=True)
+            .iterator()
+        )
+        batch = []
+        updated = 0
+        for recipe in recipes.iterator(chunk_size=BATCH_SIZE):
+            code = generate_short_link()
+            while code in used:
+                code = generate_short_link()
+            used.add(code)
+            recipe.short_link = code
+            batch.append(recipe)
+            if len(batch) >= BATCH_SIZE:
+                Recipe.objects.bulk_update(batch, ['short_link'])
+                updated += len(batch)
+                batch = []
+        Recipe.objects.bulk_update(batch, ['short_link'])
+        updated += len(batch)
+        self.stdout.write(
+            self.style.SUCCESS(f'Заполнено коротких ссылок: {updated}')
+        )
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from foodgram.constants import BATCH_SIZE
+from recipes.feed import backfill_timeline
+from users.models import Subscription
+
+
+class Command(BaseCommand):
+    """
+    Кастомная команда для заполнения лент подписок
+    по уже существующим подпискам.
+    """
+
+    help = 'Заполняет ленты подписок последними рецептами авторов'
+
+    def handle(self, *args, **kwargs):
+        """Для каждой подписки добавляет в ленту свежие рецепты автора."""
+        pairs = Subscription.objects.values_list('user_id', 'author_id')
+        count = 0
+        for user_id, author_id in pairs.iterator(chunk_size=BATCH_SIZE):
+            backfill_timeline(user_id, author_id)
+            count += 1
+        self.stdout.write(
+            self.style.SUCCESS(f'Обработано подписок: {count}')
+        )
@@ -0,0 +1,56 @@
+import sys
+from time import monotonic
+
+from django.core.management.base import BaseCommand, CommandError
+
+from foodgram.constants import BATCH_SIZE
+from recipes.transfer import RecipeImporter
+from users.models import CustomUser
+
+MAX_REPORTED_ERRORS = 20
+
+
+class Command(BaseCommand):
+    """
+    Загружает рецепты из NDJSON, выгруженного export_recipes.
+    Строки c ошибками пропускаются, первые из них печатаются.
+    """
+
+    help = 'Загружает рецепты из файла NDJSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?', default='-',
+            help='Файл NDJSON, по умолчанию stdin',
+        )
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument(
+            '--default-author',
+            help='Email автора для рецептов, чей автор не найден',
+        )
+
+    def handle(self, *args, **options):
+        default_author = None
+        if options['default_author']:
+            default_author = CustomUser.objects.filter(
+                email=options['default_author']
+            ).first()
+            if default_author is None:
+                raise CommandError(
+                    f'Пользователь не найден: {options["default_author"]}'
+                )
+        importer = RecipeImporter(options['batch_size'], default_author)
+        started = monotonic()
+        if options['path'] == '-':
+            importer.run(sys.stdin.buffer)
+        else:
+            with open(options['path'], 'rb') as file:
+                importer.run(file)
+        elapsed = monotonic() - started
+        for number, errors in importer.errors[:MAX_REPORTED_ERRORS]:
+            self.stderr.write(f'Строка {number}: {" ".join(errors)}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Загружено рецептов: {importer.created}, '
+            f'пропущено строк: {len(importer.errors)} '
+            f'за {elapsed:.1f} c'
+        ))
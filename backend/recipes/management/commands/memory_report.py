@@ -0,0 +1,133 @@
+import statistics
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from foodgram.constants import MEMORY_PROFILE_TOP
+from foodgram.memprofile import read_reports
+
+MEGABYTE = 1024 * 1024
+
+
+def summarize(reports):
+    """{маршрут: (число выборок, медиана пика, максимум пика, места)}."""
+    routes = defaultdict(list)
+    for report in reports:
+        routes[report['route']].append(report)
+    summary = {}
+    for route, samples in routes.items():
+        peaks = [sample['peak'] for sample in samples]
+        sites = defaultdict(int)
+        for sample in samples:
+            for site in sample['sites']:
+                sites[site['site']] += site['size']
+        summary[route] = (
+            len(samples), statistics.median(peaks), max(peaks),
+            {site: size / len(samples) for site, size in sites.items()},
+        )
+    return summary
+
+
+def megabytes(size):
+    return f'{size / MEGABYTE:.2f}'
+
+
+class Command(BaseCommand):
+    """
+    Сводка отчетов MemoryProfileMiddleware по маршрутам: число
+    выборок, медиана и максимум пика памяти. Со вторым аргументом
+    сравнивает релизы: изменение медианы пика по маршрутам и места
+    выделения памяти, которые выросли сильнее всего.
+    """
+
+    help = 'Сводка и сравнение отчетов о памяти по маршрутам'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'release',
+            help='Релиз, каталог или файл c отчетами',
+        )
+        parser.add_argument(
+            'base', nargs='?',
+            help='Релиз, каталог или файл для сравнения',
+        )
+        parser.add_argument(
+            '--dir', default=settings.MEMORY_PROFILE_DIR,
+            help='Каталог отчетов для поиска по имени релиза',
+        )
+        parser.add_argument(
+            '--top', type=int, default=MEMORY_PROFILE_TOP,
+            help='Сколько мест выделения памяти показывать',
+        )
+
+    def load(self, source, directory):
+        reports = read_reports(source, directory)
+        if not reports:
+            raise CommandError(f'Отчеты не найдены: {source}.')
+        return summarize(reports)
+
+    def show(self, summary, top):
+        self.stdout.write(
+            f'{"Маршрут":<48}{"Выборок":>8}{"Медиана, МБ":>13}'
+            f'{"Максимум, МБ":>14}'
+        )
+        for route, (count, median, peak, sites) in sorted(
+            summary.items(), key=lambda item: -item[1][1]
+        ):
+            self.stdout.write(
+                f'{route:<48}{count:>8}{megabytes(median):>13}'
+                f'{megabytes(peak):>14}'
+            )
+            for site, size in sorted(
+                sites.items(), key=lambda item: -item[1]
+            )[:top]:
+                self.stdout.write(f'    {megabytes(size):>8} МБ  {site}')
+
+    def compare(self, summary, base, top):
+        self.stdout.write(
+            f'{"Маршрут":<48}{"Было, МБ":>10}{"Стало, МБ":>11}'
+            f'{"Разница":>10}'
+        )
+        changes = []
+        for route in summary.keys() | base.keys():
+            old = base[route][1] if route in base else None
+            new = summary[route][1] if route in summary else None
+            delta = (new or 0) - (old or 0)
+            changes.append((delta, route, old, new))
+        for delta, route, old, new in sorted(changes, reverse=True):
+            percent = f' ({delta / old:+.0%})' if old and new else ''
+            self.stdout.write(
+                f'{route:<48}'
+                f'{megabytes(old) if old is not None else "-":>10}'
+                f'{megabytes(new) if new is not None else "-":>11}'
+                f'{megabytes(delta):>10}{percent}'
+            )
+            if old is None or new is None:
+                continue
+            old_sites, new_sites = base[route][3], summary[route][3]
+            grown = sorted(
+                (
+                    (size - old_sites.get(site, 0), site)
+                    for site, size in new_sites.items()
+                ),
+                reverse=True,
+            )
+            for growth, site in grown[:top]:
+                if growth > 0:
+                    self.stdout.write(
+                        f'    {megabytes(growth):>8} МБ  {site}'
+                    )
+
+    def handle(self, *args, **options):
+        summary = self.load(options['release'], options['dir'])
+        if options['base'] is None:
+            self.show(summary, options['top'])
+        else:
+            base = self.load(options['base'], options['dir'])
+            self.compare(summary, base, options['top'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Маршрутов: {len(summary)}, отчетов в '
+            f'{options["release"]}: '
+            f'{sum(count for count, *_ in summary.values())}'
+        ))
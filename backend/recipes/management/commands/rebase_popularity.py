@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from recipes.popularity import rebase_popularity
+
+
+class Command(BaseCommand):
+    """
+    Кастомная команда для периодического переноса точки отсчета
+    затухающих оценок популярности. Запускается по расписанию.
+    """
+
+    help = 'Переносит точку отсчета оценок популярности на текущий момент'
+
+    def handle(self, *args, **kwargs):
+        updated = rebase_popularity()
+        self.stdout.write(
+            self.style.SUCCESS(f'Пересчитано оценок: {updated}')
+        )
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from foodgram.constants import BATCH_SIZE
+from recipes.models import Recipe
+from recipes.snapshots import refresh_snapshots
+
+
+class Command(BaseCommand):
+    """
+    Пересобирает снимки ингредиентов рецептов из связей
+    RecipeIngredient пачками через bulk_update.
+    """
+
+    help = 'Пересобирает снимки ингредиентов рецептов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--missing', action='store_true',
+            help='Только рецепты, у которых снимка еще нет',
+        )
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.all()
+        if options['missing']:
+            recipes = recipes.filter(ingredients_snapshot__isnull=True)
+        updated = refresh_snapshots(recipes, options['batch_size'])
+        self.stdout.write(
+            self.style.SUCCESS(f'Пересобрано снимков ингредиентов: {updated}')
+        )
@@ -0,0 +1,124 @@
+import shutil
+import time
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.db.models import Q
+
+from recipes.models import Recipe
+from recipes.startup import (data_checksum, get_stamp, migrations_checksum,
+                             read_checksum_file, set_stamp, static_checksum,
+                             warm_catalogue, write_checksum_file)
+
+DONE = 'выполнен'
+SKIPPED = 'пропущен'
+
+
+class Command(BaseCommand):
+    """
+    Подготовка контейнера к запуску вместо набора команд в entrypoint.
+    Каждый шаг пропускается, если его входные данные не изменились
+    c прошлого запуска: миграции и CSV сверяются c суммами в базе,
+    статика - c файлом .checksum в каталоге назначения.
+    В конце печатается время каждого шага.
+    """
+
+    help = 'Миграции, данные, статика и прогрев кеша c пропуском шагов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Выполнить все шаги независимо от контрольных сумм',
+        )
+        parser.add_argument(
+            '--no-warm', action='store_true',
+            help='Не прогревать кеш',
+        )
+
+    def migrate(self):
+        checksum = migrations_checksum()
+        if not self.force and get_stamp('migrate') == checksum:
+            return SKIPPED
+        executor = MigrationExecutor(connection)
+        status = SKIPPED
+        if executor.migration_plan(executor.loader.graph.leaf_nodes()):
+            call_command('migrate', interactive=False, verbosity=0)
+            status = DONE
+        set_stamp('migrate', checksum)
+        return status
+
+    def load_data(self):
+        checksum = data_checksum()
+        if not self.force and get_stamp('db_load') == checksum:
+            return SKIPPED
+        call_command('db_load', stdout=self.stdout)
+        set_stamp('db_load', checksum)
+        return DONE
+
+    def fill_short_links(self):
+        if not Recipe.objects.filter(
+            Q(short_link__isnull=True) | Q(short_link='')
+        ).exists():
+            return SKIPPED
+        call_command('fill_short_links', stdout=self.stdout)
+        return DONE
+
+    def fill_snapshots(self):
+        if not Recipe.objects.filter(
+            ingredients_snapshot__isnull=True
+        ).exists():
+            return SKIPPED
+        call_command(
+            'rebuild_ingredient_snapshots', '--missing', stdout=self.stdout
+        )
+        return DONE
+
+    def collect_static(self):
+        checksum = static_checksum()
+        status = SKIPPED
+        if self.force or read_checksum_file(
+            settings.STATIC_ROOT
+        ) != checksum:
+            call_command('collectstatic', interactive=False, verbosity=0)
+            write_checksum_file(settings.STATIC_ROOT, checksum)
+            status = DONE
+        export_dir = settings.STATIC_EXPORT_DIR
+        if export_dir and (
+            self.force or read_checksum_file(export_dir) != checksum
+        ):
+            shutil.copytree(
+                settings.STATIC_ROOT, export_dir, dirs_exist_ok=True
+            )
+            status = DONE
+        return status
+
+    def warm(self):
+        if self.no_warm:
+            return SKIPPED
+        return f'{DONE}, записей: {warm_catalogue()}'
+
+    def handle(self, *args, **options):
+        self.force = options['force']
+        self.no_warm = options['no_warm']
+        phases = (
+            ('migrate', self.migrate),
+            ('db_load', self.load_data),
+            ('fill_short_links', self.fill_short_links),
+            ('snapshots', self.fill_snapshots),
+            ('collectstatic', self.collect_static),
+            ('warm', self.warm),
+        )
+        timings = []
+        for name, phase in phases:
+            started = time.perf_counter()
+            status = phase()
+            timings.append((name, time.perf_counter() - started, status))
+        total = sum(elapsed for _, elapsed, _ in timings)
+        for name, elapsed, status in timings:
+            self.stdout.write(f'{name:<18}{elapsed:8.3f} c  {status}')
+        self.stdout.write(
+            self.style.SUCCESS(f'{"Итого":<18}{total:8.3f} c')
+        )
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+
+from foodgram.constants import BATCH_SIZE, FEED_TIMELINE_LIMIT
+from recipes.feed import trim_timeline
+from recipes.models import TimelineEntry
+
+
+class Command(BaseCommand):
+    """
+    Кастомная команда для периодической очистки лент подписок:
+    в каждой ленте остаются только самые новые записи.
+    Запускается по расписанию.
+    """
+
+    help = 'Удаляет из лент подписок старые записи сверх лимита'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit', type=int, default=FEED_TIMELINE_LIMIT,
+            help='Сколько записей оставлять в ленте',
+        )
+
+    def handle(self, *args, **options):
+        limit = options['limit']
+        user_ids = TimelineEntry.objects.values('user').annotate(
+            entries=Count('id')
+        ).filter(entries__gt=limit).values_list('user', flat=True)
+        deleted = 0
+        for user_id in user_ids.iterator(chunk_size=BATCH_SIZE):
+            deleted += trim_timeline(user_id, limit)
+        self.stdout.write(
+            self.style.SUCCESS(f'Удалено записей лент: {deleted}')
+        )
@@ -0,0 +1,49 @@
+# Generated by Django 3.2.3 on 2026-10-19 10:00
+
+import time
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def create_epoch(apps, schema_editor):
+    """Создает точку отсчета и начальные оценки по текущим спискам."""
+    PopularityEpoch = apps.get_model('recipes', 'PopularityEpoch')
+    Recipe = apps.get_model('recipes', 'Recipe')
+    PopularityEpoch.objects.create(epoch=time.time())
+    recipes = Recipe.objects.annotate(
+        favorites_count=Count('favorites', distinct=True),
+        carts_count=Count('shopping_carts', distinct=True),
+    ).filter(models.Q(favorites_count__gt=0) | models.Q(carts_count__gt=0))
+    for recipe in recipes.iterator():
+        recipe.popularity = (
+            recipe.favorites_count * 1.0 + recipe.carts_count * 0.5
+        )
+        recipe.save(update_fields=['popularity'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0003_similar_recipes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PopularityEpoch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('epoch', models.FloatField(verbose_name='Точка отсчета, unix-время')),
+            ],
+            options={
+                'verbose_name': 'Точка отсчета популярности',
+                'verbose_name_plural': 'Точка отсчета популярности',
+            },
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='popularity',
+            field=models.FloatField(db_index=True, default=0, editable=False, verbose_name='Популярность'),
+        ),
+        migrations.RunPython(create_epoch, migrations.RunPython.noop),
+    ]
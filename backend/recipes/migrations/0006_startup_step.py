@@ -0,0 +1,25 @@
+# Generated by Django 3.2.3 on 2026-10-19 10:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0005_recipe_revision'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StartupStep',
+            fields=[
+                ('name', models.CharField(max_length=32, primary_key=True, serialize=False, verbose_name='Шаг')),
+                ('checksum', models.CharField(max_length=32, verbose_name='Контрольная сумма')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата выполнения')),
+            ],
+            options={
+                'verbose_name': 'Шаг запуска',
+                'verbose_name_plural': 'Шаги запуска',
+            },
+        ),
+    ]
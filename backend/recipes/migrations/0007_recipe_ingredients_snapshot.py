@@ -0,0 +1,18 @@
+# Generated by Django 3.2.3 on 2026-10-19 10:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0006_startup_step'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='ingredients_snapshot',
+            field=models.JSONField(editable=False, null=True, verbose_name='Снимок ингредиентов'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 3.2.3 on 2026-10-19 10:23
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_recipe_ingredients_snapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shoppingcart',
+            name='servings',
+            field=models.PositiveSmallIntegerField(default=1, help_text='Во сколько раз умножить ингредиенты рецепта', validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(100)], verbose_name='Количество порций'),
+        ),
+    ]
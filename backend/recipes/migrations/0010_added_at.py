@@ -0,0 +1,43 @@
+# Generated by Django 3.2.3 on 2026-10-19 11:05
+
+from django.db import migrations, models
+import time
+
+
+def fill_added_at(apps, schema_editor):
+    """
+    Время добавления старых записей неизвестно. Берётся дата публикации
+    рецепта: она не позже настоящего времени, и удаление не вычтет
+    из популярности больше, чем прибавило добавление.
+    """
+    Recipe = apps.get_model('recipes', 'Recipe')
+    for model_name in ('Favorite', 'ShoppingCart'):
+        model = apps.get_model('recipes', model_name)
+        recipe_ids = model.objects.values('recipe')
+        for recipe_id, pub_date in Recipe.objects.filter(
+            id__in=recipe_ids
+        ).values_list('id', 'pub_date').iterator():
+            model.objects.filter(recipe_id=recipe_id).update(
+                added_at=pub_date.timestamp()
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0009_timeline_pub_date'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='favorite',
+            name='added_at',
+            field=models.FloatField(default=time.time, editable=False, verbose_name='Время добавления, unix-время'),
+        ),
+        migrations.AddField(
+            model_name='shoppingcart',
+            name='added_at',
+            field=models.FloatField(default=time.time, editable=False, verbose_name='Время добавления, unix-время'),
+        ),
+        migrations.RunPython(fill_added_at, migrations.RunPython.noop),
+    ]
@@ -1,8 +1,13 @@
+import time
+
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db import models
+from django.db import IntegrityError, models, transaction
 
-from foodgram.constants import (MAX_LEN, MAX_NAME_LENGTH, MAX_TAG, MAX_UNIT,
-                                MIN_UNIT, NAME_INGR, SHORT_LINK)
+from foodgram.constants import (MAX_LEN, MAX_NAME_LENGTH, MAX_SERVINGS,
+                                MAX_TAG, MAX_UNIT, MIN_UNIT, NAME_INGR,
+                                SHORT_LINK, SHORT_LINK_ATTEMPTS,
+                                SIGNATURE_LENGTH)
+from recipes.short_links import generate_short_link
 from users.models import CustomUser
 
 
@@ -98,16 +103,92 @@ class Recipe(models.Model):
         unique=True,
         null=True
     )
+    updated_at = models.DateTimeField(
+        verbose_name='Дата изменения',
+        auto_now=True
+    )
+    revision = models.PositiveIntegerField(
+        verbose_name='Версия',
+        default=1,
+        editable=False
+    )
+    popularity = models.FloatField(
+        verbose_name='Популярность',
+        default=0,
+        db_index=True,
+        editable=False
+    )
+    ingredients_snapshot = models.JSONField(
+        verbose_name='Снимок ингредиентов',
+        null=True,
+        editable=False
+    )
 
     class Meta:
         ordering = ('-pub_date',)
         default_related_name = 'recipes'
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
+        indexes = (
+            models.Index(
+                fields=('author', '-pub_date'),
+                name='recipe_author_pub_date_idx',
+            ),
+        )
 
     def __str__(self):
         return f'{self.name}, Автор: {self.author}'
 
+    def save(self, *args, **kwargs):
+        """
+        Генерирует короткую ссылку и сохраняет рецепт. Сгенерированный
+        код может совпасть c существующим: тогда сохранение в точке
+        сохранения повторяется c новым кодом, не больше
+        SHORT_LINK_ATTEMPTS раз.
+        """
+        if self.short_link:
+            return self.save_revision(*args, **kwargs)
+        for attempt in range(1, SHORT_LINK_ATTEMPTS + 1):
+            self.short_link = generate_short_link()
+            try:
+                with transaction.atomic(using=kwargs.get('using')):
+                    return self.save_revision(*args, **kwargs)
+            except IntegrityError:
+                if attempt == SHORT_LINK_ATTEMPTS or not Recipe.objects.filter(
+                    short_link=self.short_link
+                ).exists():
+                    self.short_link = None
+                    raise
+
+    def save_revision(self, *args, **kwargs):
+        """
+        Сохраняет рецепт и увеличивает версию при изменении.
+        Версия увеличивается в базе, чтобы параллельные правки
+        не получили одинаковый номер. Полное сохранение существующего
+        рецепта (например, из админки) не пишет popularity: оценка
+        меняется в базе параллельно, значение экземпляра устаревает.
+        """
+        update_fields = kwargs.get('update_fields')
+        if (
+            update_fields is None and not self._state.adding
+            and not kwargs.get('force_insert')
+        ):
+            update_fields = kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'popularity'
+            ]
+        bump = self.pk is not None and not self._state.adding and (
+            update_fields is None or 'revision' in update_fields
+        )
+        if bump:
+            self.revision = models.F('revision') + 1
+        super().save(*args, **kwargs)
+        if bump:
+            self.refresh_from_db(fields=['revision'])
+
+    def get_absolute_url(self):
+        return f'/recipes/{self.pk}'
+
 
 class RecipeIngredient(models.Model):
     """Модель ингредиентов для рецепта пользователя."""
@@ -149,6 +230,11 @@ class BaseFavoriteShoppingCart(models.Model):
         on_delete=models.CASCADE,
         verbose_name='Рецепт'
     )
+    added_at = models.FloatField(
+        verbose_name='Время добавления, unix-время',
+        default=time.time,
+        editable=False
+    )
 
     class Meta:
         abstract = True
@@ -175,6 +261,13 @@ class Favorite(BaseFavoriteShoppingCart):
 
 class ShoppingCart(BaseFavoriteShoppingCart):
     """Модель списка покупок пользователя."""
+    servings = models.PositiveSmallIntegerField(
+        verbose_name='Количество порций',
+        default=MIN_UNIT,
+        validators=[MinValueValidator(MIN_UNIT,),
+                    MaxValueValidator(MAX_SERVINGS,)],
+        help_text='Во сколько раз умножить ингредиенты рецепта'
+    )
 
     class Meta:
         verbose_name = 'Покупка'
@@ -189,3 +282,175 @@ class ShoppingCart(BaseFavoriteShoppingCart):
 
     def __str__(self):
         return f'Список покупок {self.user} для рецепта {self.recipe}'
+
+
+class TimelineEntry(models.Model):
+    """Запись ленты подписок: рецепт автора, на которого подписан юзер."""
+    user = models.ForeignKey(
+        CustomUser,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Подписчик'
+    )
+    author = models.ForeignKey(
+        CustomUser,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор'
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Рецепт'
+    )
+    pub_date = models.DateTimeField(verbose_name='Дата публикации рецепта')
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Лента подписок'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'recipe'),
+                name='unique_timeline_entry',
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=('user', 'author'),
+                name='timeline_user_author_idx',
+            ),
+            models.Index(
+                fields=('user', '-pub_date', 'recipe'),
+                name='timeline_user_pub_date_idx',
+            ),
+        )
+
+    def __str__(self):
+        return f'Рецепт {self.recipe} в ленте {self.user}'
+
+
+class Celebrity(models.Model):
+    """
+    Автор, у которого подписчиков больше FEED_FANOUT_THRESHOLD.
+    Его рецепты не раскладываются по лентам, a подмешиваются при чтении.
+    """
+    author = models.OneToOneField(
+        CustomUser,
+        on_delete=models.CASCADE,
+        related_name='celebrity',
+        verbose_name='Автор'
+    )
+
+    class Meta:
+        verbose_name = 'Знаменитость'
+        verbose_name_plural = 'Знаменитости'
+
+    def __str__(self):
+        return str(self.author)
+
+
+class SimilarRecipe(models.Model):
+    """Предрассчитанный сосед рецепта по ингредиентам и тегам."""
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='neighbours',
+        verbose_name='Рецепт'
+    )
+    similar = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='similar_to',
+        verbose_name='Похожий рецепт'
+    )
+    score = models.FloatField(verbose_name='Сходство')
+
+    class Meta:
+        verbose_name = 'Похожий рецепт'
+        verbose_name_plural = 'Похожие рецепты'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('recipe', 'similar'),
+                name='unique_similar_recipe',
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=('recipe', '-score'),
+                name='similar_recipe_score_idx',
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.similar} похож на {self.recipe}'
+
+
+class SimilarityState(models.Model):
+    """Состояние рецепта на момент последнего расчета соседей."""
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='similarity_state',
+        verbose_name='Рецепт'
+    )
+    signature = models.CharField(
+        max_length=SIGNATURE_LENGTH,
+        verbose_name='Отпечаток ингредиентов и тегов'
+    )
+    kth_score = models.FloatField(
+        default=0,
+        verbose_name='Наименьшее сходство в списке соседей'
+    )
+    neighbours_count = models.PositiveSmallIntegerField(
+        default=0,
+        verbose_name='Число соседей'
+    )
+
+    class Meta:
+        verbose_name = 'Состояние расчета соседей'
+        verbose_name_plural = 'Состояния расчета соседей'
+
+    def __str__(self):
+        return f'Соседи рецепта {self.recipe_id}'
+
+
+class PopularityEpoch(models.Model):
+    """
+    Точка отсчета для затухающих оценок популярности.
+    Оценка события хранится как вес * exp(λ * (t - epoch)),
+    периодический rebase сдвигает epoch, чтобы оценки не переполнялись.
+    """
+    epoch = models.FloatField(verbose_name='Точка отсчета, unix-время')
+
+    class Meta:
+        verbose_name = 'Точка отсчета популярности'
+        verbose_name_plural = 'Точка отсчета популярности'
+
+    def __str__(self):
+        return f'Точка отсчета {self.epoch}'
+
+
+class StartupStep(models.Model):
+    """Контрольная сумма входных данных шага запуска контейнера."""
+    name = models.CharField(
+        verbose_name='Шаг',
+        max_length=MAX_TAG,
+        primary_key=True
+    )
+    checksum = models.CharField(
+        verbose_name='Контрольная сумма',
+        max_length=SIGNATURE_LENGTH
+    )
+    updated_at = models.DateTimeField(
+        verbose_name='Дата выполнения',
+        auto_now=True
+    )
+
+    class Meta:
+        verbose_name = 'Шаг запуска'
+        verbose_name_plural = 'Шаги запуска'
+
+    def __str__(self):
+        return self.name
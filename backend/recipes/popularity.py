@@ -0,0 +1,104 @@
+import math
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, F, FloatField, Subquery, Value, When
+from django.db.models.functions import Exp, Greatest
+
+from foodgram.constants import (POPULAR_CACHE_TTL, POPULAR_TOP_N,
+                                POPULARITY_CART_WEIGHT,
+                                POPULARITY_FAVORITE_WEIGHT,
+                                POPULARITY_HALF_LIFE)
+
+DECAY_RATE = math.log(2) / POPULARITY_HALF_LIFE
+
+LEADERBOARD_KEY = 'popular:{}'
+
+
+def get_weight(model):
+    """Вес события для модели избранного или корзины."""
+    from recipes.models import Favorite
+    if model is Favorite:
+        return POPULARITY_FAVORITE_WEIGHT
+    return POPULARITY_CART_WEIGHT
+
+
+def record_popularity(model, entries, removed=False):
+    """
+    Меняет оценки популярности рецептов одним UPDATE по записям
+    избранного или корзины - парам (id рецепта, added_at).
+    Вклад записи вес * exp(λ * (added_at - epoch)) зависит только от
+    времени ее добавления, поэтому удаление вычитает ровно то, что
+    прибавило добавление, и после rebase тоже. Вклад считается в базе,
+    чтобы epoch брался из той же транзакции, что и rebase. Greatest
+    только защищает от ошибок округления и записей, добавленных
+    до появления added_at.
+    """
+    from recipes.models import PopularityEpoch, Recipe
+    entries = dict(entries)
+    if not entries:
+        return
+    epoch = Subquery(PopularityEpoch.objects.values('epoch')[:1])
+    added_at = Case(
+        *(When(id=recipe_id, then=Value(DECAY_RATE * timestamp))
+          for recipe_id, timestamp in entries.items()),
+        output_field=FloatField(),
+    )
+    delta = get_weight(model) * Exp(added_at - DECAY_RATE * epoch)
+    score = (
+        Greatest(F('popularity') - delta, Value(0.0)) if removed
+        else F('popularity') + delta
+    )
+    Recipe.objects.filter(id__in=entries).update(popularity=score)
+
+
+@transaction.atomic
+def rebase_popularity():
+    """
+    Переносит точку отсчета на текущий момент и пересчитывает оценки,
+    чтобы exp(λ * (now - epoch)) не рос неограниченно.
+    """
+    from recipes.models import PopularityEpoch, Recipe
+    now = time.time()
+    epoch = PopularityEpoch.objects.select_for_update().first()
+    if epoch is None:
+        PopularityEpoch.objects.create(epoch=now)
+        return 0
+    factor = math.exp(-DECAY_RATE * (now - epoch.epoch))
+    updated = Recipe.objects.filter(popularity__gt=0).update(
+        popularity=F('popularity') * factor
+    )
+    epoch.epoch = now
+    epoch.save(update_fields=['epoch'])
+    return updated
+
+
+def get_leaderboard(tag_slug=None):
+    """
+    Возвращает top-N пар (id, оценка) по тегу или по всем рецептам.
+    Список кешируется отдельно для каждого тега.
+    """
+    from recipes.models import Recipe
+    key = LEADERBOARD_KEY.format(tag_slug or '*')
+    leaderboard = cache.get(key)
+    if leaderboard is None:
+        recipes = Recipe.objects.filter(popularity__gt=0)
+        if tag_slug:
+            recipes = recipes.filter(tag__slug=tag_slug)
+        leaderboard = list(
+            recipes.order_by('-popularity', '-pub_date')
+            .values_list('id', 'popularity')[:POPULAR_TOP_N]
+        )
+        cache.set(key, leaderboard, POPULAR_CACHE_TTL)
+    return leaderboard
+
+
+def get_top_recipe_ids(tag_slugs=()):
+    """id самых популярных рецептов c любым из тегов, по убыванию."""
+    if not tag_slugs:
+        return [recipe_id for recipe_id, _ in get_leaderboard()]
+    scores = {}
+    for slug in tag_slugs:
+        scores.update(get_leaderboard(slug))
+    return sorted(scores, key=scores.get, reverse=True)[:POPULAR_TOP_N]
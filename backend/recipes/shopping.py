@@ -0,0 +1,58 @@
+from collections import defaultdict
+
+from django.db.models import Case, F, IntegerField, Sum, Value, When
+from django.db.models.functions import Cast
+
+from recipes.models import RecipeIngredient
+
+
+def aggregate_ingredients(queryset, multiplier):
+    """
+    Суммы ингредиентов c учетом порций одним запросом:
+    SUM(amount * multiplier) c группировкой по названию и единице.
+    amount приводится к integer: произведение двух smallint
+    в PostgreSQL тоже smallint и быстро переполняется.
+    """
+    return queryset.values(
+        'ingredient__name', 'ingredient__measurement_unit'
+    ).annotate(
+        total=Sum(Cast('amount', IntegerField()) * multiplier)
+    ).order_by('ingredient__name', 'ingredient__measurement_unit')
+
+
+def get_cart_ingredients(user):
+    """Список покупок по корзине пользователя и порциям в ней."""
+    return aggregate_ingredients(
+        RecipeIngredient.objects.filter(recipe__shopping_carts__user=user),
+        F('recipe__shopping_carts__servings'),
+    )
+
+
+def get_plan_ingredients(servings):
+    """
+    Список покупок для произвольного набора {id рецепта: порции}.
+    Рецепты c одинаковым числом порций попадают в одну ветку CASE,
+    поэтому размер запроса зависит от числа разных порций.
+    """
+    groups = defaultdict(list)
+    for recipe_id, count in servings.items():
+        groups[count].append(recipe_id)
+    multiplier = Case(
+        *[
+            When(recipe_id__in=recipe_ids, then=Value(count))
+            for count, recipe_ids in groups.items()
+        ],
+        output_field=IntegerField(),
+    )
+    return aggregate_ingredients(
+        RecipeIngredient.objects.filter(recipe_id__in=servings), multiplier
+    )
+
+
+def render_shopping_list(ingredients):
+    """Текст списка покупок: строка на ингредиент."""
+    return '\n'.join(
+        f"{item['ingredient__name']} - {item['total']} "
+        f"{item['ingredient__measurement_unit']}"
+        for item in ingredients
+    )
@@ -0,0 +1,72 @@
+import secrets
+import string
+from threading import Lock
+
+from foodgram.constants import SHORT_LINK_LENGTH
+
+BASE62_ALPHABET = string.digits + string.ascii_letters
+
+_codes = {}
+_lock = Lock()
+_warmed = False
+
+
+def generate_short_link(length=SHORT_LINK_LENGTH):
+    """Генерирует случайный base62-код короткой ссылки."""
+    return ''.join(
+        secrets.choice(BASE62_ALPHABET) for _ in range(length)
+    )
+
+
+def warm_short_links():
+    """Загружает в память процесса все коды коротких ссылок."""
+    global _warmed
+    from recipes.models import Recipe
+    codes = dict(
+        Recipe.objects.exclude(short_link__isnull=True)
+        .values_list('short_link', 'id')
+        .iterator()
+    )
+    with _lock:
+        _codes.clear()
+        _codes.update(codes)
+        _warmed = True
+    return len(codes)
+
+
+def remember_short_link(code, recipe_id):
+    """Добавляет код в карту текущего процесса."""
+    if code:
+        _codes[code] = recipe_id
+
+
+def forget_short_link(code):
+    """Удаляет код из карты текущего процесса."""
+    _codes.pop(code, None)
+
+
+def get_cached_recipe_id(code):
+    """
+    Ищет рецепт по коду только в памяти процесса, без обращения к базе.
+    Возвращает None, если код в карте отсутствует.
+    """
+    return _codes.get(code)
+
+
+def resolve_short_link(code):
+    """
+    Возвращает id рецепта по коду.
+    При промахе (код создан другим воркером) обращается к базе.
+    """
+    if not _warmed:
+        warm_short_links()
+    recipe_id = get_cached_recipe_id(code)
+    if recipe_id is None:
+        from recipes.models import Recipe
+        recipe_id = (
+            Recipe.objects.filter(short_link=code)
+            .values_list('id', flat=True).first()
+        )
+        if recipe_id is not None:
+            remember_short_link(code, recipe_id)
+    return recipe_id
@@ -0,0 +1,146 @@
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from foodgram.cache import invalidate_on_commit
+from recipes.feed import (backfill_timeline, fan_out_recipe, prune_timeline,
+                          update_celebrity)
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart, Tag)
+from recipes.short_links import forget_short_link, remember_short_link
+from recipes.snapshots import refresh_snapshots
+from users.models import CustomUser, Subscription
+
+CACHE_NAMESPACES = {
+    Recipe: ('recipes', 'popular'),
+    RecipeIngredient: ('recipes',),
+    Tag: ('tags', 'recipes', 'popular'),
+    Ingredient: ('ingredients', 'recipes'),
+    Favorite: ('favorites',),
+    ShoppingCart: ('shopping_carts',),
+    Subscription: ('subscriptions',),
+}
+
+
+def bump_revisions(recipes):
+    """Увеличивает версию рецептов одним UPDATE."""
+    recipes.update(revision=F('revision') + 1, updated_at=timezone.now())
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved(sender, instance, created, **kwargs):
+    """Запоминает короткую ссылку и раскладывает новый рецепт по лентам."""
+    remember_short_link(instance.short_link, instance.pk)
+    if created:
+        transaction.on_commit(lambda: fan_out_recipe(instance))
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(sender, instance, **kwargs):
+    """Удаляет короткую ссылку рецепта из карты процесса."""
+    forget_short_link(instance.short_link)
+
+
+@receiver(post_save, sender=Subscription)
+def subscription_created(sender, instance, created, **kwargs):
+    """
+    Сверяет отметку знаменитости автора и добавляет в ленту
+    подписчика последние рецепты автора.
+    """
+    if created:
+        def update_timelines():
+            update_celebrity(instance.author_id)
+            backfill_timeline(instance.user_id, instance.author_id)
+        transaction.on_commit(update_timelines)
+
+
+@receiver(post_delete, sender=Subscription)
+def subscription_deleted(sender, instance, **kwargs):
+    """
+    Очищает ленту от рецептов автора после отписки
+    и сверяет отметку знаменитости автора.
+    """
+    prune_timeline(instance.user_id, instance.author_id)
+    transaction.on_commit(lambda: update_celebrity(instance.author_id))
+
+
+@receiver(m2m_changed, sender=Recipe.tag.through)
+def recipe_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """Увеличивает версию рецептов, у которых изменился набор тегов."""
+    if not reverse and action in ('post_add', 'post_remove', 'post_clear'):
+        bump_revisions(Recipe.objects.filter(pk=instance.pk))
+    elif reverse and action in ('post_add', 'post_remove'):
+        bump_revisions(Recipe.objects.filter(pk__in=pk_set))
+    elif reverse and action == 'pre_clear':
+        bump_revisions(Recipe.objects.filter(tag=instance))
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+def recipe_related_renamed(sender, instance, created, **kwargs):
+    """Переименование тега или ингредиента меняет ответы рецептов."""
+    if created:
+        return
+    if sender is Tag:
+        bump_revisions(Recipe.objects.filter(tag=instance))
+    else:
+        recipes = Recipe.objects.filter(ingredient=instance)
+        bump_revisions(recipes)
+        refresh_snapshots(recipes)
+
+
+@receiver(pre_delete, sender=Ingredient)
+def ingredient_deleting(sender, instance, **kwargs):
+    """Запоминает рецепты, из которых каскадно уйдет ингредиент."""
+    instance.affected_recipe_ids = list(
+        Recipe.objects.filter(ingredient=instance).values_list(
+            'pk', flat=True
+        )
+    )
+
+
+@receiver(post_delete, sender=Ingredient)
+def ingredient_deleted(sender, instance, **kwargs):
+    """Пересобирает снимки рецептов, потерявших ингредиент."""
+    recipes = Recipe.objects.filter(
+        pk__in=getattr(instance, 'affected_recipe_ids', ())
+    )
+    bump_revisions(recipes)
+    refresh_snapshots(recipes)
+
+
+@receiver(post_save, sender=CustomUser)
+def author_changed(sender, instance, created, update_fields, **kwargs):
+    """Профиль автора входит в ответы его рецептов."""
+    if created or update_fields and set(update_fields) <= {'last_login'}:
+        return
+    bump_revisions(Recipe.objects.filter(author=instance))
+    invalidate_on_commit('recipes')
+
+
+def invalidate_cache(sender, **kwargs):
+    """Сбрасывает в кеше всех воркеров данные, зависящие от модели."""
+    invalidate_on_commit(*CACHE_NAMESPACES[sender])
+
+
+def recipe_tags_invalidate_cache(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        invalidate_on_commit('recipes')
+
+
+for model in CACHE_NAMESPACES:
+    post_save.connect(
+        invalidate_cache, sender=model,
+        dispatch_uid=f'invalidate_cache_save_{model.__name__}',
+    )
+    post_delete.connect(
+        invalidate_cache, sender=model,
+        dispatch_uid=f'invalidate_cache_delete_{model.__name__}',
+    )
+m2m_changed.connect(
+    recipe_tags_invalidate_cache, sender=Recipe.tag.through,
+    dispatch_uid='invalidate_cache_recipe_tags',
+)
@@ -0,0 +1,299 @@
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Count, F
+
+from foodgram.constants import (BATCH_SIZE, SIMILAR_TOP_K,
+                                SIMILARITY_CHUNK_SIZE)
+from recipes.models import (Recipe, RecipeIngredient, SimilarityState,
+                            SimilarRecipe)
+
+_matrix = {}
+
+
+class IncidenceMatrix:
+    """
+    Разреженная матрица «рецепт x признак» в формате CSR.
+    Признаки рецепта: id ингредиентов и id тегов co знаком минус,
+    теги размещаются в столбцах после ингредиентов.
+    Хранит также транспонированную матрицу (списки рецептов по признаку).
+    """
+
+    def __init__(self, recipe_ids, features):
+        self.recipe_ids = np.asarray(recipe_ids, dtype=np.int64)
+        self.row_by_id = {
+            recipe_id: row for row, recipe_id in enumerate(recipe_ids)
+        }
+        rows, cols = [], []
+        for recipe_id, recipe_features in features.items():
+            row = self.row_by_id[recipe_id]
+            rows.extend([row] * len(recipe_features))
+            cols.extend(recipe_features)
+        rows = np.asarray(rows, dtype=np.int64)
+        cols = np.asarray(cols, dtype=np.int64)
+        cols = np.where(cols < 0, cols.max(initial=0) - cols, cols)
+        self.sizes = np.bincount(rows, minlength=len(recipe_ids))
+        self.indptr, self.indices = self._to_csr(rows, cols, len(recipe_ids))
+        n_features = int(cols.max()) + 1 if cols.size else 0
+        self.t_indptr, self.t_indices = self._to_csr(cols, rows, n_features)
+
+    @staticmethod
+    def _to_csr(rows, cols, n_rows):
+        order = np.lexsort((cols, rows))
+        indptr = np.zeros(n_rows + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=n_rows), out=indptr[1:])
+        return indptr, cols[order]
+
+    def as_arrays(self):
+        """Массивы для передачи в процессы пула."""
+        return (self.sizes, self.indptr, self.indices,
+                self.t_indptr, self.t_indices)
+
+
+def _init_worker(arrays, kth_scores):
+    """Сохраняет матрицу в глобальном состоянии процесса пула."""
+    (_matrix['sizes'], _matrix['indptr'], _matrix['indices'],
+     _matrix['t_indptr'], _matrix['t_indices']) = arrays
+    _matrix['kth'] = kth_scores
+
+
+def _chunk_scores(rows):
+    """
+    Считает сходство Жаккара строк rows со всеми рецептами.
+    Пересечения считаются через списки рецептов по признакам
+    и один np.bincount на весь блок.
+    """
+    sizes, indptr, indices = (
+        _matrix['sizes'], _matrix['indptr'], _matrix['indices']
+    )
+    t_indptr, t_indices = _matrix['t_indptr'], _matrix['t_indices']
+    n = sizes.size
+    lengths = indptr[rows + 1] - indptr[rows]
+    features = indices[
+        np.repeat(indptr[rows] - np.cumsum(lengths) + lengths, lengths)
+        + np.arange(lengths.sum())
+    ]
+    owners = np.repeat(np.arange(rows.size), lengths)
+    p_start = t_indptr[features]
+    p_len = t_indptr[features + 1] - p_start
+    offsets = np.cumsum(p_len) - p_len
+    postings = t_indices[
+        np.arange(p_len.sum()) - np.repeat(offsets, p_len)
+        + np.repeat(p_start, p_len)
+    ]
+    keys = np.repeat(owners, p_len) * n + postings
+    intersection = np.bincount(
+        keys, minlength=rows.size * n
+    ).reshape(rows.size, n).astype(np.float32)
+    union = sizes[rows][:, None] + sizes[None, :] - intersection
+    scores = np.divide(
+        intersection, union,
+        out=np.zeros_like(intersection), where=union > 0
+    )
+    scores[np.arange(rows.size), rows] = 0
+    return scores
+
+
+def _chunk_neighbours(rows, top_k, find_affected):
+    """
+    Возвращает top-k соседей для блока строк.
+    При find_affected также ищет рецепты, в чей top-k
+    теперь должен попасть рецепт из блока.
+    """
+    scores = _chunk_scores(rows)
+    k = min(top_k, scores.shape[1] - 1)
+    if k <= 0:
+        empty = np.empty((rows.size, 0))
+        return rows, empty.astype(np.int64), empty, np.empty(0, np.int64)
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    top_scores = np.take_along_axis(scores, top, axis=1)
+    order = np.argsort(-top_scores, axis=1, kind='stable')
+    top = np.take_along_axis(top, order, axis=1)
+    top_scores = np.take_along_axis(top_scores, order, axis=1)
+    affected = np.empty(0, np.int64)
+    if find_affected:
+        affected = np.flatnonzero(
+            (scores > _matrix['kth'][None, :]).any(axis=0)
+        )
+    return rows, top, top_scores, affected
+
+
+def load_features():
+    """
+    Загружает признаки всех рецептов: ингредиенты и теги.
+    Теги хранятся co знаком минус, чтобы не пересекаться c ингредиентами.
+    """
+    recipe_ids = list(
+        Recipe.objects.order_by('id').values_list('id', flat=True)
+    )
+    features = {recipe_id: [] for recipe_id in recipe_ids}
+    ingredient_pairs = RecipeIngredient.objects.values_list(
+        'recipe_id', 'ingredient_id'
+    )
+    for recipe_id, ingredient_id in ingredient_pairs.iterator(
+        chunk_size=BATCH_SIZE
+    ):
+        if recipe_id in features:
+            features[recipe_id].append(ingredient_id)
+    tag_pairs = Recipe.tag.through.objects.values_list('recipe_id', 'tag_id')
+    for recipe_id, tag_id in tag_pairs.iterator(chunk_size=BATCH_SIZE):
+        if recipe_id in features:
+            features[recipe_id].append(-tag_id)
+    return recipe_ids, features
+
+
+def get_signature(recipe_features):
+    """Отпечаток набора признаков рецепта."""
+    return hashlib.md5(
+        ','.join(map(str, sorted(recipe_features))).encode()
+    ).hexdigest()
+
+
+def find_changed(recipe_ids, features):
+    """
+    Находит рецепты, для которых списки соседей нужно пересчитать:
+    новые и измененные рецепты, рецепты, ссылающиеся на них,
+    и рецепты, у которых соседи пропали вместе c удаленными рецептами.
+    """
+    states = dict(
+        SimilarityState.objects.values_list('recipe_id', 'signature')
+    )
+    changed = {
+        recipe_id for recipe_id in recipe_ids
+        if states.get(recipe_id) != get_signature(features[recipe_id])
+    }
+    changed.update(
+        SimilarityState.objects.annotate(
+            actual=Count('recipe__neighbours')
+        ).filter(
+            actual__lt=F('neighbours_count')
+        ).values_list('recipe_id', flat=True)
+    )
+    changed.update(
+        SimilarRecipe.objects.filter(
+            similar_id__in=changed
+        ).values_list('recipe_id', flat=True)
+    )
+    return changed
+
+
+def compute_neighbours(matrix, rows, top_k, chunk_size, workers,
+                       kth_scores=None):
+    """
+    Считает соседей для строк rows блоками, при workers > 1 в пуле
+    процессов. Возвращает соседей по строкам и затронутые строки.
+    """
+    find_affected = kth_scores is not None
+    if kth_scores is None:
+        kth_scores = np.zeros(matrix.sizes.size, dtype=np.float32)
+    rows = np.asarray(sorted(rows), dtype=np.int64)
+    chunks = [
+        rows[start:start + chunk_size]
+        for start in range(0, rows.size, chunk_size)
+    ]
+    args = (matrix.as_arrays(), kth_scores)
+    if workers > 1:
+        with ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker, initargs=args
+        ) as pool:
+            chunk_results = list(pool.map(
+                _chunk_neighbours, chunks,
+                [top_k] * len(chunks), [find_affected] * len(chunks)
+            ))
+    else:
+        _init_worker(*args)
+        chunk_results = [
+            _chunk_neighbours(chunk, top_k, find_affected)
+            for chunk in chunks
+        ]
+    neighbours, affected = {}, set()
+    for chunk_rows, top, top_scores, chunk_affected in chunk_results:
+        for row, columns, scores in zip(chunk_rows, top, top_scores):
+            neighbours[int(row)] = [
+                (int(column), float(score))
+                for column, score in zip(columns, scores) if score > 0
+            ]
+        affected.update(chunk_affected.tolist())
+    return neighbours, affected
+
+
+@transaction.atomic
+def save_neighbours(matrix, neighbours, features):
+    """Перезаписывает списки соседей и состояния пересчитанных рецептов."""
+    recipe_ids = [int(matrix.recipe_ids[row]) for row in neighbours]
+    for start in range(0, len(recipe_ids), BATCH_SIZE):
+        batch = recipe_ids[start:start + BATCH_SIZE]
+        SimilarRecipe.objects.filter(recipe_id__in=batch).delete()
+        SimilarityState.objects.filter(recipe_id__in=batch).delete()
+    SimilarRecipe.objects.bulk_create(
+        (
+            SimilarRecipe(
+                recipe_id=int(matrix.recipe_ids[row]),
+                similar_id=int(matrix.recipe_ids[column]),
+                score=score,
+            )
+            for row, row_neighbours in neighbours.items()
+            for column, score in row_neighbours
+        ),
+        batch_size=BATCH_SIZE,
+    )
+    SimilarityState.objects.bulk_create(
+        (
+            SimilarityState(
+                recipe_id=recipe_id,
+                signature=get_signature(features[recipe_id]),
+                kth_score=row_neighbours[-1][1] if row_neighbours else 0,
+                neighbours_count=len(row_neighbours),
+            )
+            for recipe_id, row_neighbours in zip(
+                recipe_ids, neighbours.values()
+            )
+        ),
+        batch_size=BATCH_SIZE,
+    )
+
+
+def build_similar_recipes(incremental=False, top_k=SIMILAR_TOP_K,
+                          chunk_size=SIMILARITY_CHUNK_SIZE, workers=1):
+    """
+    Пересчитывает списки похожих рецептов.
+    В инкрементальном режиме считает только измененные рецепты и те,
+    в чей top-k они теперь попадают. Возвращает число пересчитанных.
+    """
+    recipe_ids, features = load_features()
+    if not recipe_ids:
+        return 0
+    matrix = IncidenceMatrix(recipe_ids, features)
+    if not incremental:
+        neighbours, _ = compute_neighbours(
+            matrix, range(len(recipe_ids)), top_k, chunk_size, workers
+        )
+        save_neighbours(matrix, neighbours, features)
+        return len(neighbours)
+    changed = find_changed(recipe_ids, features)
+    rows = {
+        matrix.row_by_id[recipe_id] for recipe_id in changed
+        if recipe_id in matrix.row_by_id
+    }
+    if not rows:
+        return 0
+    kth_scores = np.zeros(len(recipe_ids), dtype=np.float32)
+    states = SimilarityState.objects.filter(
+        neighbours_count__gte=top_k
+    ).values_list('recipe_id', 'kth_score')
+    for recipe_id, kth_score in states.iterator(chunk_size=BATCH_SIZE):
+        if recipe_id in matrix.row_by_id:
+            kth_scores[matrix.row_by_id[recipe_id]] = kth_score
+    neighbours, affected = compute_neighbours(
+        matrix, rows, top_k, chunk_size, workers, kth_scores
+    )
+    extra = affected - rows
+    if extra:
+        extra_neighbours, _ = compute_neighbours(
+            matrix, extra, top_k, chunk_size, workers
+        )
+        neighbours.update(extra_neighbours)
+    save_neighbours(matrix, neighbours, features)
+    return len(neighbours)
@@ -0,0 +1,54 @@
+from foodgram.constants import BATCH_SIZE
+from recipes.models import Recipe, RecipeIngredient
+
+SNAPSHOT_KEYS = ('id', 'name', 'measurement_unit', 'amount')
+
+
+def build_snapshots(recipe_ids):
+    """
+    Ингредиенты рецептов в том виде, в каком их отдает API,
+    одним запросом и в порядке RecipeIngredient.Meta.ordering.
+    """
+    snapshots = {recipe_id: [] for recipe_id in recipe_ids}
+    rows = RecipeIngredient.objects.filter(
+        recipe_id__in=recipe_ids
+    ).values_list(
+        'recipe_id', 'ingredient_id', 'ingredient__name',
+        'ingredient__measurement_unit', 'amount'
+    )
+    for recipe_id, *values in rows:
+        snapshots[recipe_id].append(dict(zip(SNAPSHOT_KEYS, values)))
+    return snapshots
+
+
+def from_snapshot(snapshot):
+    """Восстанавливает порядок ключей, который jsonb не сохраняет."""
+    return [{key: item[key] for key in SNAPSHOT_KEYS} for item in snapshot]
+
+
+def write_snapshots(recipe_ids):
+    snapshots = build_snapshots(recipe_ids)
+    Recipe.objects.bulk_update([
+        Recipe(pk=recipe_id, ingredients_snapshot=snapshot)
+        for recipe_id, snapshot in snapshots.items()
+    ], ['ingredients_snapshot'])
+    return len(snapshots)
+
+
+def refresh_snapshots(recipes, batch_size=BATCH_SIZE):
+    """
+    Пересобирает снимки ингредиентов рецептов из queryset пачками
+    по batch_size. Версия рецептов не меняется. Возвращает их число.
+    """
+    updated = 0
+    batch = []
+    for recipe_id in recipes.order_by().values_list(
+        'pk', flat=True
+    ).iterator(chunk_size=batch_size):
+        batch.append(recipe_id)
+        if len(batch) >= batch_size:
+            updated += write_snapshots(batch)
+            batch = []
+    if batch:
+        updated += write_snapshots(batch)
+    return updated
@@ -0,0 +1,118 @@
+import hashlib
+from pathlib import Path
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.staticfiles.finders import get_finders
+from django.db import DatabaseError
+from django.test import Client
+
+from foodgram.constants import PAGE_SIZE
+from recipes.models import StartupStep, Tag
+from recipes.popularity import get_leaderboard
+
+CHECKSUM_FILE = '.checksum'
+
+
+def files_checksum(files):
+    """md5 по именам и содержимому файлов, порядок не важен."""
+    digest = hashlib.md5()
+    for name, path in sorted(files):
+        digest.update(name.encode())
+        digest.update(Path(path).read_bytes())
+    return digest.hexdigest()
+
+
+def migrations_checksum():
+    """Контрольная сумма файлов миграций всех приложений."""
+    files = []
+    for app_config in apps.get_app_configs():
+        directory = Path(app_config.path) / 'migrations'
+        files.extend(
+            (f'{app_config.label}/{path.name}', path)
+            for path in directory.glob('*.py')
+        )
+    return files_checksum(files)
+
+
+def data_checksum():
+    """Контрольная сумма CSV-файлов, которые загружает db_load."""
+    return files_checksum(
+        (path.name, path)
+        for path in (Path(settings.BASE_DIR) / 'data').glob('*.csv')
+    )
+
+
+def static_checksum():
+    """Контрольная сумма исходников статики из всех finders."""
+    files = {}
+    for finder in get_finders():
+        for name, storage in finder.list([]):
+            files.setdefault(name, storage.path(name))
+    return files_checksum(files.items())
+
+
+def get_stamp(name):
+    """Сумма, c которой шаг выполнялся в прошлый раз, или None."""
+    try:
+        return StartupStep.objects.filter(name=name).values_list(
+            'checksum', flat=True
+        ).first()
+    except DatabaseError:
+        return None
+
+
+def set_stamp(name, checksum):
+    StartupStep.objects.update_or_create(
+        name=name, defaults={'checksum': checksum}
+    )
+
+
+def read_checksum_file(directory):
+    path = Path(directory) / CHECKSUM_FILE
+    return path.read_text() if path.exists() else None
+
+
+def write_checksum_file(directory, checksum):
+    (Path(directory) / CHECKSUM_FILE).write_text(checksum)
+
+
+def get_warmup_hosts():
+    """Конкретные хосты из ALLOWED_HOSTS, без масок."""
+    hosts = [
+        host for host in settings.ALLOWED_HOSTS
+        if host and '*' not in host and not host.startswith('.')
+    ]
+    return hosts or ['localhost']
+
+
+def get_warmup_urls():
+    """
+    Адреса, которые фронтенд запрашивает первыми: теги, ингредиенты
+    и первая страница рецептов без фильтра и со всеми тегами.
+    """
+    slugs = sorted(Tag.objects.values_list('slug', flat=True))
+    first_page = f'/api/recipes/?page=1&limit={PAGE_SIZE}'
+    urls = ['/api/tags/', '/api/ingredients/', first_page]
+    if slugs:
+        urls.append(first_page + ''.join(f'&tags={slug}' for slug in slugs))
+    return urls
+
+
+def warm_catalogue():
+    """
+    Заполняет общий кеш до приема трафика: рейтинги популярности
+    и анонимные ответы каталога для каждого хоста.
+    Возвращает число прогретых записей.
+    """
+    warmed = 0
+    for slug in [None, *Tag.objects.values_list('slug', flat=True)]:
+        get_leaderboard(slug)
+        warmed += 1
+    urls = get_warmup_urls()
+    for host in get_warmup_hosts():
+        client = Client(HTTP_HOST=host)
+        for url in urls:
+            if client.get(url).status_code == 200:
+                warmed += 1
+    return warmed
@@ -0,0 +1,416 @@
+import json
+import os
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import IntegrityError
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from api.filters import RecipeFilter
+from foodgram.cache import get_generation
+from foodgram.constants import SHORT_LINK_ATTEMPTS
+from foodgram.nplusone import NPlusOneDetector, NPlusOneError
+from recipes.feed import trim_timeline
+from recipes.management.commands.detect_n_plus_one import USER_URLS
+from recipes.management.commands.startup import Command as StartupCommand
+from recipes.models import (Celebrity, Favorite, Ingredient, Recipe,
+                            RecipeIngredient, ShoppingCart, SimilarRecipe,
+                            Tag, TimelineEntry)
+from recipes.short_links import get_cached_recipe_id
+from recipes.similarity import build_similar_recipes
+from recipes.startup import get_stamp
+from recipes.transfer import RecipeImporter, export_recipes
+from users.models import CustomUser, Subscription
+
+
+def create_user(name):
+    return CustomUser.objects.create(
+        email=f'{name}@example.com', username=name,
+        first_name='Имя', last_name='Фамилия',
+    )
+
+
+class StartupDataLoadTests(TestCase):
+    """Шаг db_load команды startup."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.base_dir = directory.name
+        os.mkdir(os.path.join(self.base_dir, 'data'))
+
+    def write_csv(self, name, content):
+        path = os.path.join(self.base_dir, 'data', name)
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(content)
+
+    def load_data(self):
+        command = StartupCommand(stdout=StringIO())
+        command.force = False
+        with override_settings(BASE_DIR=self.base_dir):
+            return command.load_data()
+
+    def test_failed_load_is_not_stamped(self):
+        self.write_csv('ingredients.csv', 'соль\n')
+        self.write_csv('tags.csv', 'Завтрак,breakfast\n')
+        with self.assertRaises(CommandError):
+            self.load_data()
+        self.assertIsNone(get_stamp('db_load'))
+
+    def test_missing_file_is_not_stamped(self):
+        self.write_csv('ingredients.csv', 'соль,г\n')
+        with self.assertRaises(CommandError):
+            self.load_data()
+        self.assertIsNone(get_stamp('db_load'))
+
+    def test_successful_load_is_stamped(self):
+        self.write_csv('ingredients.csv', 'соль,г\n')
+        self.write_csv('tags.csv', 'Завтрак,breakfast\n')
+        self.load_data()
+        self.assertTrue(Ingredient.objects.filter(name='соль').exists())
+        self.assertIsNotNone(get_stamp('db_load'))
+
+
+class FeedTests(TestCase):
+    """Лента подписок: записи ленты и рецепты знаменитостей."""
+
+    def setUp(self):
+        patcher = mock.patch('recipes.feed.FEED_FANOUT_THRESHOLD', 1)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.reader = create_user('reader')
+        self.author = create_user('author')
+        self.star = create_user('star')
+        self.subscribe(create_user('fan'), self.star)
+        self.subscribe(self.reader, self.author)
+        self.subscribe(self.reader, self.star)
+        self.client = APIClient()
+        self.client.force_authenticate(self.reader)
+
+    def subscribe(self, user, author):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Subscription.objects.create(user=user, author=author)
+
+    def publish(self, author, days_ago):
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe = Recipe.objects.create(
+                author=author, name='Рецепт', text='Текст', cooking_time=1,
+                image='recipes/images/recipe.png',
+            )
+        pub_date = timezone.now() - timedelta(days=days_ago)
+        Recipe.objects.filter(id=recipe.id).update(pub_date=pub_date)
+        TimelineEntry.objects.filter(recipe=recipe).update(pub_date=pub_date)
+        return recipe.id
+
+    def read_feed(self, url='/api/recipes/feed/?limit=2'):
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            page = response.json()
+            pages.append(page)
+            url = page['next']
+        return pages
+
+    def test_feed_merges_timeline_and_celebrities(self):
+        self.assertTrue(Celebrity.objects.filter(author=self.star).exists())
+        recipe_ids = [
+            self.publish(author, days_ago)
+            for days_ago, author in enumerate(
+                (self.author, self.star, self.star, self.author, self.star)
+            )
+        ]
+        self.assertFalse(
+            TimelineEntry.objects.filter(author=self.star).exists()
+        )
+        pages = self.read_feed()
+        self.assertEqual(
+            [recipe['id'] for page in pages for recipe in page['results']],
+            recipe_ids,
+        )
+        self.assertIsNone(pages[0]['previous'])
+        previous = self.client.get(pages[-1]['previous']).json()
+        self.assertEqual(previous['results'], pages[-2]['results'])
+
+    def test_author_crossing_threshold_updates_timelines(self):
+        recipe_id = self.publish(self.author, 0)
+        self.subscribe(create_user('fan2'), self.author)
+        self.assertTrue(Celebrity.objects.filter(author=self.author).exists())
+        self.assertFalse(
+            TimelineEntry.objects.filter(author=self.author).exists()
+        )
+        star_recipe_id = self.publish(self.star, 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            Subscription.objects.filter(user__username='fan').delete()
+        self.assertFalse(Celebrity.objects.filter(author=self.star).exists())
+        self.assertEqual(
+            list(TimelineEntry.objects.filter(
+                user=self.reader, author=self.star
+            ).values_list('recipe_id', flat=True)),
+            [star_recipe_id],
+        )
+        feed = self.read_feed('/api/recipes/feed/')
+        self.assertEqual(
+            [recipe['id'] for recipe in feed[0]['results']],
+            [recipe_id, star_recipe_id],
+        )
+
+    def test_trim_timeline_keeps_newest_entries(self):
+        recipe_ids = [self.publish(self.author, days) for days in range(4)]
+        self.assertEqual(trim_timeline(self.reader.id, 2), 2)
+        self.assertEqual(
+            set(TimelineEntry.objects.values_list('recipe_id', flat=True)),
+            set(recipe_ids[:2]),
+        )
+
+
+class NPlusOneDetectorTests(TestCase):
+    """Детектор N+1 и команда detect_n_plus_one."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('reader')
+        authors = [create_user(f'author{number}') for number in range(3)]
+        for author in authors:
+            recipe = Recipe.objects.create(
+                author=author, name='Рецепт', text='Текст', cooking_time=1,
+                image='recipes/images/recipe.png',
+            )
+            Favorite.objects.create(user=cls.user, recipe=recipe)
+            ShoppingCart.objects.create(user=cls.user, recipe=recipe)
+            Subscription.objects.create(user=cls.user, author=author)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_repeated_queries_are_reported(self):
+        with NPlusOneDetector(threshold=2, quiet=True) as detector:
+            for user_id in range(3):
+                list(Recipe.objects.filter(author_id=user_id))
+        [(count, site, _, template)] = detector.problems
+        self.assertEqual(count, 3)
+        self.assertIn('recipes/tests.py', site)
+        self.assertIn('"author_id" = %s', template)
+        with self.assertRaises(NPlusOneError):
+            with NPlusOneDetector(threshold=2, raise_error=True):
+                for user_id in range(3):
+                    list(Recipe.objects.filter(author_id=user_id))
+
+    def test_user_urls_use_recipe_filters(self):
+        for url in USER_URLS:
+            _, _, query = url.partition('?')
+            for param in query.split('&') if query else ():
+                name = param.partition('=')[0]
+                with self.subTest(url=url):
+                    self.assertTrue(
+                        name == 'limit' or name in RecipeFilter.base_filters
+                    )
+
+    def test_command_checks_urls_without_response_cache(self):
+        for _ in range(2):
+            with self.assertRaises(CommandError):
+                call_command(
+                    'detect_n_plus_one', '/api/recipes/', '--threshold', '0',
+                    stdout=StringIO(),
+                )
+
+    def test_command_finds_no_problems(self):
+        for fast in ([], ['--no-fast']):
+            with self.subTest(fast=fast):
+                stdout = StringIO()
+                call_command(
+                    'detect_n_plus_one', '--user', self.user.email,
+                    *fast, stdout=stdout,
+                )
+                self.assertIn('favorite_filter', stdout.getvalue())
+
+
+class ShortLinkTests(TestCase):
+    """Короткие ссылки рецептов."""
+
+    def setUp(self):
+        self.author = create_user('author')
+
+    def create_recipe(self):
+        return Recipe.objects.create(
+            author=self.author, name='Рецепт', text='Текст', cooking_time=1,
+            image='recipes/images/recipe.png',
+        )
+
+    def test_colliding_code_is_regenerated(self):
+        taken = self.create_recipe().short_link
+        with mock.patch(
+            'recipes.models.generate_short_link',
+            side_effect=[taken, taken, 'fresh1'],
+        ):
+            recipe = self.create_recipe()
+        self.assertEqual(recipe.short_link, 'fresh1')
+        self.assertEqual(Recipe.objects.count(), 2)
+
+    def test_attempts_are_bounded(self):
+        taken = self.create_recipe().short_link
+        with mock.patch(
+            'recipes.models.generate_short_link', return_value=taken
+        ) as generate, self.assertRaises(IntegrityError):
+            self.create_recipe()
+        self.assertEqual(generate.call_count, SHORT_LINK_ATTEMPTS)
+        self.assertEqual(Recipe.objects.count(), 1)
+
+    def test_redirect_uses_absolute_url(self):
+        recipe = self.create_recipe()
+        response = self.client.get(f'/s/{recipe.short_link}/')
+        self.assertEqual(response.status_code, 301)
+        self.assertEqual(response['Location'], recipe.get_absolute_url())
+
+
+class RecipeTransferTests(TestCase):
+    """Выгрузка и загрузка рецептов в NDJSON."""
+
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.author = create_user('author')
+            self.reader = create_user('reader')
+            Subscription.objects.create(user=self.reader, author=self.author)
+            self.tag = Tag.objects.create(name='Завтрак', slug='breakfast')
+            self.salt = Ingredient.objects.create(
+                name='соль', measurement_unit='г'
+            )
+            self.recipe = Recipe.objects.create(
+                author=self.author, name='Рецепт', text='Текст',
+                cooking_time=5, image='recipes/images/recipe.png',
+            )
+            self.recipe.tag.set([self.tag])
+            RecipeIngredient.objects.create(
+                recipe=self.recipe, ingredient=self.salt, amount=3
+            )
+
+    def test_export_lines(self):
+        [line] = list(export_recipes())
+        self.assertEqual(json.loads(line), {
+            'name': 'Рецепт', 'text': 'Текст', 'cooking_time': 5,
+            'image': 'recipes/images/recipe.png',
+            'author': self.author.email, 'tags': ['Завтрак'],
+            'ingredients': [
+                {'name': 'соль', 'measurement_unit': 'г', 'amount': 3},
+            ],
+        })
+
+    def test_import_runs_signal_work(self):
+        lines = list(export_recipes()) + [b'{"name": 1}\n', b'not json\n']
+        with self.captureOnCommitCallbacks(execute=True):
+            Recipe.objects.all().delete()
+        generation = get_generation('recipes')
+        importer = RecipeImporter()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(importer.run(lines), 1)
+        self.assertEqual([number for number, _ in importer.errors], [2, 3])
+        recipe = Recipe.objects.get()
+        self.assertEqual(list(recipe.tag.all()), [self.tag])
+        self.assertEqual(
+            list(recipe.recipe_ingredients.values_list(
+                'ingredient', 'amount'
+            )),
+            [(self.salt.id, 3)],
+        )
+        self.assertEqual(get_cached_recipe_id(recipe.short_link), recipe.id)
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.reader, recipe=recipe, pub_date=recipe.pub_date
+        ).exists())
+        self.assertNotEqual(get_generation('recipes'), generation)
+
+
+class SimilarRecipesTests(TestCase):
+    """Похожие рецепты по сходству Жаккара ингредиентов и тегов."""
+
+    def setUp(self):
+        author = create_user('author')
+        self.ingredients = [
+            Ingredient.objects.create(name=f'ингредиент {number}',
+                                      measurement_unit='г')
+            for number in range(6)
+        ]
+        self.tag = Tag.objects.create(name='Обед', slug='lunch')
+        self.recipes = []
+        for numbers in ((0, 1, 2), (0, 1, 3), (0, 4), (5,)):
+            recipe = Recipe.objects.create(
+                author=author, name='Рецепт', text='Текст', cooking_time=1,
+                image='recipes/images/recipe.png',
+            )
+            self.set_ingredients(recipe, numbers)
+            self.recipes.append(recipe)
+        self.recipes[0].tag.set([self.tag])
+        self.recipes[1].tag.set([self.tag])
+
+    def set_ingredients(self, recipe, numbers):
+        RecipeIngredient.objects.filter(recipe=recipe).delete()
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(
+                recipe=recipe, ingredient=self.ingredients[number], amount=1
+            )
+            for number in numbers
+        )
+
+    def expected_neighbours(self, top_k):
+        features = {
+            recipe.id: {
+                *recipe.recipe_ingredients.values_list(
+                    'ingredient_id', flat=True
+                ),
+                *(f'tag{pk}' for pk in recipe.tag.values_list(
+                    'id', flat=True
+                )),
+            }
+            for recipe in self.recipes
+        }
+        expected = {}
+        for recipe_id, own in features.items():
+            scores = [
+                (len(own & other) / len(own | other), other_id)
+                for other_id, other in features.items()
+                if other_id != recipe_id and own & other
+            ]
+            scores.sort(key=lambda item: (-item[0], item[1]))
+            expected[recipe_id] = [
+                (other_id, round(score, 5))
+                for score, other_id in scores[:top_k]
+            ]
+        return expected
+
+    def stored_neighbours(self):
+        stored = {recipe.id: [] for recipe in self.recipes}
+        for recipe_id, similar_id, score in SimilarRecipe.objects.order_by(
+            'recipe_id', '-score', 'similar_id'
+        ).values_list('recipe_id', 'similar_id', 'score'):
+            stored[recipe_id].append((similar_id, round(score, 5)))
+        return stored
+
+    def test_full_and_incremental_builds(self):
+        self.assertEqual(build_similar_recipes(top_k=2), 4)
+        self.assertEqual(self.stored_neighbours(), self.expected_neighbours(2))
+        self.assertEqual(build_similar_recipes(incremental=True, top_k=2), 0)
+        self.set_ingredients(self.recipes[3], (1, 2, 5))
+        self.assertGreater(
+            build_similar_recipes(incremental=True, top_k=2), 0
+        )
+        self.assertEqual(self.stored_neighbours(), self.expected_neighbours(2))
+
+    def test_similar_endpoint(self):
+        build_similar_recipes(top_k=2)
+        recipe = self.recipes[0]
+        response = self.client.get(f'/api/recipes/{recipe.id}/similar/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [item['id'] for item in response.json()],
+            [similar_id for similar_id, _ in
+             self.expected_neighbours(2)[recipe.id]],
+        )
+        self.assertEqual(
+            self.client.get('/api/recipes/0/similar/').status_code, 404
+        )
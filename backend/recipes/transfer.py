@@ -0,0 +1,312 @@
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import transaction
+
+from foodgram.cache import invalidate_on_commit
+from foodgram.constants import BATCH_SIZE, MAX_UNIT, MIN_UNIT
+from recipes.feed import fan_out_recipes
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+from recipes.short_links import generate_short_link, remember_short_link
+from recipes.snapshots import SNAPSHOT_KEYS, build_snapshots
+from users.models import CustomUser
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+RECIPE_COLUMNS = (
+    'id', 'name', 'text', 'cooking_time', 'image', 'author__email',
+    'ingredients_snapshot',
+)
+
+
+def dumps(data):
+    if orjson is None:
+        return json.dumps(data, ensure_ascii=False).encode() + b'\n'
+    return orjson.dumps(data, option=orjson.OPT_APPEND_NEWLINE)
+
+
+def loads(line):
+    return json.loads(line) if orjson is None else orjson.loads(line)
+
+
+def get_tag_names(recipe_ids):
+    tags = {recipe_id: [] for recipe_id in recipe_ids}
+    for recipe_id, name in Recipe.tag.through.objects.filter(
+        recipe_id__in=recipe_ids
+    ).values_list('recipe_id', 'tag__name'):
+        tags[recipe_id].append(name)
+    return tags
+
+
+def serialize_batch(rows):
+    """Строки NDJSON для пачки рецептов: два запроса на пачку."""
+    recipe_ids = [row[0] for row in rows]
+    tags = get_tag_names(recipe_ids)
+    missing = build_snapshots([
+        row[0] for row in rows if row[-1] is None
+    ])
+    for recipe_id, name, text, cooking_time, image, author, snapshot in rows:
+        yield dumps({
+            'name': name,
+            'text': text,
+            'cooking_time': cooking_time,
+            'image': image,
+            'author': author,
+            'tags': tags[recipe_id],
+            'ingredients': [
+                {
+                    'name': item['name'],
+                    'measurement_unit': item['measurement_unit'],
+                    'amount': item['amount'],
+                }
+                for item in (
+                    missing[recipe_id] if snapshot is None else snapshot
+                )
+            ],
+        })
+
+
+def export_recipes(batch_size=BATCH_SIZE):
+    """
+    Генератор строк NDJSON со всеми рецептами, строка на рецепт:
+    name, text, cooking_time, image (имя файла в хранилище),
+    author (email), tags (названия) и ingredients
+    (name, measurement_unit, amount). Рецепты читаются через
+    iterator() - в PostgreSQL это серверный курсор, поэтому
+    память не зависит от числа рецептов.
+    """
+    batch = []
+    for row in Recipe.objects.order_by('pk').values_list(
+        *RECIPE_COLUMNS
+    ).iterator(chunk_size=batch_size):
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield from serialize_batch(batch)
+            batch = []
+    if batch:
+        yield from serialize_batch(batch)
+
+
+def validate_record(record):
+    """Проверяет структуру одной записи, возвращает список ошибок."""
+    if not isinstance(record, dict):
+        return ['Запись должна быть объектом.']
+    errors = []
+    for field in ('name', 'text', 'image', 'author'):
+        if not isinstance(record.get(field), str) or not record[field]:
+            errors.append(f'{field}: нужна непустая строка.')
+    if isinstance(record.get('author'), str):
+        try:
+            validate_email(record['author'])
+        except ValidationError:
+            errors.append('author: нужен email.')
+    cooking_time = record.get('cooking_time')
+    if not isinstance(cooking_time, int) or not (
+        MIN_UNIT <= cooking_time <= MAX_UNIT
+    ):
+        errors.append(f'cooking_time: целое от {MIN_UNIT} до {MAX_UNIT}.')
+    tags = record.get('tags')
+    if not isinstance(tags, list) or not tags or not all(
+        isinstance(tag, str) for tag in tags
+    ):
+        errors.append('tags: нужен непустой список названий.')
+    ingredients = record.get('ingredients')
+    if not isinstance(ingredients, list) or not ingredients or not all(
+        isinstance(item, dict)
+        and isinstance(item.get('name'), str)
+        and isinstance(item.get('measurement_unit'), str)
+        and isinstance(item.get('amount'), int)
+        and MIN_UNIT <= item['amount'] <= MAX_UNIT
+        for item in ingredients
+    ):
+        errors.append(
+            'ingredients: нужен непустой список '
+            '{name, measurement_unit, amount}.'
+        )
+    return errors
+
+
+class RecipeImporter:
+    """
+    Загрузка рецептов из строк NDJSON пачками по batch_size.
+    На пачку: по одному запросу на авторов, теги и ингредиенты,
+    bulk_create рецептов co снимками ингредиентов и связей в одной
+    транзакции. Ошибочные строки пропускаются и попадают в errors.
+    bulk_create не отправляет сигналы, поэтому их работа - короткие
+    ссылки, ленты подписчиков и сброс кеша - выполняется явно.
+    """
+
+    def __init__(self, batch_size=BATCH_SIZE, default_author=None):
+        self.batch_size = batch_size
+        self.default_author = default_author
+        self.created = 0
+        self.errors = []
+
+    def run(self, lines):
+        batch = []
+        for number, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            batch.append((number, line))
+            if len(batch) >= self.batch_size:
+                self.import_batch(batch)
+                batch = []
+        if batch:
+            self.import_batch(batch)
+        return self.created
+
+    def parse_batch(self, batch):
+        records = []
+        for number, line in batch:
+            try:
+                record = loads(line)
+            except ValueError as error:
+                self.errors.append((number, [f'Некорректный JSON: {error}']))
+                continue
+            errors = validate_record(record)
+            if errors:
+                self.errors.append((number, errors))
+            else:
+                records.append((number, record))
+        return records
+
+    def resolve(self, records):
+        """
+        Авторы, теги и ингредиенты пачки - по запросу на каждые.
+        Ингредиенты приходят в порядке Ingredient.Meta.ordering,
+        их позиция задает порядок в снимке, как при чтении из базы.
+        """
+        authors = dict(CustomUser.objects.filter(
+            email__in={record['author'] for _, record in records}
+        ).values_list('email', 'id'))
+        tags = dict(Tag.objects.filter(name__in={
+            tag for _, record in records for tag in record['tags']
+        }).values_list('name', 'id'))
+        ingredients = {
+            (name, unit): (position, pk)
+            for position, (pk, name, unit) in enumerate(
+                Ingredient.objects.filter(name__in={
+                    item['name']
+                    for _, record in records
+                    for item in record['ingredients']
+                }).values_list('id', 'name', 'measurement_unit')
+            )
+        }
+        return authors, tags, ingredients
+
+    def check_references(self, number, record, authors, tags, ingredients):
+        errors = []
+        if record['author'] not in authors and self.default_author is None:
+            errors.append(f'Автор не найден: {record["author"]}.')
+        errors.extend(
+            f'Тег не найден: {tag}.'
+            for tag in record['tags'] if tag not in tags
+        )
+        keys = [
+            (item['name'], item['measurement_unit'])
+            for item in record['ingredients']
+        ]
+        errors.extend(
+            f'Ингредиент не найден: {name}, {unit}.'
+            for name, unit in keys if (name, unit) not in ingredients
+        )
+        if len(keys) != len(set(keys)):
+            errors.append('Ингредиенты должны быть уникальными.')
+        if errors:
+            self.errors.append((number, errors))
+        return not errors
+
+    def get_short_links(self, count):
+        """Уникальные коды коротких ссылок для новых рецептов."""
+        codes = set()
+        while len(codes) < count:
+            candidates = {
+                generate_short_link() for _ in range(count - len(codes))
+            }
+            candidates -= set(Recipe.objects.filter(
+                short_link__in=candidates
+            ).values_list('short_link', flat=True))
+            codes |= candidates
+        return list(codes)
+
+    def import_batch(self, batch):
+        records = self.parse_batch(batch)
+        if not records:
+            return
+        authors, tags, ingredients = self.resolve(records)
+        records = [
+            record for number, record in records
+            if self.check_references(
+                number, record, authors, tags, ingredients
+            )
+        ]
+        if not records:
+            return
+        codes = self.get_short_links(len(records))
+        default_author_id = getattr(self.default_author, 'pk', None)
+        items = [
+            sorted(
+                (
+                    *ingredients[(item['name'], item['measurement_unit'])],
+                    item,
+                )
+                for item in record['ingredients']
+            )
+            for record in records
+        ]
+        with transaction.atomic():
+            recipes = Recipe.objects.bulk_create([
+                Recipe(
+                    author_id=authors.get(record['author'], default_author_id),
+                    name=record['name'],
+                    text=record['text'],
+                    cooking_time=record['cooking_time'],
+                    image=record['image'],
+                    short_link=code,
+                    ingredients_snapshot=[
+                        dict(zip(SNAPSHOT_KEYS, (
+                            pk, item['name'], item['measurement_unit'],
+                            item['amount'],
+                        )))
+                        for _, pk, item in recipe_items
+                    ],
+                )
+                for record, code, recipe_items in zip(records, codes, items)
+            ], batch_size=self.batch_size)
+            if any(recipe.pk is None for recipe in recipes):
+                ids = dict(Recipe.objects.filter(
+                    short_link__in=codes
+                ).values_list('short_link', 'id'))
+                recipe_ids = [ids[code] for code in codes]
+            else:
+                recipe_ids = [recipe.pk for recipe in recipes]
+            RecipeIngredient.objects.bulk_create([
+                RecipeIngredient(
+                    recipe_id=recipe_id, ingredient_id=pk,
+                    amount=item['amount'],
+                )
+                for recipe_id, recipe_items in zip(recipe_ids, items)
+                for _, pk, item in recipe_items
+            ], batch_size=self.batch_size)
+            Recipe.tag.through.objects.bulk_create([
+                Recipe.tag.through(recipe_id=recipe_id, tag_id=tags[tag])
+                for recipe_id, record in zip(recipe_ids, records)
+                for tag in dict.fromkeys(record['tags'])
+            ], batch_size=self.batch_size)
+            self.after_import(recipes, recipe_ids)
+        self.created += len(records)
+
+    def after_import(self, recipes, recipe_ids):
+        """То, что для одного рецепта делают сигналы post_save."""
+        for recipe, recipe_id in zip(recipes, recipe_ids):
+            remember_short_link(recipe.short_link, recipe_id)
+        timeline = [
+            (recipe_id, recipe.author_id, recipe.pub_date)
+            for recipe, recipe_id in zip(recipes, recipe_ids)
+        ]
+        transaction.on_commit(lambda: fan_out_recipes(timeline))
+        invalidate_on_commit('recipes', 'popular')
@@ -0,0 +1,24 @@
+from django.http import Http404, HttpResponsePermanentRedirect
+from django.utils.cache import patch_cache_control
+
+from foodgram.constants import SHORT_LINK_CACHE_MAX_AGE
+from recipes.models import Recipe
+from recipes.short_links import resolve_short_link
+
+
+def short_link_response(recipe_id):
+    """Постоянный редирект на страницу рецепта, пригодный для кеша."""
+    if recipe_id is None:
+        raise Http404('Короткая ссылка не найдена.')
+    response = HttpResponsePermanentRedirect(
+        Recipe(pk=recipe_id).get_absolute_url()
+    )
+    patch_cache_control(
+        response, public=True, max_age=SHORT_LINK_CACHE_MAX_AGE
+    )
+    return response
+
+
+def short_link_redirect(request, code):
+    """Перенаправляет c короткой ссылки на страницу рецепта."""
+    return short_link_response(resolve_short_link(code))
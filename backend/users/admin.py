@@ -1,11 +1,12 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 
+from recipes.admin_utils import AutocompleteFilter, LargeTableAdmin
 from users.models import CustomUser, Subscription
 
 
 @admin.register(CustomUser)
-class UserAdmin(UserAdmin):
+class UserAdmin(LargeTableAdmin, UserAdmin):
     list_display = (
         'id',
         'username',
@@ -16,20 +17,24 @@ class UserAdmin(UserAdmin):
         'date_joined',
     )
     search_fields = ('username', 'email', 'first_name', 'last_name')
-    list_filter = ('date_joined', 'email', 'first_name', 'is_staff')
+    list_filter = ('date_joined', 'is_staff')
     empty_value_display = '-пусто-'
 
 
 @admin.register(Subscription)
-class SubscriptionAdmin(admin.ModelAdmin):
+class SubscriptionAdmin(LargeTableAdmin):
     list_display = ('user', 'author')
+    list_select_related = ('user', 'author')
     search_fields = (
         'author__username',
         'author__email',
         'user__username',
         'user__email'
     )
-    list_filter = ('author__username', 'user__username')
+    list_filter = (('author', AutocompleteFilter),
+                   ('user', AutocompleteFilter))
+    autocomplete_fields = ('user', 'author')
+    ordering = ('-id',)
 
 
 admin.site.empty_value_display = '-пусто-'